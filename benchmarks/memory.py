@@ -0,0 +1,51 @@
+"""
+Measures allocations and peak memory of analyzing a synthetic app.
+
+    python benchmarks/memory.py --components 1000 --functions 1000
+"""
+import sys
+import time
+import resource
+import tempfile
+import argparse
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from synthetic import load_app
+from pyjs.transpiler.analyzer import from_entry_point
+
+
+def measure(entry_point) -> dict:
+    tracemalloc.start()
+    start_blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    from_entry_point(entry_point)
+    elapsed = time.perf_counter() - start
+    blocks = sys.getallocatedblocks() - start_blocks
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "analyze_seconds": elapsed,
+        "retained_blocks": blocks,
+        "traced_peak_bytes": peak,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyjs analyzer memory benchmark")
+    parser.add_argument("--components", type=int, default=1000)
+    parser.add_argument("--functions", type=int, default=1000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as path:
+        app = load_app(Path(path), components=args.components, functions=args.functions)
+        results = measure(app.main)
+    for name, value in results.items():
+        print(f"{name:<20} {value:>14,.3f}" if isinstance(value, float) else f"{name:<20} {value:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmarks pyjs on synthetic apps of increasing size, each size in a fresh
+process so import caches and peak memory don't leak between runs.
+
+    python benchmarks/run.py --sizes 10,100,1000
+    python benchmarks/run.py --sizes 10,100 --save benchmarks/baseline.json
+    python benchmarks/run.py --sizes 10,100 --compare benchmarks/baseline.json
+    python benchmarks/run.py --sizes 10,100 --compare local.json --timings
+
+Output sizes are compared by default, timings and memory only with
+--timings, against a baseline saved on the same machine.
+"""
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+import argparse
+import contextlib
+import importlib
+import subprocess
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT.parent))
+sys.path.insert(0, str(ROOT))
+
+from synthetic import generate_app
+
+
+# metrics where a larger value is an improvement
+HIGHER_IS_BETTER = {"ssr_renders_per_second"}
+# timings closer than this are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.005
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def throughput(func, min_seconds=0.2):
+    runs, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < min_seconds or runs == 0:
+        func()
+        runs += 1
+    return runs / elapsed
+
+
+def run_size(size: int, functions: int, depth: int) -> dict:
+    from pyjs.server import page
+    from pyjs.transpiler.stats import Stats
+    from pyjs.transpiler.analyzer import from_entry_point
+    from pyjs.transpiler.transpiler import (
+        transpile_module, bundle_package, bundle_importer, bundle_exporter, generate_css
+    )
+
+    with tempfile.TemporaryDirectory() as path:
+        module_name = generate_app(Path(path), components=size, functions=functions, depth=depth)
+        sys.path.insert(0, path)
+        tracemalloc.start()
+        app, import_seconds = timed(importlib.import_module, module_name)
+
+        stats = Stats()
+        with stats.collect():
+            (entry_point, tailwind_classes), analyze_seconds = timed(from_entry_point, app.main)
+        package, transpile_seconds = timed(lambda: {
+            name: transpile_module(module, bundle_importer, bundle_exporter)
+            for name, module in entry_point.container.container.items()
+        })
+        js, bundle_seconds = timed(bundle_package, package, entry_point)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # without the binary it's the in-process generator that's timed
+        tailwind_generator = "tailwindcss" if shutil.which("tailwindcss") else "builtin"
+        # stdout is the worker's result, classes the builtin generator doesn't know are listed on it
+        with contextlib.redirect_stdout(sys.stderr):
+            _, tailwind_seconds = timed(generate_css, tailwind_classes)
+
+        root, render_seconds = timed(app.main)
+        html, serialize_seconds = timed(page, root, "app.js", "app.css")
+
+    return {
+        "components": size,
+        "functions": functions,
+        "import_seconds": import_seconds,
+        "analyze_seconds": analyze_seconds,
+        **{f"analyze_{name.replace(' ', '_').replace('&', 'and')}_seconds": seconds
+           for name, seconds in stats.phases.items()},
+        "transpile_seconds": transpile_seconds,
+        "bundle_seconds": bundle_seconds,
+        "tailwind_generator": tailwind_generator,
+        "tailwind_seconds": tailwind_seconds,
+        "ssr_render_seconds": render_seconds,
+        "ssr_serialize_seconds": serialize_seconds,
+        "ssr_renders_per_second": throughput(lambda: page(app.main(), "app.js", "app.css")),
+        "js_bytes": len(js.encode()),
+        "html_bytes": len(html.encode()),
+        "tailwind_classes": len(tailwind_classes),
+        "traced_peak_bytes": peak,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        **stats.counters,
+    }
+
+
+def run_in_subprocess(size: int, functions: int, depth: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--worker", str(size), "--functions", str(functions), "--depth", str(depth)],
+        stdout=subprocess.PIPE, check=True,
+    )
+    return json.loads(out.stdout)
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float, timings=False) -> list[str]:
+    """ Metrics which got worse than the baseline by more than threshold (eg. 0.2 = 20%). """
+    regressions = []
+    by_size = {r["components"]: r for r in baseline}
+    for result in results:
+        if (base := by_size.get(result["components"])) is None:
+            continue
+        print(f"\n{result['components']} components vs baseline")
+        for metric, value in result.items():
+            old = base.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if metric == "tailwind_seconds" and result.get("tailwind_generator") != base.get("tailwind_generator"):
+                continue
+            change = (value - old) / old
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            flag = ""
+            # timings and RSS depend on the machine, sizes only on the code
+            machine = metric.endswith(("seconds", "kb")) or metric in HIGHER_IS_BETTER
+            if metric.endswith("bytes") or (timings and machine):
+                noise = metric.endswith("seconds") and abs(value - old) < MIN_SECONDS_DELTA
+                if change > threshold and not noise:
+                    flag = "  REGRESSION"
+                    regressions.append(f"{result['components']}:{metric}")
+            print(f"  {metric:<40} {old:>14.4g} -> {value:>14.4g}  {change:+7.1%}{flag}")
+    return regressions
+
+
+def print_table(results: list[dict]):
+    metrics = list(dict.fromkeys(m for r in results for m in r))
+    print(f"{'metric':<40}" + "".join(f"{r['components']:>14}" for r in results))
+    for metric in metrics:
+        cells = []
+        for r in results:
+            value = r.get(metric)
+            if value is None:
+                value = "-"
+            cells.append(f"{value if isinstance(value, str) else format(value, '.4g'):>14}")
+        print(f"{metric:<40}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyjs benchmark suite")
+    parser.add_argument("--sizes", default="10,100,1000", help="comma separated component counts")
+    parser.add_argument("--functions", type=int, help="helper functions per app, defaults to the component count")
+    parser.add_argument("--depth", type=int, default=4, help="length of the component inheritance chains")
+    parser.add_argument("--save", metavar="FILE", help="store the results as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a stored baseline")
+    parser.add_argument("--timings", action="store_true", help="compare timings and memory too")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before reporting a regression")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        functions = args.worker if args.functions is None else args.functions
+        print(json.dumps(run_size(args.worker, functions, args.depth)))
+        return 0
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        print(f"benchmarking {size} components...", file=sys.stderr)
+        results.append(run_in_subprocess(size, size if args.functions is None else args.functions, args.depth))
+    print_table(results)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold, args.timings)
+        if regressions:
+            print(f"\nregressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Generates synthetic pyjs apps of configurable size for the benchmarks:
+CustomElement components in inheritance chains, generic containers, helper
+functions and plenty of tw() calls, spread over modules like a real app.
+"""
+import sys
+import importlib
+from pathlib import Path
+
+
+COLORS = ["red", "green", "blue", "amber", "violet", "slate"]
+
+MODULE_HEADER = '''\
+from pyjs import js
+from pyjs.dom import Event
+from pyjs.domx import CustomElement, tag, tw
+{imports}
+
+'''
+
+COMPONENT = '''\
+@js
+class Card{n}({base}):
+
+    def __init__(self, label: str, tags: list[str]):
+        super().__init__({super_args})
+        self.counts{n}: dict[str, int] = {{"clicks": 0}}
+        self.title{n} = tag("h2", tw("text-lg font-bold text-{color}-{shade}"), label)
+        self.button{n} = tag("button", tw("px-{pad} py-2 rounded bg-{color}-500 hover:bg-{color}-600"), "+")
+        self.button{n}.addEventListener("click", self.increment{n})
+        items = [tag("li", tw("text-sm"), t) for t in tags]
+        tag(self,
+            tag("div", tw("p-{pad} m-2 shadow rounded-lg border-{color}-200"),
+                self.title{n},
+                self.button{n},
+                tag("ul", tw("flex gap-{pad}"), *items),
+            )
+        )
+
+    def increment{n}(self, e: Event):
+        self.counts{n}["clicks"] = self.counts{n}["clicks"] + 1
+        self.title{n}.textContent = f"{{self.counts{n}['clicks']}} clicks"
+
+'''
+
+FUNCTION = '''\
+@js
+def compute{k}(values: list[int]) -> int:
+    total = 0
+    for value in values:
+        total = total + value * {k}
+    return total{previous}
+
+'''
+
+RENDER = '''\
+@js
+def render{m}() -> CustomElement:
+    return tag("section", tw("grid grid-cols-{cols} gap-4"),
+{children}
+    )
+
+'''
+
+MAIN = '''\
+from pyjs import js
+from pyjs.domx import tag, tw
+{imports}
+
+
+@js
+def main():
+    return tag("main", tw("container mx-auto"),
+{children}
+    )
+'''
+
+
+def component_base(n: int, depth: int):
+    if n % depth == 0:
+        return "CustomElement", ""
+    return f"Card{n-1}", "label, tags"
+
+
+def generate_app(
+    path: Path, components: int = 100, functions: int = 100, depth: int = 4,
+    per_module: int = 50, name: str = "synthetic_app"
+) -> str:
+    """ Write the app as a package under path and return the entry point module name. """
+    package = path / name
+    package.mkdir(parents=True, exist_ok=True)
+    (package / "__init__.py").write_text("")
+    modules = max(1, -(-max(components, functions) // per_module))
+    renders = []
+    for m in range(modules):
+        src = []
+        cards = range(m * per_module, min(components, (m + 1) * per_module))
+        for n in cards:
+            base, super_args = component_base(n, depth)
+            color = COLORS[n % len(COLORS)]
+            src.append(COMPONENT.format(
+                n=n, base=base, super_args=super_args, color=color,
+                shade=(n % 9 + 1) * 100, pad=n % 8 + 1,
+            ))
+        first = m * per_module
+        for k in range(first, min(functions, (m + 1) * per_module)):
+            src.append(FUNCTION.format(k=k, previous=f" + compute{k-1}(values)" if k > first else ""))
+        if cards:
+            children = "\n".join(f'        Card{n}("card {n}", ["a", "b"]),' for n in cards)
+            src.append(RENDER.format(m=m, cols=m % 4 + 1, children=children))
+            renders.append(m)
+        imports = ""
+        if m > 0 and first % depth != 0 and first < components:
+            # the first component continues an inheritance chain from the previous module
+            imports = f"from .module{m-1} import Card{first-1}"
+        (package / f"module{m}.py").write_text(MODULE_HEADER.format(imports=imports) + "\n".join(src))
+    (package / "main.py").write_text(MAIN.format(
+        imports="\n".join(f"from .module{m} import render{m}" for m in renders),
+        children="\n".join(f"        render{m}()," for m in renders),
+    ))
+    return f"{name}.main"
+
+
+def load_app(path: Path, **kwargs):
+    module_name = generate_app(path, **kwargs)
+    sys.path.insert(0, str(path))
+    return importlib.import_module(module_name)
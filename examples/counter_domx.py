@@ -8,7 +8,8 @@ class CounterApp(CustomElement):
 
     def __init__(self):
         super().__init__()
-        self.counter_text = tag("div", tw("text-4xl font-mono text-blue-600"), "0")
+        self.count = 0
+        self.counter_text = tag("div", tw("text-4xl font-mono text-blue-600"), str(self.count))
         self.sub_button = tag("button", tw("px-4 py-2 bg-red-500 hover:bg-red-600 text-white rounded-lg"), "-")
         self.sub_button.addEventListener("click", self.decrement)
         self.add_button = tag("button", tw("px-4 py-2 bg-green-500 hover:bg-green-600 text-white rounded-lg"), "+")
@@ -26,14 +27,13 @@ class CounterApp(CustomElement):
             )
         )
 
-    def get_counter(self):
-        return int(self.counter_text.textContent.strip())
-
     def decrement(self, e: Event):
-        self.counter_text.textContent = str(self.get_counter() - 1)
+        self.count = self.count - 1
+        self.counter_text.textContent = str(self.count)
 
     def increment(self, e: Event):
-        self.counter_text.textContent = str(self.get_counter() + 1)
+        self.count = self.count + 1
+        self.counter_text.textContent = str(self.count)
 
 
 def main():
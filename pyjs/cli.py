@@ -1,64 +1,265 @@
 import os
 import sys
+import time
 import argparse
 import json
+import hashlib
 import importlib
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from pyjs.transpiler import bundle
-from pyjs.server import page
+from pyjs.transpiler import prepare_bundle
+from pyjs.transpiler.transpiler import (
+    bundle_package, bundle_package_scope_hoisted, bundle_importer, bundle_exporter, esm_build, esm_importer,
+    state_classes
+)
+from pyjs.transpiler.report import bundle_report
+from pyjs.transpiler.stats import Stats
+from pyjs.transpiler.utils import TailwindCSS
+from pyjs.server import page, rebase, load_states
+
+
+def build_entry_point(module_arg, entry_args, args, tailwind, stats):
+    module_name, entry = module_arg, "main"
+    if ":" in module_arg:
+        module_name, entry = module_arg.split(':', 1)
+
+    module = importlib.import_module(module_name)
+    entry_point = getattr(module, entry)
+    file_stem = f"{module_name}.{entry}"
+
+    import_map = preload = None
+    if args.esm:
+        package, entry_point_func, css = prepare_bundle(
+            entry_point, esm_importer, include_main=args.include_main, stats=stats, tailwind=tailwind, lazy=args.lazy,
+            islands=args.islands
+        )
+        files, import_map, preload = esm_build(package, entry_point_func)
+        js_file_name = import_map[entry_point_func.container.name]
+        for file_name, js in files.items():
+            # unchanged modules keep their file, and their place in the browser cache
+            if not os.path.exists(file_name):
+                print(f"writing {module_name}:{entry} JS to ./{file_name}")
+                with open(file_name, "w") as jsfile:
+                    jsfile.write(js)
+    else:
+        js_file_name = f"{file_stem}.js"
+        print(f"writing {module_name}:{entry} JS to ./{js_file_name}")
+        package, entry_point_func, css = prepare_bundle(
+            entry_point, bundle_importer, bundle_exporter, include_main=args.include_main, stats=stats,
+            tailwind=tailwind, scope_hoisted=args.scope_hoist, islands=args.islands
+        )
+        if args.scope_hoist:
+            js = bundle_package_scope_hoisted(package, entry_point_func)
+        else:
+            js = bundle_package(package, entry_point_func)
+        with open(js_file_name, "w") as jsfile:
+            jsfile.write(js)
+    if entry_point_func.tailwind_unresolved:
+        print("classes only known at runtime, add them to the CSS yourself if they are Tailwind classes:")
+        for unresolved in sorted(entry_point_func.tailwind_unresolved):
+            print(f"  {unresolved}")
+
+    css_file_name = f"{file_stem}.css"
+    print(f"writing {module_name}:{entry} CSS to ./{css_file_name}")
+    with open(css_file_name, "w") as cssfile:
+        cssfile.write(css)
+
+    page_kwargs = {
+        "js": js_file_name, "css": css_file_name, "script_type": "module" if args.esm else "text/javascript",
+        "inline_css": None if args.no_critical_css or not css else css, "import_map": import_map, "preload": preload,
+    }
+    if args.manifest:
+        write_manifest(f"{file_stem}.manifest.json", module_name, entry, page_kwargs, {
+            # only the ES modules have content hashed names
+            **({file_name: True for file_name in files} if args.esm else {js_file_name: False}),
+            css_file_name: False,
+        }, state_names(entry_point_func))
+    if args.routes:
+        with open(args.routes) as f:
+            routes = json.load(f)
+        build_routes(
+            module_name, entry, routes, page_kwargs, inputs_key(package, css, entry_point_func),
+            state_names(entry_point_func), args.jobs
+        )
+        if args.report:
+            print(bundle_report(entry_point_func, package))
+        return
+
+    html = page(entry_point(*entry_args), **page_kwargs, states=state_classes(entry_point_func))
+    html_file_name = f"{file_stem}.html"
+    print(f"writing {module_name}:{entry} HTML to ./{html_file_name}")
+    with open(html_file_name, "w") as htmlfile:
+        htmlfile.write(html)
+
+    if args.report:
+        print(bundle_report(entry_point_func, package))
+
+
+def write_manifest(
+    file_name: str, module_name: str, entry: str, page_kwargs: dict, assets: dict[str, bool], states: dict
+):
+    """ What pyjs.server.wsgi_app() and asgi_app() need to serve the build, assets are {file name: immutable}. """
+    print(f"writing {module_name}:{entry} manifest to ./{file_name}")
+    with open(file_name, "w") as f:
+        json.dump({
+            "module": module_name,
+            "entry": entry,
+            "page": {**page_kwargs, "inline_css": page_kwargs["inline_css"] is not None},
+            "assets": assets,
+            "state": states,
+        }, f, indent=2)
+
+
+ROUTES_MANIFEST = ".pyjs-routes.json"
+
+# set in each prerender worker by init_prerender()
+PRERENDER = {}
+
+
+def inputs_key(package: dict[str, str], css: str, entry_point_func) -> str:
+    """ Changes with the bundle, the CSS or the source of any module the pages are rendered from. """
+    digest = hashlib.sha256(css.encode())
+    for name, module in sorted(entry_point_func.container.container.items()):
+        digest.update(package.get(name, "").encode())
+        if (file_name := getattr(module.py_module, "__file__", None)) and os.path.exists(file_name):
+            digest.update(Path(file_name).read_bytes())
+    return digest.hexdigest()
+
+
+def route_file(route: str) -> Path:
+    path = route.strip("/")
+    if not path:
+        return Path("index.html")
+    if path.endswith(".html"):
+        return Path(path)
+    return Path(path) / "index.html"
+
+
+def init_prerender(module_name: str, entry: str, page_kwargs: dict, states: dict):
+    module = importlib.import_module(module_name)
+    PRERENDER.update(entry_point=getattr(module, entry), page_kwargs={**page_kwargs, "states": load_states(states)})
+
+
+def prerender(route: str, entry_args: list, file_name: Path) -> float:
+    start = time.perf_counter()
+    kwargs = dict(PRERENDER["page_kwargs"])
+    # pages in subdirectories reach the assets written next to the top level page
+    prefix = "../" * len(file_name.parent.parts)
+    kwargs["js"], kwargs["css"] = rebase(kwargs["js"], prefix), rebase(kwargs["css"], prefix)
+    if kwargs["import_map"]:
+        kwargs["import_map"] = {name: rebase(url, prefix) for name, url in kwargs["import_map"].items()}
+        kwargs["preload"] = [rebase(url, prefix) for url in kwargs["preload"]]
+    html = page(PRERENDER["entry_point"](*entry_args), **kwargs)
+    file_name.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_name, "w") as htmlfile:
+        htmlfile.write(html)
+    return time.perf_counter() - start
+
+
+def state_names(entry_point_func) -> dict[str, list[str]]:
+    return {
+        f"{cls.__module__}:{cls.__qualname__}": list(names) for cls, names in state_classes(entry_point_func).items()
+    }
+
+
+def build_routes(
+    module_name: str, entry: str, routes: dict[str, list], page_kwargs: dict, key: str, states: dict, jobs: int = None
+):
+    """
+    Renders every route, {route: entry point arguments}, with the already
+    built assets across a process pool, routes whose inputs are the same
+    as in the previous build are skipped.
+    """
+    manifest = {}
+    if os.path.exists(ROUTES_MANIFEST):
+        with open(ROUTES_MANIFEST) as f:
+            manifest = json.load(f)
+    pending = {}
+    for route, entry_args in routes.items():
+        route_key = hashlib.sha256(f"{key}{json.dumps(entry_args)}".encode()).hexdigest()
+        file_name = route_file(route)
+        if manifest.get(route, {}).get("key") == route_key and file_name.exists():
+            continue
+        pending[route] = (entry_args, file_name, route_key)
+    print(f"rendering {len(pending)} of {len(routes)} routes, the others are unchanged")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        jobs, initializer=init_prerender, initargs=(module_name, entry, page_kwargs, states)
+    ) as pool:
+        futures = {
+            pool.submit(prerender, route, entry_args, file_name): route
+            for route, (entry_args, file_name, _) in pending.items()
+        }
+        for future in as_completed(futures):
+            route = futures[future]
+            seconds = future.result()
+            entry_args, file_name, route_key = pending[route]
+            print(f"writing {route} HTML to ./{file_name} in {seconds*1000:.1f} ms")
+            manifest[route] = {"key": route_key, "file": str(file_name), "ms": round(seconds * 1000, 3)}
+    with open(ROUTES_MANIFEST, "w") as f:
+        json.dump({route: manifest[route] for route in routes if route in manifest}, f, indent=2)
+    print(f"rendered {len(pending)} routes in {time.perf_counter() - start:.2f}s")
 
 
 def main():
     sys.path.insert(0, os.getcwd())
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("module", help="module containing entry point function, to specify function use colon, eg. module.submodule:entry_point, defaults to main()")
+    parser.add_argument("module", nargs="+", help="module containing entry point function, to specify function use colon, eg. module.submodule:entry_point, defaults to main(), several entry points build one page each")
     parser.add_argument("--include-main", action="store_true", help="whether to include and call the main entry_point function, default is false")
     parser.add_argument("--args", help="list of arguments to pass to entry point in JSON format")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--scope-hoist", action="store_true", help="concatenate all modules into one closure instead of a module registry")
+    output.add_argument("--esm", action="store_true", help="write one content hashed ES module per module, loaded through an import map, so an edit only invalidates the modules it changes")
+    parser.add_argument("--lazy", action="store_true", help="with --esm, @js(lazy=True) components go to chunks loaded on first use")
+    parser.add_argument("--islands", action="store_true", help="only ship JS for the custom elements which are interactive on the client, the rest of the page stays static HTML")
+    parser.add_argument("--no-critical-css", action="store_true", help="link the stylesheet only, instead of inlining the rules each page needs")
+    parser.add_argument("--report", action="store_true", help="print the bytes contributed by each module, class and function and why it was kept")
+    parser.add_argument("--stats", action="store_true", help="print time spent per build phase, analyzer counters and bytes per module")
+    parser.add_argument("--tailwind-config", metavar="FILE", help="Tailwind config file, defaults to ./tailwind.config.js when present")
+    parser.add_argument("--tailwind-cache", metavar="DIR", help="reuse generated CSS from DIR across builds, keyed by the class set and Tailwind config")
+    parser.add_argument("--routes", metavar="FILE", help="prerender a page per route, FILE is a JSON object of routes and the entry point arguments for each, eg. {\"/\": [], \"/products/1\": [1]}")
+    parser.add_argument("--jobs", type=int, help="processes rendering routes in parallel, defaults to the number of CPUs")
+    parser.add_argument("--manifest", action="store_true", help="also write MODULE.ENTRY.manifest.json, to serve the build with the WSGI or ASGI app in pyjs.server")
+    parser.add_argument("--stats-json", metavar="FILE", help="also write the build stats to FILE as JSON, eg. for tracking regressions in CI")
 
     args = parser.parse_args()
+    if args.lazy and not args.esm:
+        parser.error("--lazy needs --esm, chunks are ES modules")
 
-    if ".py" in args.module:
-        try:
-            suggestion = f"perhaps try just: {Path(args.module).stem}"
-        except:
-            suggestion = ""
-        parser.error(
-            f"{args.module} appears to be a Python file, "
-            f"a module name is expected instead, {suggestion}"
-        )
-
-    module_name, entry = args.module, "main"
-    if ":" in args.module:
-        module_name, entry = args.module.split(':', 1)
+    for module_arg in args.module:
+        if ".py" in module_arg:
+            try:
+                suggestion = f"perhaps try just: {Path(module_arg).stem}"
+            except:
+                suggestion = ""
+            parser.error(
+                f"{module_arg} appears to be a Python file, "
+                f"a module name is expected instead, {suggestion}"
+            )
 
     entry_args = []
+    if args.routes and len(args.module) > 1:
+        parser.error("--routes renders a single entry point")
+
     if args.args:
         entry_args = json.loads(args.args)
         if not isinstance(entry_args, list):
             print("--args must be a JSON list")
 
-    module = importlib.import_module(module_name)
-    entry_point = getattr(module, entry)
-    file_stem = f"{module_name}.{entry}"
-
-    js_file_name = f"{file_stem}.js"
-    print(f"writing {module_name}:{entry} JS to ./{js_file_name}")
-    js, css = bundle(entry_point, args.include_main)
-    with open(js_file_name, "w") as jsfile:
-        jsfile.write(js)
-
-    css_file_name = f"{file_stem}.css"
-    print(f"writing {module_name}:{entry} CSS to ./{css_file_name}")
-    with open(css_file_name, "w") as cssfile:
-        cssfile.write(css)
+    stats = Stats() if args.stats or args.stats_json else None
+    tailwind = TailwindCSS(config=args.tailwind_config, cache_dir=args.tailwind_cache)
+    # every entry point gets its own JS, CSS and HTML, so a page only ships the classes it uses
+    for module_arg in args.module:
+        build_entry_point(module_arg, entry_args, args, tailwind, stats)
 
-    html = page(entry_point(*entry_args), js_file_name, css_file_name, "text/javascript")
-    html_file_name = f"{file_stem}.html"
-    print(f"writing {module_name}:{entry} HTML to ./{html_file_name}")
-    with open(html_file_name, "w") as htmlfile:
-        htmlfile.write(html)
+    if args.stats:
+        print(stats.report())
+    if args.stats_json:
+        print(f"writing build stats to {args.stats_json}")
+        stats.dump(args.stats_json)
 
     return 0
 
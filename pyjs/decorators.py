@@ -34,6 +34,18 @@ DECORATIONS = {
 
     # do not analyze function
     "__no_analyze__",  # bool
+
+    # function has no side effects, calls with constant
+    # arguments can be evaluated once and reused
+    "__js_pure__",  # bool
+
+    # set to False to prevent small functions from being
+    # automatically inlined at their call sites
+    "__js_inline_auto__",  # bool
+
+    # custom element class is split into its own chunk, loaded
+    # with import() once its tag first appears in the document
+    "__js_lazy__",  # bool
 }
 
 
@@ -65,22 +77,42 @@ def has_include_decorator(obj):
     return obj.__dict__.get("__js_include__", False)
 
 
+def has_pure_decorator(obj):
+    return obj.__dict__.get("__js_pure__", False)
+
+
+def allows_inline_auto(obj):
+    return obj.__dict__.get("__js_inline_auto__", True)
+
+
+def has_lazy_decorator(obj):
+    return obj.__dict__.get("__js_lazy__", False)
+
+
 def should_include(obj):
+    # @js(include=True) methods are visited when their class is
+    # instantiated, so for methods being visited is what counts
+    is_method = getattr(obj, "is_method", False)
     return (
-        has_include_decorator(obj.py_obj) or
+        (has_include_decorator(obj.py_obj) and not is_method) or
         bool(obj.visited)
     ) and not obj.py_obj.__dict__.get("__builtin__", False)
 
 
-def js(*cls_func_args, inline=None, builtin=None, include=None, analyze=None):
+def js(
+    *cls_func_args, inline=None, builtin=None, include=None, analyze=None, pure=None, inline_auto=None, lazy=None
+):
 
     class Wrapper:
 
-        def __init__(self, inline, builtin, include, analyze):
+        def __init__(self, inline, builtin, include, analyze, pure, inline_auto, lazy):
             self.inline = inline
             self.builtin = builtin
             self.include = include
             self.analyze = analyze
+            self.pure = pure
+            self.inline_auto = inline_auto
+            self.lazy = lazy
 
         def __call__(self, cls_func):
             cls_func.__js__ = True
@@ -96,8 +128,12 @@ def js(*cls_func_args, inline=None, builtin=None, include=None, analyze=None):
 
             if inspect.isclass(cls_func):
                 assert self.include is None, "@js(include=True) is only supported for class methods."
+                if self.lazy is True:
+                    cls_func.__js_lazy__ = True
                 return cls_func
 
+            assert self.lazy is None, "@js(lazy=True) is only supported for custom element classes."
+
             if self.include is True:
                 assert "." in cls_func.__qualname__, "@js(include=True) is only supported for class methods."
                 cls_func.__js_include__ = True
@@ -105,6 +141,12 @@ def js(*cls_func_args, inline=None, builtin=None, include=None, analyze=None):
             if self.analyze is False:
                 cls_func.__no_analyze__ = True
 
+            if self.pure is True:
+                cls_func.__js_pure__ = True
+
+            if self.inline_auto is False:
+                cls_func.__js_inline_auto__ = False
+
             def client(new_func: type):
                 cls_func.__js_replace__ = new_func
                 return cls_func
@@ -123,9 +165,9 @@ def js(*cls_func_args, inline=None, builtin=None, include=None, analyze=None):
             return cls_func
 
     if cls_func_args and is_cls_or_func(cls_func_args[0]):
-        return Wrapper(inline, builtin, include, analyze)(cls_func_args[0])
+        return Wrapper(inline, builtin, include, analyze, pure, inline_auto, lazy)(cls_func_args[0])
 
-    return Wrapper(inline, builtin, include, analyze)
+    return Wrapper(inline, builtin, include, analyze, pure, inline_auto, lazy)
 
 
 def nojs(cls_func):
@@ -1,4 +1,5 @@
 import re
+import itertools
 
 from pyjs.dom import *
 from pyjs import js, nojs, js_str
@@ -14,7 +15,7 @@ class CustomElementMetaclass(type):
                 "nodeName": js_str(upper_tag),
                 "tagName": js_str(upper_tag),
                 "localName": js_str(lower_tag),
-                "__js_append__": lambda *args: f"customElements.define({repr(lower_tag)}, {name})",
+                "__js_append__": lambda js_name=name: f"customElements.define({repr(lower_tag)}, {js_name})",
                 **namespace
             }
         cls = super().__new__(mcls, name, bases, namespace, **kwargs)
@@ -24,14 +25,14 @@ class CustomElementMetaclass(type):
 @js
 class CustomElement(HTMLElement, metaclass=CustomElementMetaclass):
 
-    CUSTOM_ELEMENT_COUNTER = 0
+    # next() on a count is atomic, threads rendering pages at once never share an id
+    CUSTOM_ELEMENT_COUNTER = itertools.count(1)
 
     @js
     def __init__(self):
         super().__init__()
         self._initialized = False
-        CustomElement.CUSTOM_ELEMENT_COUNTER += 1
-        self.set_data("self-id", f"ce{CustomElement.CUSTOM_ELEMENT_COUNTER}")
+        self.set_data("self-id", f"ce{next(CustomElement.CUSTOM_ELEMENT_COUNTER)}")
 
     @__init__.client
     def __init__(self):
@@ -89,6 +90,12 @@ class ProxyElement:
         return self.element.getAttribute(name)
 
 
+def lazy(cls: type[CustomElement]) -> type[CustomElement]:
+    """ Same as @js(lazy=True), the component is loaded on first use in code split builds. """
+    assert issubclass(cls, CustomElement), "only custom elements can be loaded lazily"
+    return js(lazy=True)(cls)
+
+
 #@js
 class ContextProxy[V]:
     def __init__(self):
@@ -121,7 +128,7 @@ context = ContextProvider()
 #js_object(context)
 
 
-@js
+@js(pure=True)
 def tw(classes: str) -> dict[str,str]:
     return {"class": classes}
 
@@ -1,26 +1,154 @@
+import os
+import json
+import queue
+import signal
+import asyncio
 import importlib
+import itertools
+import mimetypes
+import threading
+import functools
+import traceback
+import multiprocessing
+from http import HTTPStatus
+from typing import NamedTuple
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 from pyjs.transpiler import prepare_bundle
-from pyjs.transpiler.utils import SourceWriter
+from pyjs.transpiler.transpiler import esm_build, esm_importer, state_classes
+from pyjs.transpiler.utils import SourceWriter, TailwindCSS, css_subset
 from pyjs.domx import HTMLElement, tag
 
 
-def html(body, js, css, script_type):
+LIVE_RELOAD = """\
+(() => {
+    const events = new EventSource(%s);
+    events.addEventListener("reload", () => location.reload());
+    events.addEventListener("css", (e) => {
+        for (const link of document.querySelectorAll('link[rel="stylesheet"]')) {
+            const url = new URL(link.href);
+            if (url.pathname !== e.data) continue;
+            url.searchParams.set("v", Date.now());
+            // the old stylesheet stays until the new one applies, so nothing flashes unstyled
+            const fresh = link.cloneNode();
+            fresh.href = url;
+            fresh.onload = () => link.remove();
+            link.after(fresh);
+        }
+    });
+})();"""
+
+
+def html(
+    body, js, css, script_type, critical_css=None, import_map=None, preload=None, state=None, live_reload=None
+):
+    if critical_css is None:
+        stylesheet = [tag("link", {"rel": "stylesheet", "href": css})]
+    else:
+        # critical rules inline, the full stylesheet loads without blocking first paint
+        stylesheet = [
+            tag("style", critical_css),
+            tag("link", {
+                "rel": "preload", "href": css, "as": "style", "onload": "this.onload=null;this.rel='stylesheet'"
+            }),
+            tag("noscript", tag("link", {"rel": "stylesheet", "href": css})),
+        ]
+    modules = []
+    if import_map:
+        # the import map has to precede any module script, preloading fetches the whole graph in parallel
+        modules = [
+            tag("script", {"type": "importmap"}, json.dumps({"imports": import_map})),
+            *(tag("link", {"rel": "modulepreload", "href": url}) for url in preload or import_map.values()),
+        ]
+    script = {'type': script_type, 'src': js}
+    if script_type != "module":
+        # module scripts are deferred already
+        script["defer"] = "defer"
     return tag('html',
         tag('head',
             tag("meta", {"charset": "utf-8"}),
-            tag("link", {"rel": "stylesheet", "href": css}),
+            *stylesheet,
+            *modules,
+            tag('script', script, " "),
+            *([tag("script", LIVE_RELOAD % json.dumps(live_reload))] if live_reload else []),
         ),
-        tag('body', body),
-        tag('script', {'type': script_type, 'src': js}, " ")
+        tag('body', body, *state_script(state)),
     )
 
 
-def page(body, js, css, script_type="module"):
+def state_script(state: dict):
+    if not state:
+        return []
+    # "</" can't appear inside a script element
+    state_json = json.dumps(state, separators=(",", ":")).replace("</", "<\\/")
+    return [tag("script", {"type": "application/json", "id": "pyjs-state"}, state_json)]
+
+
+def page_state(parent: HTMLElement, states: dict[type, tuple[str, ...]], state=None) -> dict[str, dict]:
+    """
+    The plain data attributes (states from transpiler.state_classes()) of
+    each rendered custom element by its self id, for hydration to resume
+    from. NaN and infinities aren't JSON, they raise ValueError.
+    """
+    if state is None:
+        state = {}
+    names = next((states[cls] for cls in type(parent).__mro__ if cls in states), None)
+    if names and (self_id := parent.get_data("self-id")):
+        state[self_id] = {name: getattr(parent, name) for name in names if hasattr(parent, name)}
+        for name, value in state[self_id].items():
+            try:
+                json.dumps(value, allow_nan=False)
+            except ValueError:
+                raise ValueError(f"{type(parent).__qualname__}.{name} isn't JSON: {value!r}") from None
+    for child in parent.children:
+        if isinstance(child, HTMLElement):
+            page_state(child, states, state)
+    return state
+
+
+def page_names(parent: HTMLElement, classes=None, ids=None, tags=None):
+    """ The classes, ids and tag names used in a rendered tree. """
+    if classes is None:
+        classes, ids, tags = set(), set(), set()
+    tags.add(parent.tagName.lower())
+    classes.update((parent.attributes.get("class") or "").split())
+    if parent.attributes.get("id"):
+        ids.add(parent.attributes["id"])
+    for child in parent.children:
+        if isinstance(child, HTMLElement):
+            page_names(child, classes, ids, tags)
+    return classes, ids, tags
+
+
+@functools.lru_cache(maxsize=64)
+def cached_css_subset(css: str, classes: frozenset, ids: frozenset, tags: frozenset) -> str:
+    """ css_subset() cached per stylesheet and set of names, a page renders the same names every request. """
+    return css_subset(css, classes, ids, tags)
+
+
+def page(
+    body, js, css, script_type="module", inline_css: str = None, import_map: dict[str, str] = None,
+    preload: list[str] = None, live_reload: str = None, states: dict[type, tuple[str, ...]] = None
+):
+    """
+    Renders the page, with inline_css (the content of the css stylesheet)
+    the rules the page needs are inlined in <head>, with import_map (from
+    esm_build()) the preload urls, or every module, are preloaded. With
+    states (from transpiler.state_classes() or load_states()) the plain
+    data attributes of custom elements are serialized.
+    With live_reload, the url of a server-sent events stream, the page
+    swaps its stylesheet on "css" events and reloads on "reload" events.
+    """
+    inlined = None
+    if inline_css is not None:
+        classes, ids, tags = page_names(body)
+        tags |= {"html", "head", "body"}
+        inlined = cached_css_subset(inline_css, frozenset(classes), frozenset(ids), frozenset(tags))
     src = SourceWriter()
-    write(html(body, js, css, script_type), src)
+    state = page_state(body, states or {})
+    write(html(body, js, css, script_type, inlined, import_map, preload, state, live_reload), src)
     return src.getvalue()
 
 
@@ -50,75 +178,507 @@ def write(parent: HTMLElement, src):
         src.write_line("".join(start))
 
 
+def rebase(url: str, prefix: str) -> str:
+    return prefix + url.removeprefix("./") if prefix else url
+
+
+def load_states(states: dict[str, list[str]]) -> dict[type, tuple[str, ...]]:
+    """ The state names of a manifest, by "module:qualname", by class for page(). """
+    classes = {}
+    for name, names in states.items():
+        module_name, qualname = name.split(":")
+        cls = importlib.import_module(module_name)
+        for part in qualname.split("."):
+            cls = getattr(cls, part)
+        classes[cls] = tuple(names)
+    return classes
+
+
+STREAM_CHUNK = 64 * 1024
+
+HEALTH_PATH = "/_pyjs/health"
+
+
+def ssr_worker(render, conn):
+    """ A pool process, renders its jobs in order until it's sent None. """
+    # the front server handles ctrl-c and retires the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while (job := conn.recv()) is not None:
+        job_id, args = job
+        try:
+            status, headers, body = render(*args)
+        except Exception:
+            traceback.print_exc()
+            status, headers, body = 500, [("Content-Type", "text/plain")], b"Internal Server Error"
+        conn.send((job_id, (status, headers)))
+        for start in range(0, len(body), STREAM_CHUNK):
+            conn.send((job_id, body[start:start + STREAM_CHUNK]))
+        conn.send((job_id, None))
+    conn.close()
+
+
+class SSRWorker:
+
+    def __init__(self, context, render, done):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=ssr_worker, args=(render, child), daemon=True)
+        self.process.start()
+        child.close()
+        # the queue of each job sent and not finished yet
+        self.jobs: dict[int, queue.SimpleQueue] = {}
+        self.rendered = 0
+        self.done = done
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def read(self):
+        try:
+            while True:
+                job_id, message = self.conn.recv()
+                self.jobs[job_id].put(message)
+                if message is None:
+                    del self.jobs[job_id]
+                    self.rendered += 1
+                    self.done()
+        except (EOFError, OSError):
+            # retired or crashed, either way nothing more is coming
+            for job in list(self.jobs.values()):
+                job.put(EOFError())
+            self.jobs.clear()
+            self.conn.close()
+            self.done()
+
+    def retire(self):
+        """ The worker exits after the jobs it was sent. """
+        try:
+            self.conn.send(None)
+        except OSError:
+            # exited already
+            pass
+
+    def health(self) -> dict:
+        return {
+            "pid": self.process.pid, "alive": self.process.is_alive(),
+            "in_flight": len(self.jobs), "rendered": self.rendered,
+        }
+
+
+def render_page(entry_point, page_kwargs: dict, *entry_args) -> tuple[int, list[tuple[str, str]], bytes]:
+    body = page(entry_point(*entry_args), **page_kwargs).encode("utf-8")
+    return 200, [("Content-Type", "text/html; charset=utf-8"), ("Content-Length", str(len(body)))], body
+
+
+class SSRPool:
+    """
+    Pre-started processes calling render(*args) -> (status, headers, body),
+    render is pickled to each worker, which imports what it refers to, eg.
+    functools.partial(render_page, ...). A job goes to the worker with the
+    fewest in flight, at most max_in_flight each, past that requests wait
+    up to timeout for a slot. Crashed workers are replaced, reload()
+    replaces them all.
+    """
+
+    def __init__(self, render, workers: int = None, max_in_flight: int = 4, timeout: float = 30.0):
+        # the servers run threads, forking would copy their locks in whatever state they're in
+        self.context = multiprocessing.get_context("spawn")
+        self.render = render
+        self.size = workers or os.cpu_count()
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.job_ids = itertools.count()
+        self.restarts = 0
+        self.changed = threading.Condition()
+        self.workers = [self.start() for _ in range(self.size)]
+
+    def start(self) -> SSRWorker:
+        return SSRWorker(self.context, self.render, self.notify)
+
+    def notify(self):
+        with self.changed:
+            self.changed.notify_all()
+
+    def replace_crashed(self):
+        # starting a process is slow, requests keep being submitted to the others meanwhile
+        for i, worker in enumerate(list(self.workers)):
+            if not worker.process.is_alive():
+                new = self.start()
+                with self.changed:
+                    if self.workers[i] is worker:
+                        self.workers[i], new = new, None
+                        self.restarts += 1
+                if new is not None:
+                    # another request replaced it first
+                    new.retire()
+
+    def available(self) -> SSRWorker | None:
+        alive = [worker for worker in self.workers if worker.process.is_alive()]
+        worker = min(alive, key=lambda w: len(w.jobs), default=None)
+        return worker if worker is not None and len(worker.jobs) < self.max_in_flight else None
+
+    def submit(self, *args):
+        """ Status, headers and an iterator of the body chunks as the worker sends them. """
+        self.replace_crashed()
+        with self.changed:
+            if (worker := self.changed.wait_for(self.available, self.timeout)) is None:
+                return 503, [("Content-Type", "text/plain"), ("Retry-After", "1")], iter([b"Service Unavailable"])
+            job_id, job = next(self.job_ids), queue.SimpleQueue()
+            worker.jobs[job_id] = job
+            worker.conn.send((job_id, args))
+        try:
+            head = job.get(timeout=self.timeout)
+        except queue.Empty:
+            return 504, [("Content-Type", "text/plain")], iter([b"Gateway Timeout"])
+        if isinstance(head, EOFError):
+            return 502, [("Content-Type", "text/plain")], iter([b"Bad Gateway"])
+        status, headers = head
+        return status, headers, self.stream(job)
+
+    @staticmethod
+    def stream(job: queue.SimpleQueue):
+        while isinstance(chunk := job.get(), bytes):
+            yield chunk
+        if isinstance(chunk, EOFError):
+            # the status and Content-Length are sent already, the server has to drop the connection
+            raise RuntimeError("the worker exited before the response was complete")
+
+    def reload(self, render=None):
+        """ Starts workers with the current code, or a new render, the old ones exit after their jobs. """
+        if render is not None:
+            self.render = render
+        new = [self.start() for _ in range(self.size)]
+        with self.changed:
+            old, self.workers = self.workers, new
+        for worker in old:
+            worker.retire()
+
+    def health(self) -> dict:
+        with self.changed:
+            workers = [worker.health() for worker in self.workers]
+        return {
+            "alive": sum(worker["alive"] for worker in workers), "restarts": self.restarts,
+            "max_in_flight": self.max_in_flight, "workers": workers,
+        }
+
+    def close(self):
+        with self.changed:
+            workers = list(self.workers)
+        for worker in workers:
+            worker.retire()
+        for worker in workers:
+            worker.process.join(self.timeout)
+
+
+class SSRApp:
+    """
+    Serves a build described by a manifest (see the --manifest option of
+    pyjs.cli), the assets from memory and a page rendered per request.
+    routes is {path: entry point arguments} or a function of the path
+    returning them, None for a 404, by default only / is served.
+    Nothing is shared between requests, so an app can serve from any
+    number of threads or processes, with workers pages are rendered by
+    an SSRPool of that many processes.
+    """
+
+    def __init__(self, manifest_file: str, routes=None, workers: int = 0, max_in_flight: int = 4):
+        manifest_path = Path(manifest_file)
+        manifest = json.loads(manifest_path.read_text())
+        self.entry_point = getattr(importlib.import_module(manifest["module"]), manifest["entry"])
+        self.assets = {}
+        for file_name, immutable in manifest["assets"].items():
+            content_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+            self.assets[f"/{file_name}"] = (
+                (manifest_path.parent / file_name).read_bytes(),
+                [
+                    ("Content-Type", "text/javascript" if file_name.endswith(".js") else content_type),
+                    # hashed file names change with their content
+                    ("Cache-Control", "public, max-age=31536000, immutable" if immutable else "no-cache"),
+                ]
+            )
+        # pages are served from any path, so assets are linked from the root
+        page_kwargs = dict(manifest["page"])
+        page_kwargs["js"], page_kwargs["css"] = rebase(page_kwargs["js"], "/"), rebase(page_kwargs["css"], "/")
+        if page_kwargs["import_map"]:
+            page_kwargs["import_map"] = {name: rebase(url, "/") for name, url in page_kwargs["import_map"].items()}
+            page_kwargs["preload"] = [rebase(url, "/") for url in page_kwargs["preload"]]
+        if page_kwargs["inline_css"]:
+            page_kwargs["inline_css"] = self.assets[page_kwargs["css"]][0].decode("utf-8")
+        else:
+            page_kwargs["inline_css"] = None
+        page_kwargs["states"] = load_states(manifest["state"])
+        self.page_kwargs = page_kwargs
+        if routes is None:
+            routes = {"/": []}
+        self.routes = routes.get if isinstance(routes, dict) else routes
+        render = functools.partial(render_page, self.entry_point, self.page_kwargs)
+        self.pool = SSRPool(render, workers, max_in_flight) if workers else None
+
+    def render(self, *entry_args) -> tuple[int, list[tuple[str, str]], bytes]:
+        return render_page(self.entry_point, self.page_kwargs, *entry_args)
+
+    def respond(self, method: str, path: str):
+        """ Status, headers and the body, bytes or with a pool an iterator of chunks. """
+        if method not in ("GET", "HEAD"):
+            return 405, [("Content-Type", "text/plain"), ("Allow", "GET, HEAD")], b"Method Not Allowed"
+        if (asset := self.assets.get(path)) is not None:
+            body, headers = asset
+            return 200, [*headers, ("Content-Length", str(len(body)))], body
+        if path == HEALTH_PATH and self.pool is not None:
+            health = self.pool.health()
+            return 200 if health["alive"] else 503, [("Content-Type", "application/json")], json.dumps(health).encode()
+        if (entry_args := self.routes(path)) is None:
+            return 404, [("Content-Type", "text/plain")], b"Not Found"
+        if self.pool is not None:
+            return self.pool.submit(*entry_args)
+        return self.render(*entry_args)
+
+
+def wsgi_app(manifest_file: str, routes=None, workers: int = 0, max_in_flight: int = 4):
+    """ A WSGI application serving the build, eg. gunicorn 'pyjs.server:wsgi_app("app.main.manifest.json")' """
+    app = SSRApp(manifest_file, routes, workers, max_in_flight)
+
+    def application(environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        status, headers, body = app.respond(method, environ.get("PATH_INFO") or "/")
+        start_response(f"{status} {HTTPStatus(status).phrase}", headers)
+        if method == "HEAD":
+            if not isinstance(body, bytes):
+                # a pool's stream, done with it without reading
+                body.close()
+            return [b""]
+        return [body] if isinstance(body, bytes) else body
+
+    application.app = app
+    return application
+
+
+def asgi_app(manifest_file: str, routes=None, workers: int = 0, max_in_flight: int = 4):
+    """ An ASGI application serving the build, eg. app = asgi_app("app.main.manifest.json") run by uvicorn. """
+    app = SSRApp(manifest_file, routes, workers, max_in_flight)
+
+    async def application(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            if app.pool is not None:
+                app.pool.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        if scope["type"] != "http":
+            return
+        method, path = scope["method"], scope["path"]
+        if path in app.assets:
+            status, headers, body = app.respond(method, path)
+        else:
+            # rendering doesn't await, keep it off the event loop
+            status, headers, body = await asyncio.to_thread(app.respond, method, path)
+        await send({
+            "type": "http.response.start", "status": status,
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        })
+        if method == "HEAD":
+            if not isinstance(body, bytes):
+                body.close()
+            body = b""
+        if not isinstance(body, bytes):
+            # chunks arrive from a pool worker
+            while (chunk := await asyncio.to_thread(next, body, None)) is not None:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            body = b""
+        await send({"type": "http.response.body", "body": body})
+
+    application.app = app
+    return application
+
+
+EVENTS_PATH = "/_pyjs/events"
+
+
 class RequestHandler(BaseHTTPRequestHandler):
 
     def do_GET(self):
         server: PyjsServer = self.server
-        server.refresh()
-        if self.path == '/':
+        # the stylesheet is requested with ?v= after a hot swap
+        path = urlsplit(self.path).path
+        # one build for the whole request, a rebuild may publish the next one meanwhile
+        build = server.build
+        if path == '/':
+            status, headers, body = server.pool.submit() if server.pool else server.render()
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            for chunk in [body] if isinstance(body, bytes) else body:
+                self.wfile.write(chunk)
+        elif path == EVENTS_PATH:
+            self.send_events()
+        elif path == HEALTH_PATH and server.pool:
             self.send_response(200)
-            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-type', 'application/json')
             self.end_headers()
-            self.wfile.write(page(
-                server.get_html(),
-                f'{self.server.entry_point.container.name}.js',
-                'index.css'
-            ).encode('utf-8'))
-        elif self.path == '/index.css':
+            self.wfile.write(json.dumps(server.pool.health()).encode('utf-8'))
+        elif path == '/index.css':
             self.send_response(200)
             self.send_header('Content-type', 'text/css')
             self.end_headers()
-            self.wfile.write(server.get_css().encode('utf-8'))
-        elif self.path.endswith('.js'):
+            self.wfile.write(build.css.encode('utf-8'))
+        elif path.endswith('.js') and (js := build.package.get(Path(path).name)) is not None:
             self.send_response(200)
             self.send_header('Content-type', 'application/javascript')
+            # file names change with their content
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
             self.end_headers()
-            self.wfile.write(server.package[Path(self.path).stem])
+            self.wfile.write(js)
         else:
             self.send_error(404)
 
+    def send_events(self):
+        server: PyjsServer = self.server
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        seen = len(server.events)
+        try:
+            while not server.stopped.is_set():
+                with server.events_changed:
+                    server.events_changed.wait_for(
+                        lambda: len(server.events) > seen or server.stopped.is_set(), timeout=15
+                    )
+                    events, seen = server.events[seen:], len(server.events)
+                message = "".join(f"event: {event}\ndata: {data}\n\n" for event, data in events)
+                # a comment when there's nothing to send finds closed connections
+                self.wfile.write(message.encode() if message else b":\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class Build(NamedTuple):
+    """ What PyjsServer serves, replaced as a whole by each rebuild so no request mixes two builds. """
+    entry_point: object
+    css: str
+    import_map: dict[str, str]
+    preload: list[str]
+    states: dict[type, tuple[str, ...]]
+    package: dict[str, bytes]
 
-class PyjsServer(HTTPServer):
 
-    def __init__(self, module: str, css: str, entry_point: str, *entry_point_args):
+class PyjsServer(ThreadingHTTPServer):
+
+    def __init__(
+        self, module: str, css: str, entry_point: str, *entry_point_args, workers: int = 0,
+        watch_interval: float = 0.25
+    ):
         super().__init__(('', 8000), RequestHandler)
         self.module = importlib.import_module(module)
         self.module_name = module
         self.module_path = Path(self.module.__file__)
-        self.module_last_modified = None
-        self.package = None
-        self.css_provided = bool(css)
-        self.css = css
-        self.entry_point = None
+        self.last_modified = None
+        self.build: Build = None
+        # used instead of the generated CSS when given
+        self.provided_css = css
         self.entry_point_name = entry_point or "main"
         self.entry_point_args = entry_point_args
+        # one watching tailwindcss process for all reloads instead of starting Node per refresh
+        self.tailwind = TailwindCSS(persistent=True)
+        self.refresh_lock = threading.Lock()
+        self.pool = None
+        # (event, data) sent to every connected page, see LIVE_RELOAD
+        self.events: list[tuple[str, str]] = []
+        self.events_changed = threading.Condition()
+        self.stopped = threading.Event()
         self.refresh()
+        # started after the first build, and again after each rebuild
+        if workers:
+            self.pool = SSRPool(self.renderer(), workers)
+        # rebuilds happen in the background, requests are served from the last build meanwhile
+        self.watch_interval = watch_interval
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def watch(self):
+        while not self.stopped.wait(self.watch_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # keep serving the last good build until the next save
+                traceback.print_exc()
+
+    def notify(self, event: str, data: str):
+        with self.events_changed:
+            self.events.append((event, data))
+            self.events_changed.notify_all()
+
+    def watched_files(self) -> list[Path]:
+        # a Tailwind config edit only changes the CSS
+        return [self.module_path, Path(self.tailwind.config or "tailwind.config.js")]
 
     def refresh(self):
-        last_modified = self.module_path.stat().st_mtime
-        if self.module_last_modified != last_modified:
-            self.module_last_modified = last_modified
-            importlib.reload(self.module)
+        last_modified = [path.stat().st_mtime if path.exists() else None for path in self.watched_files()]
+        with self.refresh_lock:
+            if self.last_modified == last_modified:
+                return
+            # the module renders the page too, any edit to it reloads, a config edit only swaps the CSS
+            module_changed = self.last_modified is not None and self.last_modified[0] != last_modified[0]
+            self.last_modified = last_modified
+            try:
+                importlib.reload(self.module)
+            except Exception:
+                if self.build is None:
+                    raise
+                # a half saved module, keep serving the last good build until the next save
+                traceback.print_exc()
+                return
             entry_point_py_func = getattr(self.module, self.entry_point_name)
-            self.package, self.entry_point, css = prepare_bundle(entry_point_py_func)
-            if not self.css_provided:
-                self.css = css
-            for package_name, js in self.package.items():
-                self.package[package_name] = js.encode("utf-8")
+            package, entry_point, css = prepare_bundle(
+                entry_point_py_func, esm_importer, tailwind=self.tailwind, lazy=True
+            )
+            files, import_map, preload = esm_build(package, entry_point, "/")
+            last = self.build
+            self.build = Build(
+                entry_point, self.provided_css or css, import_map, preload, state_classes(entry_point),
+                {file_name: js.encode("utf-8") for file_name, js in files.items()},
+            )
+            js_changed = last is not None and (module_changed or files.keys() != last.package.keys())
+            css_changed = last is not None and self.build.css != last.css
+            if self.pool:
+                self.pool.reload(self.renderer())
+        if js_changed:
+            self.notify("reload", "/")
+        elif css_changed:
+            self.notify("css", "/index.css")
 
+    def renderer(self):
+        """ render() of the current build, picklable for the pool workers. """
+        build = self.build
+        return functools.partial(render_page, build.entry_point.py_func, {
+            "js": build.import_map[build.entry_point.container.name],
+            "css": "index.css",
+            "inline_css": build.css or None,
+            "import_map": build.import_map,
+            "preload": build.preload,
+            "live_reload": EVENTS_PATH,
+            "states": build.states,
+        }, *self.entry_point_args)
 
-    def get_html(self):
-        return self.entry_point.py_func(*self.entry_point_args)
+    def render(self) -> tuple[int, list[tuple[str, str]], bytes]:
+        return self.renderer()()
 
     def get_css(self):
-        return self.css
+        return self.build.css
 
     def serve_forever(self, poll_interval = 0.5):
         print("Serving on port 8000...")
-        super().serve_forever(poll_interval)
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.stopped.set()
+            with self.events_changed:
+                self.events_changed.notify_all()
+            self.tailwind.close()
+            if self.pool:
+                self.pool.close()
 
 
-def serve(module, css="", entry_point=None, *args):
-    httpd = PyjsServer(module, css, entry_point, *args)
+def serve(module, css="", entry_point=None, *args, workers=0):
+    httpd = PyjsServer(module, css, entry_point, *args, workers=workers)
     httpd.serve_forever()
     #print(httpd.get_js(httpd.get_module()))
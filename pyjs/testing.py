@@ -1,9 +1,12 @@
+import sys
+import asyncio
 import difflib
+import tempfile
 import textwrap
 import linecache
 from io import StringIO
 from pathlib import Path
-from unittest import TestCase
+from unittest import TestCase, mock
 from importlib import import_module
 
 from types import SimpleNamespace
@@ -66,11 +69,46 @@ def module_from_src(line_or_lines, complete_src=False):
     return create_module(src)
 
 
+def asgi_request(app, path, method="GET"):
+    """ Calls an ASGI app for one request, returns the status, headers and body. """
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "method": method, "path": path, "headers": []}
+    asyncio.run(app(scope, receive, send))
+    start, *bodies = messages
+    headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in start["headers"]}
+    return start["status"], headers, b"".join(m.get("body", b"") for m in bodies)
+
+
 class BaseTestCase(TestCase):
 
     def setUp(self):
         super().setUp()
 
+    def load_module(self, src: str, name: str = "_test_") -> SimpleNamespace:
+        """ create_module() of the dedented source, importable as name until the test ends. """
+        module = create_module(textwrap.dedent(src), f"{name}.py")
+        self.addCleanup(sys.modules.pop, name, None)
+        sys.modules[name] = module
+        return module
+
+    def module_dir(self, *module_names: str) -> Path:
+        """ A temporary directory on sys.path, the modules named are forgotten once the test ends. """
+        path = tempfile.TemporaryDirectory()
+        self.addCleanup(path.cleanup)
+        patcher = mock.patch.object(sys, "path", [path.name, *sys.path])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in module_names:
+            self.addCleanup(sys.modules.pop, name, None)
+        return Path(path.name)
+
     def analyze_line(self, line, complete_src=False):
         entry_point, _ = analyze_module(module_from_src(line, complete_src))
         module = entry_point.container
@@ -235,15 +235,24 @@ class _list[V](_object):
         pass
 
 
+def dict_op(object_src, map_src):
+    def inline(_self_cls, **kwargs):
+        src = map_src if _self_cls.js_repr == "Map" else object_src
+        return src.format(**kwargs)
+    return inline
+
+
 class _dict[K, V](_object):
 
+    @js(inline=dict_op("Object.keys({self})", "{self}.keys()"))
     def keys(self) -> Iterable[K]:
         pass
 
+    @js(inline=dict_op("Object.values({self})", "{self}.values()"))
     def values(self) -> Iterable[V]:
         pass
 
-    @js(inline="{self}.entries()")
+    @js(inline=dict_op("Object.entries({self})", "{self}.entries()"))
     def items(self) -> Iterable[tuple[K,V]]:
         pass
 
@@ -251,23 +260,26 @@ class _dict[K, V](_object):
     def set(self, key: K, value: V):
         pass
 
-    @js(inline="{self}?.size")
+    @js(inline=dict_op("Object.keys({self}).length", "{self}?.size"))
     def __bool__(self) -> bool:
         pass
 
-    @js(inline="{self}[{key}]")
+    @js(inline=dict_op("{self}[{key}]", "{self}.get({key})"))
     def __getitem__(self, key: K) -> V:
         pass
 
-    @js(inline="{self}.has({key}) ? {self}[{key}] : {default}")
+    @js(inline=dict_op(
+        "(Object.hasOwn({self}, {key}) ? {self}[{key}] : {default})",
+        "({self}.has({key}) ? {self}.get({key}) : {default})"
+    ))
     def get(self, key: K, default: V) -> V:
         pass
 
-    @js(inline="{self}[{key}] = {value}")
+    @js(inline=dict_op("{self}[{key}] = {value}", "{self}.set({key}, {value})"))
     def __setitem__(self, key: K, value: V) -> V:
         pass
 
-    @js(inline="{self}.has({key})")
+    @js(inline=dict_op("Object.hasOwn({self}, {key})", "{self}.has({key})"))
     def __contains__(self, key: K) -> bool:
         pass
 
@@ -280,8 +292,10 @@ def _len(obj, _arg_types, **kwargs):
     arg_type = _arg_types[0].generic_name
     if arg_type in ("str", "list"):
         return f"{obj}.length"
-    elif arg_type == "dict":
+    elif arg_type == "dict" and _arg_types[0].js_repr == "Map":
         return f"{obj}.size"
+    elif arg_type == "dict":
+        return f"Object.keys({obj}).length"
     return NotImplemented
 
 
@@ -289,11 +303,17 @@ def _len(obj, _arg_types, **kwargs):
 def _isinstance(obj: object, obj_type: type) -> bool:
     pass
 @_isinstance.inline
-def _isinstance(obj, obj_type, **kwargs):
+def _isinstance(obj, obj_type, _arg_types, **kwargs):
     if obj_type == "list":
         return f"Array.isArray({obj})"
     elif obj_type == "dict":
-        return f"({obj} instanceof Map)"
+        obj_types = getattr(_arg_types[0], "types", [_arg_types[0]])
+        reprs = {t.js_repr for t in obj_types if getattr(t, "generic_name", None) == "dict"}
+        if reprs == {"Object"}:
+            return f"({obj}?.constructor === Object)"
+        elif reprs == {"Map"}:
+            return f"({obj} instanceof Map)"
+        return f"({obj} instanceof Map || {obj}?.constructor === Object)"
     elif obj_type == "int":
         return f"Number.isInteger({obj})"
     elif obj_type == "float":
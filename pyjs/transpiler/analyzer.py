@@ -1,7 +1,54 @@
 from typing import Iterator
+from math import prod
+import itertools
+import threading
 from graphlib import TopologicalSorter
 
+from pyjs.domx import CustomElement
 from .objects import *
+from .stats import phase, count
+
+
+def dotted_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        return f"{dotted_name(node.value)}.{node.attr}"
+    return ast.unparse(node)
+
+
+def bind_symbols(func: Function) -> dict[str, Object]:
+    """
+    Names a function reads but never binds can only refer to the enclosing
+    class, module or builtins scope, so they are resolved once up front
+    instead of walking the scope chain on every use. The compiler already
+    sorted the function's names into locals and globals, its code object
+    says which is which, including names bound by a local import.
+    """
+    code = getattr(inspect.unwrap(func.py_func), "__code__", None)
+    if code is None:
+        return {}
+    reads, local = free_names(code)
+    args = func.original_node.args
+    for annotation in [arg.annotation for arg in args.args + args.kwonlyargs] + [func.original_node.returns]:
+        if isinstance(annotation, ast.Name):
+            reads.add(annotation.id)
+    symbols = {}
+    for name in reads - local - func.scope.names.keys():
+        if (obj := func.scope.parent.resolve(name)) is not None:
+            symbols[name] = obj
+    return symbols
+
+
+def free_names(code) -> tuple[set[str], set[str]]:
+    """ Global (and attribute) names used by code and its nested code objects, and every name they bind. """
+    reads, local = set(code.co_names), {*code.co_varnames, *code.co_cellvars}
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            nested_reads, nested_local = free_names(const)
+            reads |= nested_reads
+            local |= nested_local
+    return reads, local
 
 
 class InferenceVisitor(ast.NodeVisitor):
@@ -45,22 +92,20 @@ class InferenceVisitor(ast.NodeVisitor):
 
     def make_assignment(self, target, value_type: Class, value):
         if isinstance(target, ast.Attribute):
-            try:
-                target = self.visit(target)
-            except (NameError, DependencyError) as e:
-                parent = self.visit(target.value)
-                assert isinstance(parent.obj, Instance)
-                if parent.obj.name == "self":
-                    attr = value_type(target.attr, parent.obj.scope, parent.obj)
-                    parent.obj.add(attr)
-                    target = Attribute(
-                        attr,
-                        value=parent,
-                        attr=target.attr,
-                        lineno=target.lineno
-                    )
-                else:
-                    raise e
+            parent = self.visit(target.value)
+            if (attr := self.find_attribute(parent, target)) is not None:
+                target = Attribute(attr, value=parent, attr=target.attr, lineno=target.lineno)
+            elif isinstance(parent.obj, Instance) and parent.obj.name == "self":
+                attr = value_type(target.attr, parent.obj.scope, parent.obj)
+                parent.obj.add(attr)
+                target = Attribute(
+                    attr,
+                    value=parent,
+                    attr=target.attr,
+                    lineno=target.lineno
+                )
+            else:
+                self.missing_attribute(parent, target)
             if target.obj.cls is not value_type:
                 # check if the attribute was found on a super()
                 # instead of in the current instance self, child
@@ -88,8 +133,7 @@ class InferenceVisitor(ast.NodeVisitor):
                 lineno=target.lineno
             )
         elif isinstance(target, ast.Name):
-            try:
-                self.scope.lookup(target.id)
+            if self.scope.resolve_local(target.id) is not None:
                 # TODO: validate that looked up existing value type matches new value type
                 types_match = True
                 if not types_match:
@@ -101,7 +145,7 @@ class InferenceVisitor(ast.NodeVisitor):
                     type_comment=None,
                     lineno=target.lineno
                 )
-            except NameError:
+            else:
                 if not value_type:
                     raise TypeError(
                         "Concrete type could not be determined from type annotation or value."
@@ -136,7 +180,9 @@ class InferenceVisitor(ast.NodeVisitor):
         value = self.visit(value_ast)
         if isinstance(annotation, Class):
             # validate that annotation_value_type and value_type match
-            pass
+            if isinstance(value, (List, Dict)) and isinstance(value.obj, GenericClass):
+                # empty literal, concrete type comes from the annotation
+                value.obj = annotation
         elif isinstance(value.obj, Class):
             annotation = value.obj
         elif isinstance(value.obj, (Instance, Function)):
@@ -164,20 +210,22 @@ class InferenceVisitor(ast.NodeVisitor):
         )
         return self.assign_name_value([node.target], bin_op_value, None)
 
+    def find_attribute(self, value, node: ast.Attribute):
+        """ Narrowed (eg. `self.x` after isinstance()) or declared attribute, None if missing. """
+        if (attr := self.scope.resolve_local(dotted_name(node))) is not None:
+            return attr
+        return value.obj.try_find(node.attr)
+
+    def missing_attribute(self, value, node: ast.Attribute):
+        value_init = value.obj.cls.init
+        if value_init and not value_init.is_analyzed:
+            raise DependencyError(value_init)
+        raise NameError(f"Can't find {node.attr} on {value.obj.cls.name} class.")
+
     def visit_Attribute(self, node: ast.Attribute):
         value = self.visit(node.value)
-        try:
-            maybe_narrowed_attr = ast.unparse(node)
-            attr = self.scope.lookup(maybe_narrowed_attr)
-        except NameError:
-            try:
-                attr = value.obj.find(node.attr)
-            except NameError:
-                value_init = value.obj.cls.init
-                if value_init and not value_init.is_analyzed:
-                    raise DependencyError(value_init)
-                raise
-
+        if (attr := self.find_attribute(value, node)) is None:
+            self.missing_attribute(value, node)
         return Attribute(
             attr,
             value=value,
@@ -186,7 +234,8 @@ class InferenceVisitor(ast.NodeVisitor):
         )
 
     def visit_Name(self, node: ast.Name):
-        value = self.scope.search(node.id)
+        # isinstance() narrows names, global ones too, into a nested scope
+        value = self.scope is self.func.scope and self.func.symbols.get(node.id) or self.scope.search(node.id)
         if node.id == "super":
             return Name(value, id="super")
         elif node.id == "cls" and self.func.cls == value:
@@ -247,7 +296,7 @@ class InferenceVisitor(ast.NodeVisitor):
             return_type = func.obj
         elif isinstance(func.obj, GenericClass):
             # types were not passed, try creating from args
-            return_type = func.obj.from_call([a.obj for a in args])
+            return_type = concrete_class(func.obj, *func.obj.type_args([a.obj for a in args]))
             func = Name(return_type)
         else:
             raise NotImplementedError(f"Don't know how to handle {func.obj} call.")
@@ -255,6 +304,8 @@ class InferenceVisitor(ast.NodeVisitor):
         return Call(return_type, func=func, args=args, keywords=keywords)
 
     def visit_FunctionDef(self, node: ast.FunctionDef):
+        if self.func.symbols is None:
+            self.func.symbols = bind_symbols(self.func)
         self.func.params = []
         self.func.vararg = None
         self.func.kwarg = None
@@ -297,14 +348,14 @@ class InferenceVisitor(ast.NodeVisitor):
             if param == node.args.vararg:
                 if annotation_type is None:
                     annotation_type = BUILTINS.search("object")
-                arg_type = BUILTINS.search("tuple")(annotation_type)
+                arg_type = concrete_class(BUILTINS.search("tuple"), annotation_type)
                 self.func.vararg = ast.arg(arg=node.args.vararg.arg, annotation=Name(arg_type))
             elif param == node.args.kwarg:
                 key_type = BUILTINS.search("str")
                 value_type = annotation_type
                 if value_type is None:
                     value_type = BUILTINS.search("object")
-                arg_type = BUILTINS.search("dict")(key_type, value_type)
+                arg_type = concrete_class(BUILTINS.search("dict"), key_type, value_type)
                 self.func.kwarg = ast.arg(arg=node.args.kwarg.arg, annotation=Name(arg_type))
             else:
                 arg_type = annotation_type or default_value_type
@@ -344,7 +395,7 @@ class InferenceVisitor(ast.NodeVisitor):
             else:
                 raise NotImplementedError()
             assert isinstance(value.obj, GenericClass)
-            return Name(value.obj(*item_types))  # generic class -> concrete class
+            return Name(concrete_class(value.obj, *item_types))
         elif isinstance(node, ast.BinOp):
             types: list[Class] = []
             binop = node
@@ -427,24 +478,22 @@ class InferenceVisitor(ast.NodeVisitor):
         right = self.visit(node.comparators[0])
         right_self = right.obj if isinstance(right.obj, Instance) else right.obj._self
         if isinstance(node.ops[0], (ast.In, ast.NotIn)):
+            left, right = right, left
             left_self, right_self = right_self, left_self
 
         left_op_method, right_op_method = self.COMPARE_OPS[type(node.ops[0])]
 
-        try:
-            func = left_self.find(left_op_method)
-            assert isinstance(func, Function)
-            if func.cls.name == "object":
-                # for __eq__, __ne__, etc, Python checks the
-                # right side before falling back to object
-                raise NameError
-        except NameError as e:
+        func = left_self.try_find(left_op_method)
+        assert func is None or isinstance(func, Function)
+        # for __eq__, __ne__, etc, Python checks the
+        # right side before falling back to object
+        if func is None or func.cls.name == "object":
             if isinstance(node.ops[0], (ast.In, ast.NotIn)):
-                raise e
+                raise NameError(f"Can't find {left_op_method} on {left_self.cls.name} class.")
             func = right_self.find(right_op_method)
             if func.cls.name != "object":
                 left, right = right, left
-        return Call(
+        call = Call(
             func.return_type,
             func=Attribute(
                 func,
@@ -454,6 +503,9 @@ class InferenceVisitor(ast.NodeVisitor):
             args=[right],
             keywords=[]
         )
+        if isinstance(node.ops[0], ast.NotIn):
+            return UnaryOp(func.return_type, op=ast.Not(), operand=call)
+        return call
 
     BIN_OPS = {
         ast.Add: ("__add__", "__radd__"),
@@ -470,13 +522,10 @@ class InferenceVisitor(ast.NodeVisitor):
         right = self.visit(node.right)
         right_self = right.obj if isinstance(right.obj, Instance) else right.obj._self
         left_op_method, right_op_method = self.BIN_OPS[type(node.op)]
-        try:
-            func = left_self.find(left_op_method)
-            assert isinstance(func, Function)
-            if func.params[0].annotation.id != right_self.cls.name:
-                # this is the equivalent of the op function returning NotImplemented
-                raise NameError
-        except NameError:
+        func = left_self.try_find(left_op_method)
+        assert func is None or isinstance(func, Function)
+        # a param type mismatch is the equivalent of the op function returning NotImplemented
+        if func is None or func.params[0].annotation.id != right_self.cls.name:
             func = right_self.find(right_op_method)
             left, right = right, left
         return Call(
@@ -551,7 +600,7 @@ class InferenceVisitor(ast.NodeVisitor):
             elt = self.visit(item)
             elts.append(elt)
             types.append(elt.obj.type)
-        tuple_type = generic_tuple(*types)
+        tuple_type = concrete_class(generic_tuple, *types)
         return Tuple(tuple_type, elts=elts)
 
     def visit_List(self, node: ast.List):
@@ -563,7 +612,7 @@ class InferenceVisitor(ast.NodeVisitor):
             elt = self.visit(item)
             elts.append(elt)
             V.add(elt.obj.type)
-        list_type = generic_list(V.type) if V.types else generic_list
+        list_type = concrete_class(generic_list, V.type) if V.types else generic_list
         return List(list_type, elts=elts)
 
     def visit_Dict(self, node: ast.Dict):
@@ -575,7 +624,7 @@ class InferenceVisitor(ast.NodeVisitor):
             K.add(keys[-1].obj)
             values.append(self.visit(value))
             V.add(values[-1].obj.type)
-        dict_type = generic_dict(K.type, V.type) if K.types and V.types else generic_dict
+        dict_type = concrete_class(generic_dict, K.type, V.type) if K.types and V.types else generic_dict
         return Dict(dict_type, keys=keys, values=values)
 
     # endregion
@@ -627,8 +676,9 @@ class InferenceVisitor(ast.NodeVisitor):
         )
 
     def visit_ListComp(self, node: ast.ListComp):
+        # build a new comprehension, the original node is shared through the source index
         gen = node.generators[0]
-        gen.iter = self.visit(gen.iter)
+        gen = ast.comprehension(target=gen.target, iter=self.visit(gen.iter), ifs=gen.ifs, is_async=gen.is_async)
         if isinstance(gen.target, ast.Name):
             iter_cls = gen.iter.obj
             if isinstance(iter_cls, Instance):
@@ -645,10 +695,10 @@ class InferenceVisitor(ast.NodeVisitor):
         target = self.visit(gen.target)
         elt = self.visit(node.elt)
         return ListComp(
-            BUILTINS.search("list")(item_type),
+            concrete_class(BUILTINS.search("list"), item_type),
             elt=elt,
             target=target,
-            generators=node.generators,
+            generators=[gen],
         )
 
     # endregion
@@ -693,9 +743,9 @@ class InferenceVisitor(ast.NodeVisitor):
             if isinstance(value_type, GenericClass):
                 obj_type = BUILTINS.search("object")
                 if value_type.name == "dict":
-                    value_type = BUILTINS.search("dict")(obj_type, obj_type)
+                    value_type = concrete_class(BUILTINS.search("dict"), obj_type, obj_type)
                 elif value_type.name == "list":
-                    value_type = BUILTINS.search("list")(obj_type)
+                    value_type = concrete_class(BUILTINS.search("list"), obj_type)
                 else:
                     raise NotImplementedError
             narrowed = self.narrow()
@@ -752,29 +802,235 @@ class InferenceVisitor(ast.NodeVisitor):
     # endregion
 
 
-class CallGraphVisitor(ast.NodeVisitor):
+TAILWIND_MAX_COMBINATIONS = 256
+
+
+class UnresolvedString(Exception):
+    """ The expression's value is only known at runtime. """
+
+
+class ParameterString(Exception):
+    """ The expression depends on a parameter of func, its call sites can resolve it. """
 
-    def __init__(self, func: Function, entry_point: Function):
+    def __init__(self, func: Function):
+        super().__init__(func.name)
+        self.func = func
+
+
+def param_names(func: Function) -> list[str]:
+    names = [p.arg for p in func.params]
+    if func.vararg is not None:
+        names.append(func.vararg.arg)
+    return names
+
+
+def local_values(func: Function, name: str) -> list[ast.expr]:
+    """ Expressions assigned to a local variable, None if it's bound any other way. """
+    values = []
+    for stmt in func.body:
+        for node in ast.walk(stmt):
+            if isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                if any(isinstance(t, ast.Name) and t.id == name for t in targets):
+                    if node.value is None:
+                        continue
+                    if len(targets) != 1:
+                        return None
+                    values.append(node.value)
+                elif any(name in {n.id for n in ast.walk(t) if isinstance(n, ast.Name)} for t in targets):
+                    return None
+            elif isinstance(node, (ast.AugAssign, ast.For, ast.comprehension, ast.NamedExpr)):
+                if name in {n.id for n in ast.walk(node.target) if isinstance(n, ast.Name)}:
+                    return None
+    return values or None
+
+
+def static_strings(func: Function, node: ast.expr, bindings: dict, depth=0) -> set[str]:
+    """
+    The strings an expression can evaluate to, following module constants,
+    local assignments, conditionals, f-strings and concatenation. Parameters
+    are looked up in bindings, a map of (function, parameter) to the
+    (function, argument) passed at a call site.
+    """
+    if depth > 32:
+        raise UnresolvedString(node)
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, (str, int)) and not isinstance(node.value, bool):
+            return {str(node.value)}
+        raise UnresolvedString(node)
+    if isinstance(node, ast.IfExp):
+        return static_strings(func, node.body, bindings, depth + 1) | static_strings(func, node.orelse, bindings, depth + 1)
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.Or):
+        return set().union(*(static_strings(func, value, bindings, depth + 1) for value in node.values))
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return combine_strings(node, [
+            static_strings(func, node.left, bindings, depth + 1), static_strings(func, node.right, bindings, depth + 1)
+        ])
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "__add__":
+        return combine_strings(node, [
+            static_strings(func, node.func.value, bindings, depth + 1),
+            static_strings(func, node.args[0], bindings, depth + 1),
+        ])
+    if isinstance(node, ast.Call) and isinstance(callee := getattr(node.func, "obj", None), Function):
+        # helpers returning classes, eg. button_classes(primary=True)
+        returns = [
+            n.value for stmt in callee.body for n in ast.walk(stmt) if isinstance(n, ast.Return) and n.value
+        ]
+        if not callee.is_analyzed or not returns:
+            raise UnresolvedString(node)
+        bindings = bindings | call_bindings(func, callee, node)
+        return set().union(*(static_strings(callee, value, bindings, depth + 1) for value in returns))
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                if value.format_spec is not None or value.conversion not in (-1, ord("s")):
+                    raise UnresolvedString(node)
+                value = value.value
+            parts.append(static_strings(func, value, bindings, depth + 1))
+        return combine_strings(node, parts)
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        obj = getattr(node, "obj", None)
+        if isinstance(obj, Instance) and obj.is_const:
+            if isinstance(obj.py_value, (str, int)) and not isinstance(obj.py_value, bool):
+                return {str(obj.py_value)}
+            if obj.static_value is not None:
+                return static_strings(func, obj.static_value, bindings, depth + 1)
+        if isinstance(node, ast.Name) and obj is not None and obj.container is func:
+            if node.id in param_names(func):
+                if (func, node.id) not in bindings:
+                    raise ParameterString(func)
+                arg_func, arg = bindings[func, node.id]
+                return static_strings(arg_func, arg, bindings, depth + 1)
+            if (values := local_values(func, node.id)) is not None:
+                return set().union(*(static_strings(func, value, bindings, depth + 1) for value in values))
+    raise UnresolvedString(node)
+
+
+def combine_strings(node: ast.expr, parts: list[set[str]]) -> set[str]:
+    if prod(len(part) for part in parts) > TAILWIND_MAX_COMBINATIONS:
+        raise UnresolvedString(node)
+    return {"".join(combination) for combination in itertools.product(*parts)}
+
+
+def call_bindings(caller: Function, func: Function, call: ast.Call) -> dict:
+    """ Map (func, parameter) to (caller, argument expression) for a call. """
+    names = [p.arg for p in func.params]
+    bindings = {}
+    for name, arg in zip(names, call.args):
+        if isinstance(arg, ast.Starred):
+            break
+        bindings[func, name] = (caller, arg)
+    for name, default in zip(names[len(names) - len(func.defaults):], func.defaults):
+        bindings.setdefault((func, name), (func, default))
+    for keyword in call.keywords:
+        if keyword.arg in names:
+            bindings[func, keyword.arg] = (caller, keyword.value)
+    return bindings
+
+
+class CallGraphVisitor(ast.NodeVisitor):
+    """
+    Marks everything reachable from the entry point as visited and records
+    why each object was kept in `entry_point.reasons` as (reason, source).
+    Methods marked with @js(include=True) (eg. custom element lifecycle
+    callbacks) are only pulled in when their class is actually instantiated.
+    When code splitting, @js(lazy=True) classes cut the graph, each is
+    visited afterwards from its own root with its own bit. Bits are per
+    analysis: the entry point has the first one, lazy roots the next ones.
+    """
+
+    def __init__(self, func: Function, entry_point: Function, bit: int = None, root: Class = None):
         self.func = func
         self.entry_point = entry_point
+        self.bit = entry_point.entry_bit if bit is None else bit
+        self.root = root
 
     @classmethod
     def start(cls, func: Function):
-        cls(func, func).enter(func)
+        visitor = cls(func, func)
+        visitor.keep(func, "entry point", None)
+        visitor.enter(func)
+        cls.visit_lazy(func)
+
+    @classmethod
+    def visit_lazy(cls, entry_point: Function):
+        if entry_point.lazy is not None:
+            started = set()
+            while pending := [c for c in entry_point.lazy if c not in started]:
+                for lazy_cls in pending:
+                    started.add(lazy_cls)
+                    visitor = cls(lazy_cls.find("__init__"), entry_point, entry_point.lazy[lazy_cls], lazy_cls)
+                    visitor.instantiate(lazy_cls)
 
-    def enter(self, func: Function):
+    @classmethod
+    def visit_islands(cls, entry_point: Function):
+        """
+        The entry point only runs on the server, start over from the custom
+        elements it instantiated which do something once hydrated.
+        """
+        objs = [obj for module in entry_point.container.container.values() for obj in walk_objects(module)]
+        islands = [
+            obj for obj in objs if isinstance(obj, Class) and obj.instantiated & entry_point.entry_bit and is_island(obj)
+        ]
+        for obj in objs:
+            obj.visited &= ~entry_point.entry_bit
+            if isinstance(obj, Class):
+                obj.instantiated &= ~entry_point.entry_bit
+        entry_point.reasons = {}
+        module = entry_point.container
+        for island in islands:
+            count("islands")
+            visitor = cls(entry_point, entry_point)
+            visitor.keep(island, "interactive, rendered by", entry_point)
+            visitor.instantiate(island)
+            if island.container is not module:
+                # the entry module loads the islands since nothing else it has is shipped
+                imported = module.imported.setdefault(island.container.name, [])
+                if island not in imported:
+                    imported.append(island)
+        cls.visit_lazy(entry_point)
+
+    def defer(self, cls: Class) -> bool:
+        if self.entry_point.lazy is None or cls is self.root or not has_lazy_decorator(cls.py_cls):
+            return False
+        if cls not in self.entry_point.lazy:
+            count("lazy chunks")
+            self.keep(cls, "lazy, loaded on first use by", self.func)
+            self.entry_point.lazy[cls] = self.entry_point.entry_bit << len(self.entry_point.lazy) + 1
+        return True
+
+    def keep(self, obj: Object, reason: str, source: Object):
+        self.entry_point.reasons.setdefault(obj, (reason, source))
+
+    def enter(self, func: Function, reason="called by"):
+        if func.cls is not None and self.defer(func.cls):
+            return
+        self.keep(func, reason, self.func)
         if func.cls is not None:
-            self.enter_class(func.cls)
+            self.enter_class(func.cls, reason="method used by")
         self.isolated_visit(func)
 
-    def enter_class(self, cls: Class):
+    def enter_class(self, cls: Class, instantiate=False, reason="referenced by"):
+        if self.defer(cls):
+            return False
+        source = self.func
         while cls is not None:
-            if self.entry_point not in cls.visited:
-                cls.visited.add(self.entry_point)
+            self.keep(cls, reason, source)
+            cls.visited |= self.bit
+            if instantiate and not cls.instantiated & self.bit:
+                cls.instantiated |= self.bit
                 for attr in cls.children:
                     if has_include_decorator(attr.py_obj) or self.parent_has_include(attr):
+                        self.keep(attr, "include=True on instantiated", cls)
                         self.isolated_visit(attr)
+            reason, source = "base class of", cls
             cls = cls.super
+        return True
+
+    def instantiate(self, cls: Class):
+        if self.enter_class(cls, instantiate=True, reason="instantiated by"):
+            self.enter(cls.find("__init__"))
 
     def parent_has_include(self, obj):
         if isinstance(obj, Function):
@@ -788,80 +1044,540 @@ class CallGraphVisitor(ast.NodeVisitor):
 
     def isolated_visit(self, func: Function):
         assert isinstance(func, Function)
-        if not has_source_decorator(func.py_func) and self.entry_point not in func.visited:
-            type(self)(func, self.entry_point).visit(func.node)
+        if not has_source_decorator(func.py_func) and not func.visited & self.bit:
+            type(self)(func, self.entry_point, self.bit, self.root).visit(func.node)
 
     def visit_FunctionDef(self, node: FunctionDef):
-        node.obj.visited.add(self.entry_point)
+        node.obj.visited |= self.bit
         for arg in node.args.args:
             self.visit(arg)
         for stmt in node.body:
             self.visit(stmt)
 
     def visit_Call(self, node: ast.Call):
-        if isinstance(node.func, Name) and node.func.id == "tw":
-            self.entry_point.tailwind_classes.update(
-                set(node.args[0].value.split(" "))
-            )
         func = node.func.obj
         if isinstance(func, Function):
             self.enter(func)
         elif isinstance(func, Class):
-            self.enter_class(func)
-            self.enter(func.find("__init__"))
+            self.instantiate(func)
+            func = func.find("__init__")
         else:
             raise NotImplementedError(f"Can't call {node.func}.")
+        if forwarded := self.entry_point.tailwind_forwarded.get(func):
+            self.entry_point.tailwind_resolved.add(func)
+            bindings = call_bindings(self.func, func, node)
+            for expr_func, expr, expr_bindings in list(forwarded):
+                self.extract_classes(expr_func, expr, expr_bindings | bindings)
+        self.generic_visit(node)
+
+    def visit_Dict(self, node: ast.Dict):
+        # tw() returns {"class": classes}, so its call sites are resolved like any other helper's
+        for key, value in zip(node.keys, node.values):
+            if isinstance(key, ast.Constant) and key.value == "class":
+                self.extract_classes(self.func, value, {})
         self.generic_visit(node)
 
+    def extract_classes(self, func: Function, expr: ast.expr, bindings: dict):
+        try:
+            for value in static_strings(func, expr, bindings):
+                self.entry_point.tailwind_classes.update(value.split())
+        except ParameterString as e:
+            if e.func is self.func:
+                self.entry_point.tailwind_forwarded.setdefault(self.func, []).append((func, expr, bindings))
+            else:
+                self.unresolved_classes(expr)
+        except UnresolvedString as e:
+            self.unresolved_classes(e.args[0])
+
+    def unresolved_classes(self, expr: ast.expr):
+        count("tailwind unresolved classes")
+        location = f"{self.func.container.name}.{self.func.name}"
+        if self.func.cls is not None:
+            location = f"{self.func.cls.container.name}.{self.func.cls.name}.{self.func.name}"
+        self.entry_point.tailwind_unresolved.add(f"{location}: {ast.unparse(expr)}")
+
     def visit_Attribute(self, node: ast.Attribute):
         if isinstance(node.obj, Function):
             self.enter(node.obj)
         elif isinstance(node.obj, Instance):
-            node.obj.visited.add(self.entry_point)
+            self.keep(node.obj, "referenced by", self.func)
+            node.obj.visited |= self.bit
         self.generic_visit(node)
 
     def visit_Name(self, node: Name):
         if hasattr(node, 'obj'):
             if isinstance(node.obj, Class):
                 self.enter_class(node.obj)
-                self.enter(node.obj.find("__init__"))
             elif isinstance(node.obj, Function):
                 self.enter(node.obj)
             elif isinstance(node.obj, UnionType):
                 for obj_type in node.obj.types:
                     self.enter_class(obj_type)
-                    self.enter(obj_type.find("__init__"))
             else:
-                node.obj.visited.add(self.entry_point)
+                self.keep(node.obj, "referenced by", self.func)
+                node.obj.visited |= self.bit
+
+
+# custom element callbacks which run on the client once an element is hydrated
+CLIENT_CALLBACKS = {
+    "initialize", "connectedCallback", "disconnectedCallback", "attributeChangedCallback", "adoptedCallback"
+}
+
+
+def is_island(cls: Class) -> bool:
+    """ Whether a custom element listens to events or has client side lifecycle code of its own. """
+    while cls is not None and issubclass(cls.py_cls, CustomElement) and cls.py_cls is not CustomElement:
+        for attr in cls.children:
+            if not isinstance(attr, Function) or attr.container is not cls:
+                continue
+            if attr.name in CLIENT_CALLBACKS or has_include_decorator(attr.py_func):
+                return True
+            for node in ast.walk(attr.original_node):
+                if (
+                    isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and
+                    node.func.attr == "addEventListener"
+                ):
+                    return True
+        cls = cls.super
+    return False
+
+
+def walk_objects(parent: Object) -> Iterator[Object]:
+    yield parent
+    if isinstance(parent, (Module, Class)):
+        for obj in parent.children:
+            if obj.container is parent:
+                yield from walk_objects(obj)
+    elif isinstance(parent, GenericClass):
+        for obj in parent.concrete_classes.values():
+            yield from walk_objects(obj)
+
+
+INLINE_AUTO_THRESHOLD = 12
+MAX_SAFE_INTEGER = 2**53 - 1
+FOLD_MAX_STR_LENGTH = 1024
+
+
+def clone(node):
+    """ Copy an analyzed tree, sharing the attached `obj` references. """
+    if isinstance(node, list):
+        return [clone(n) for n in node]
+    if not isinstance(node, ast.AST):
+        return node
+    new = type(node).__new__(type(node))
+    new.__dict__.update(node.__dict__)
+    for field, value in ast.iter_fields(node):
+        setattr(new, field, clone(value))
+    return new
+
+
+def walk_in_order(node):
+    yield node
+    for child in ast.iter_child_nodes(node):
+        yield from walk_in_order(child)
+
+
+def is_simple(node):
+    return isinstance(node, (ast.Constant, ast.Name))
+
+
+def has_no_side_effects(node):
+    """ Whether evaluating node earlier, later or not at all can't be observed. """
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(has_no_side_effects(e) for e in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(
+            k is not None and has_no_side_effects(k) and has_no_side_effects(v) for k, v in zip(node.keys, node.values)
+        )
+    if isinstance(node, ast.Call):
+        func = getattr(node.func, "obj", None)
+        return (
+            isinstance(func, Function) and has_pure_decorator(func.py_func) and
+            all(has_no_side_effects(a) for a in node.args) and all(has_no_side_effects(k.value) for k in node.keywords)
+        )
+    return is_simple(node)
+
+
+def is_literal(node):
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(is_literal(e) for e in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(k is not None and is_literal(k) and is_literal(v) for k, v in zip(node.keys, node.values))
+    return isinstance(node, ast.Constant)
+
+
+class ConstantFolder(ast.NodeTransformer):
+    """
+    Evaluates operators on literal operands and f-string parts with literal
+    values at compile time, following the semantics of the emitted JS.
+    """
+
+    FOLD_OPS = {
+        ("int", "__add__"): lambda a, b: a + b,
+        ("int", "__radd__"): lambda a, b: b + a,
+        ("int", "__sub__"): lambda a, b: a - b,
+        ("int", "__rsub__"): lambda a, b: b - a,
+        ("int", "__mul__"): lambda a, b: a * b,
+        ("int", "__rmul__"): lambda a, b: b * a,
+        ("int", "__floordiv__"): lambda a, b: a // b,
+        ("int", "__rfloordiv__"): lambda a, b: b // a,
+        ("str", "__add__"): lambda a, b: a + b,
+        ("str", "__mul__"): lambda a, b: a * b,
+        ("str", "__rmul__"): lambda a, b: b * a,
+    }
+
+    @staticmethod
+    def constant(value):
+        return Constant(BUILTINS.search(type(value).__name__), value=value)
+
+    @staticmethod
+    def is_foldable(value):
+        if type(value) is int:
+            return abs(value) <= MAX_SAFE_INTEGER
+        return type(value) is str and len(value) <= FOLD_MAX_STR_LENGTH
+
+    def visit_Constant(self, node):
+        # skips NodeVisitor's lookup of the deprecated visit_Num and friends
+        return node
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+        return self.fold_call(node)
+
+    def fold_call(self, node: ast.Call):
+        method = getattr(node.func, "obj", None)
+        if (
+            not isinstance(node.func, Attribute) or
+            not isinstance(method, Function) or
+            method.cls is None or
+            method.cls.container is not BUILTINS or
+            len(node.args) != 1 or
+            node.keywords or
+            not isinstance(node.func.value, ast.Constant) or
+            not isinstance(node.args[0], ast.Constant)
+        ):
+            return node
+        op = self.FOLD_OPS.get((method.cls.name, method.name))
+        left, right = node.func.value.value, node.args[0].value
+        if op is None or not self.is_foldable(left) or not self.is_foldable(right):
+            return node
+        try:
+            value = op(left, right)
+        except (TypeError, ZeroDivisionError):
+            return node
+        if not self.is_foldable(value):
+            return node
+        return self.constant(value)
+
+    def visit_JoinedStr(self, node: ast.JoinedStr):
+        self.generic_visit(node)
+        values = []
+        for part in node.values:
+            if isinstance(part, ast.FormattedValue):
+                part = self.fold_formatted_value(part)
+            if isinstance(part, ast.Constant) and values and isinstance(values[-1], ast.Constant):
+                values[-1] = self.constant(values[-1].value + part.value)
+            else:
+                values.append(part)
+        if not values:
+            return self.constant("")
+        if len(values) == 1 and isinstance(values[0], ast.Constant):
+            return values[0]
+        node.values = values
+        return node
 
+    def fold_formatted_value(self, node: ast.FormattedValue):
+        if node.conversion != -1 or not isinstance(node.value, ast.Constant):
+            return node
+        value = node.value.value
+        if type(value) not in (int, str) or not self.is_foldable(value):
+            return node
+        spec = static_format_spec(node)
+        if spec is None:
+            return node
+        try:
+            return self.constant(format(value, spec))
+        except ValueError:
+            return node
+
+
+def static_format_spec(node: ast.FormattedValue) -> str | None:
+    """ The format spec of an f-string placeholder if it is a literal, else None. """
+    if node.format_spec is None:
+        return ""
+    if isinstance(node.format_spec, ast.Constant):
+        return node.format_spec.value
+    if all(isinstance(v, ast.Constant) for v in node.format_spec.values):
+        return "".join(v.value for v in node.format_spec.values)
+    return None
+
+
+class Inliner(ConstantFolder):
+    """
+    Replaces calls to small module level functions, whose body is a single
+    `return <expr>`, with that expression, folding constants on the way
+    (see ConstantFolder). Functions can opt out with
+    @js(inline_auto=False). Objects referenced by the resulting tree are
+    collected in referenced, candidates is shared to look at each callee
+    once per build.
+    """
+
+    def __init__(self, func: Function, stack=(), candidates: dict = None):
+        self.func = func
+        self.module = self.module_of(func)
+        self.stack = stack
+        self.candidates = {} if candidates is None else candidates
+        self.inlined: set[Function] = set()
+        self.referenced: set[Object] = set()
+
+    @staticmethod
+    def module_of(obj: Object) -> Module:
+        while not isinstance(obj, Module):
+            obj = obj.container
+        return obj
+
+    def inline_candidate(self, func: Function):
+        """ The inlinable expression of func and the names it uses besides its parameters, or None. """
+        if func not in self.candidates:
+            expr = self.inline_expr(func)
+            free_names = None
+            if expr is not None:
+                free_names = {
+                    n.id for n in ast.walk(expr)
+                    if isinstance(n, ast.Name) and getattr(getattr(n, "obj", None), "container", None) is not func
+                }
+            self.candidates[func] = None if expr is None else (expr, free_names)
+        return self.candidates[func]
+
+    @staticmethod
+    def inline_expr(func: Function):
+        if (
+            isinstance(func.container, Module) and
+            func.is_analyzed and
+            func.kwarg is None and
+            len(func.body) == 1 and
+            isinstance(func.body[0], ast.Return) and
+            func.body[0].value is not None and
+            should_analyze_func_body(func.py_func) and
+            allows_inline_auto(func.py_func) and
+            not has_include_decorator(func.py_func) and
+            not getattr(func.py_func, "__builtin__", False)
+        ):
+            expr = func.body[0].value
+            nodes = [n for n in ast.walk(expr) if isinstance(n, ast.expr)]
+            if len(nodes) <= INLINE_AUTO_THRESHOLD and not any(
+                isinstance(n, (ast.Lambda, ast.ListComp)) or
+                (isinstance(n, ast.Call) and getattr(n.func, "obj", None) is func)
+                for n in nodes
+            ):
+                return expr
+
+    def bind_arguments(self, func: Function, call: ast.Call):
+        """ Map parameter names to argument expressions, None if too complicated. """
+        if call.keywords:
+            return None
+        args = list(call.args)
+        starred = [i for i, a in enumerate(args) if isinstance(a, ast.Starred)]
+        if starred and (starred[0] < len(func.params) or func.vararg is None):
+            return None
+        if len(args) > len(func.params) and func.vararg is None:
+            return None
+        bound = {}
+        defaults = [None] * (len(func.params) - len(func.defaults)) + func.defaults
+        for i, (param, default) in enumerate(zip(func.params, defaults)):
+            if i < len(args):
+                bound[param.arg] = args[i]
+            elif default is not None:
+                bound[param.arg] = clone(default)
+            else:
+                return None
+        if func.vararg is not None:
+            bound[func.vararg.arg] = args[len(func.params):]
+        return bound
+
+    def substitute(self, func: Function, expr: ast.expr, bound: dict):
+        expr = clone(expr)
+        used = []
+        for node in walk_in_order(expr):
+            if isinstance(node, ast.Name) and node.id in bound and getattr(node, "obj", None) is not None:
+                if node.obj.container is func:
+                    used.append(node.id)
+        if func.vararg is not None:
+            # varargs can only be forwarded with *args in another call
+            for node in walk_in_order(expr):
+                if isinstance(node, ast.Call):
+                    node.args = [
+                        a for arg in node.args for a in (
+                            bound[func.vararg.arg] if (
+                                isinstance(arg, ast.Starred) and
+                                isinstance(arg.value, ast.Name) and
+                                arg.value.id == func.vararg.arg
+                            ) else [arg]
+                        )
+                    ]
+            if any(
+                isinstance(n, ast.Name) and n.id == func.vararg.arg and
+                getattr(n, "obj", None) is not None and n.obj.container is func
+                for n in walk_in_order(expr)
+            ):
+                return None
+        # the body may run code before reaching an argument, so arguments are moved only if
+        # that can't be observed, and not duplicated unless they are names or constants
+        if not all(has_no_side_effects(bound[p.arg]) for p in func.params):
+            return None
+        if any(used.count(p.arg) > 1 for p in func.params if not is_simple(bound[p.arg])):
+            return None
+
+        class Replace(ast.NodeTransformer):
+            def visit_Name(self, node):
+                if node.id in bound and getattr(node, "obj", None) is not None and node.obj.container is func:
+                    return bound[node.id]
+                return node
+
+        return Replace().visit(expr)
+
+    def import_names(self, expr):
+        """ Make module level names used by inlined code available in this module. """
+        imports = []
+        for node in ast.walk(expr):
+            obj = getattr(node, "obj", None)
+            if not isinstance(node, ast.Name) or not isinstance(obj, (Class, Function, Instance)):
+                continue
+            if not isinstance(obj.container, Module) or obj.container is self.module:
+                continue
+            if getattr(obj.py_obj, "__builtin__", False) or obj.container is BUILTINS:
+                continue
+            existing = self.module.scope.names.get(node.id)
+            if existing is None:
+                imports.append((obj.container.name, obj))
+            elif existing is not obj:
+                return False
+        for module_name, obj in imports:
+            self.module.scope.add(obj, obj.name)
+            self.module.imported.setdefault(module_name, []).append(obj)
+        return True
+
+    def visit(self, node):
+        if (obj := getattr(node, "obj", None)) is not None:
+            self.referenced.add(obj)
+        return super().visit(node)
 
-def from_entry_point(entry_point: callable):
+    def visit_Call(self, node: ast.Call):
+        # the callee is only visited, and so referenced, if the call stays
+        node.args = [self.visit(arg) for arg in node.args]
+        node.keywords = [self.visit(keyword) for keyword in node.keywords]
+        if (expr := self.inline_call(node)) is not None:
+            return expr
+        node.func = self.visit(node.func)
+        return self.fold_call(node)
+
+    def inline_call(self, node: ast.Call):
+        func = getattr(node.func, "obj", None)
+        if not isinstance(node.func, Name) or not isinstance(func, Function) or func in self.stack:
+            return None
+        if (candidate := self.inline_candidate(func)) is None:
+            return None
+        expr, free_names = candidate
+        if has_pure_decorator(func.py_func) and not node.keywords and all(is_literal(a) for a in node.args):
+            # evaluated once at module level instead, see ConstantHoister
+            return None
+        if any(name in self.func.scope.names for name in free_names):
+            # a local of the caller would capture a name the callee means from its module
+            return None
+        if (bound := self.bind_arguments(func, node)) is None:
+            return None
+        if (expr := self.substitute(func, expr, bound)) is None:
+            return None
+        nested = type(self)(self.func, (*self.stack, func), self.candidates)
+        expr = nested.visit(expr)
+        if not self.import_names(expr):
+            return None
+        self.inlined |= nested.inlined | {func}
+        self.referenced |= nested.referenced
+        expr.obj = node.obj
+        return expr
+
+
+def inline_functions(package: dict[str, Module]):
+    """
+    Inline small functions at their call sites and fold constants across the
+    package, in one pass over each emitted function; functions that end up
+    with no remaining references are dropped from the output.
+    """
+    inlined, referenced, candidates = set(), set(), {}
+    for module in package.values():
+        for func in flatten_objects(module):
+            if func.is_analyzed and should_include(func):
+                inliner = Inliner(func, candidates=candidates)
+                func.body = [inliner.visit(stmt) for stmt in func.body]
+                inlined |= inliner.inlined
+                referenced |= inliner.referenced
+    for func in inlined - referenced:
+        if not has_include_decorator(func.py_func):
+            func.visited = 0
+
+
+def from_entry_point(entry_point: callable, lazy=False, islands=False):
     entry_point.__js__ = True
     py_module = inspect.getmodule(entry_point)
-    return analyze_module(py_module, entry_point)
-
-
-def analyze_module(py_module, entry_point=None):
-    if entry_point is None:
-        assert hasattr(py_module, "main"), "No entry_point specified and no main() function found."
-        py_module.main.__js__ = True
-        entry_point = py_module.main
-    package = {}
-    module = Module(py_module, package).build()
-    package[module.name] = module
-    for imported in package.values():
-        annotate_types(imported)
-    annotate_types(module)
-    entry_point_function, tailwind_classes = visit_entry_point(module, entry_point)
-    entry_point_function.visited.clear()
-    return entry_point_function, tailwind_classes
-
-
-def visit_entry_point(module: Module, py_func):
+    return analyze_module(py_module, entry_point, lazy, islands)
+
+
+# analyses aren't reentrant, the builtins are shared and hold the visited bits
+# and concrete classes of whichever analysis ran last, so they run one at a time
+ANALYSIS_LOCK = threading.RLock()
+
+
+def analyze_module(py_module, entry_point=None, lazy=False, islands=False):
+    with ANALYSIS_LOCK:
+        if entry_point is None:
+            assert hasattr(py_module, "main"), "No entry_point specified and no main() function found."
+            py_module.main.__js__ = True
+            entry_point = py_module.main
+        package = {}
+        with phase("build"):
+            module = Module(py_module, package).build()
+            package[module.name] = module
+        with phase("annotate types"):
+            for imported in package.values():
+                annotate_types(imported)
+            annotate_types(module)
+        with phase("call graph"):
+            entry_point_function, tailwind_classes = visit_entry_point(module, entry_point, lazy, islands)
+            entry_point_function.visited = 0
+        with phase("inline & fold"):
+            inline_functions(package)
+        return entry_point_function, tailwind_classes
+
+
+def visit_entry_point(module: Module, py_func, lazy=False, islands=False):
     entry_point_func = module.search(py_func.__name__)
     assert isinstance(entry_point_func, Function)
+    # the builtins outlive a build, clear what the previous analysis marked, see ANALYSIS_LOCK
+    for obj in walk_objects(BUILTINS):
+        obj.visited = 0
+        if isinstance(obj, Class):
+            obj.instantiated = 0
+    entry_point_func.entry_bit = 1
     entry_point_func.tailwind_classes = set()
+    entry_point_func.tailwind_forwarded = {}
+    entry_point_func.tailwind_resolved = set()
+    entry_point_func.tailwind_unresolved = set()
+    entry_point_func.reasons = {}
+    entry_point_func.lazy = {} if lazy and not islands else None
     CallGraphVisitor.start(entry_point_func)
+    if islands:
+        entry_point_func.lazy = {} if lazy else None
+        CallGraphVisitor.visit_islands(entry_point_func)
+    # classes waiting on the parameters of a function no call site passes arguments
+    # to, like the entry point itself or a callback, are only known at runtime
+    for func, forwarded in entry_point_func.tailwind_forwarded.items():
+        if func not in entry_point_func.tailwind_resolved:
+            for expr_func, expr, bindings in forwarded:
+                # report the argument that was passed in rather than the helper's parameter
+                while isinstance(expr, ast.Name) and (expr_func, expr.id) in bindings:
+                    expr_func, expr = bindings[expr_func, expr.id]
+                CallGraphVisitor(expr_func, entry_point_func).unresolved_classes(expr)
     return entry_point_func, entry_point_func.tailwind_classes
 
 
@@ -873,7 +1589,13 @@ def flatten_objects(parent: Object) -> Iterator[Function]:
         yield parent
 
 
-def annotate_types(parent: Object):
+def annotate_types(parent: Object, within: set = None):
+    """
+    Infer the functions of parent, restarting those that need another
+    function first. A concrete class analyzed while its caller is being
+    inferred only handles dependencies `within` itself, anything else is
+    left to the enclosing pass so it never resets a function in progress.
+    """
     functions = flatten_objects(parent)
     while True:
         dependencies = TopologicalSorter()
@@ -883,19 +1605,36 @@ def annotate_types(parent: Object):
                 func.reset()
                 InferenceVisitor(func).visit(func.original_node)
                 func.is_analyzed = True
+                count("functions analyzed")
             except DependencyError as e:
+                count("dependency restarts")
                 if isinstance(e.class_or_func, Class):
-                    dependencies.add(func, *flatten_objects(e.class_or_func))
+                    needed = list(flatten_objects(e.class_or_func))
                 elif isinstance(e.class_or_func, Function):
-                    dependencies.add(func, e.class_or_func)
+                    needed = [e.class_or_func]
                 else:
                     raise TypeError(f"Cannot handle dependency of type {type(e.class_or_func)}.")
+                if within is not None and not within.issuperset(needed):
+                    raise DependencyError(parent)
+                dependencies.add(func, *needed)
                 added = True
         if not added:
             break
         functions = dependencies.static_order()
 
 
+def concrete_class(generic: GenericClass, *args) -> Class:
+    """
+    generic[*args], a new concrete class is analyzed right away so the caller
+    can use it without restarting, unless it depends on something outside.
+    """
+    known = len(generic.concrete_classes)
+    cls = generic(*args)
+    if len(generic.concrete_classes) != known:
+        annotate_types(cls, within=set(flatten_objects(cls)))
+    return cls
+
+
 def load_builtins():
     from . import _builtins
     for name, value in list(vars(_builtins).items()):
@@ -913,6 +1652,5 @@ def load_builtins():
             setattr(_builtins, name, value)
     return Module(_builtins, {}, is_builtins=True).build()
 
-
 ModuleScope.BUILTINS = BUILTINS = load_builtins()
 annotate_types(BUILTINS)
@@ -1,7 +1,11 @@
 import ast
+import os
+import linecache
+from types import MappingProxyType
 from typing import Iterable, Generic
 
 from pyjs.decorators import *
+from .stats import count
 
 
 IGNORE_NAMES = {
@@ -56,62 +60,203 @@ def traverse_imported(obj_name: str, obj: object, current_module: 'Module'):
     current_module.imported.setdefault(module_name, []).append(imported_object)
 
 
+SOURCE_INDEX: dict[str, tuple[object, dict[tuple[str, int], ast.FunctionDef]]] = {}
+
+
+def index_source(tree: ast.Module) -> dict[tuple[str, int], ast.FunctionDef]:
+    """ Map (qualname, first line including decorators) to every FunctionDef in a module. """
+    index = {}
+
+    def visit(body, prefix):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                visit(node.body, f"{prefix}{node.name}.")
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                lineno = min([d.lineno for d in node.decorator_list] + [node.lineno])
+                index[(f"{prefix}{node.name}", lineno)] = node
+                visit(node.body, f"{prefix}{node.name}.<locals>.")
+            else:
+                for field in ("body", "orelse", "finalbody", "handlers"):
+                    visit(getattr(node, field, []), prefix)
+
+    visit(tree.body, "")
+    return index
+
+
+def find_function_def(py_func: callable) -> ast.FunctionDef | None:
+    """
+    Look up the FunctionDef of py_func in its source file. Each file is parsed
+    once and re-parsed only when its mtime changes.
+    """
+    code = getattr(inspect.unwrap(py_func), "__code__", None)
+    if code is None:
+        return None
+    path = code.co_filename
+    try:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        # sources that only live in linecache, e.g. exec'd test modules
+        stamp = linecache.cache.get(path, (None, None, None))[2]
+        if stamp is None:
+            return None
+    cached = SOURCE_INDEX.get(path)
+    if cached is None or cached[0] is not stamp and cached[0] != stamp:
+        # linecache keeps the lines it read first, even after the file is edited and reloaded
+        linecache.checkcache(path)
+        lines = linecache.getlines(path, py_func.__globals__)
+        if not lines:
+            return None
+        try:
+            tree = ast.parse("".join(lines), path)
+        except SyntaxError:
+            return None
+        cached = SOURCE_INDEX[path] = (stamp, index_source(tree))
+    return cached[1].get((py_func.__qualname__, code.co_firstlineno))
+
+
+# shared by every scope and instance until its first write
+EMPTY = MappingProxyType({})
+
+
 class Scope:
 
+    __slots__ = ("parent", "names")
+
     def __init__(self, parent=None):
         self.parent: Scope = parent
-        self.names = {}
+        self.names = EMPTY
+
+    def resolve(self, name: str) -> 'Object | None':
+        """ Like search() but returns None instead of raising NameError. """
+        if (value := self.names.get(name)) is not None:
+            return value
+        if self.parent is not None:
+            return self.parent.resolve(name)
 
     def search(self, name: str) -> 'Object':
-        if value := self.names.get(name):
+        if (value := self.resolve(name)) is not None:
             return value
-        return self.parent.search(name)
+        raise NameError(f"Searching scopes for `{name}` did not yield results.")
 
     def add(self, thing: 'Object', name: str = None) -> 'Object':
+        if self.names is EMPTY:
+            self.names = {}
         self.names[name or thing.name] = thing
         return thing
 
 
+class SymbolTable:
+    """
+    Flat view of a module scope with the builtins folded in, so that module
+    level lookups are a single dict access. Tracks the version of both scopes
+    and rebuilds lazily when either changed behind its back.
+    """
+
+    __slots__ = ("scope", "version", "builtins_version", "symbols")
+
+    def __init__(self, scope: 'ModuleScope'):
+        self.scope = scope
+        self.version = self.builtins_version = -1
+        self.symbols = EMPTY
+
+    @property
+    def builtins(self) -> 'ModuleScope | None':
+        return None if self.scope.is_builtins else ModuleScope.BUILTINS.scope
+
+    @property
+    def is_current(self):
+        builtins = self.builtins
+        return self.version == self.scope.version and (
+            builtins is None or self.builtins_version == builtins.version
+        )
+
+    def rebuild(self):
+        symbols = {}
+        if (builtins := self.builtins) is not None:
+            symbols.update(builtins.names)
+            self.builtins_version = builtins.version
+        symbols.update(self.scope.names)
+        self.symbols = symbols
+        self.version = self.scope.version
+
+    def bind(self, name: str, thing: 'Object'):
+        """ Apply a single addition to an up to date table. """
+        self.symbols[name] = thing
+        self.version = self.scope.version
+
+    def get(self, name: str) -> 'Object | None':
+        if not self.is_current:
+            self.rebuild()
+        return self.symbols.get(name)
+
+    def __getitem__(self, name: str) -> 'Object':
+        if (value := self.get(name)) is not None:
+            return value
+        raise NameError(f"Searching scopes for `{name}` did not yield results.")
+
+    def __contains__(self, name: str):
+        return self.get(name) is not None
+
+
 class ModuleScope(Scope):
 
+    __slots__ = ("is_builtins", "version", "symbols")
+
     BUILTINS: 'Module'
 
     def __init__(self, is_builtins: bool):
         super().__init__()
         self.is_builtins = is_builtins
+        self.version = 0
+        self.symbols = SymbolTable(self)
 
-    def search(self, name):
-        if value := self.names.get(name):
-            return value
-        if not self.is_builtins and (value := self.BUILTINS.scope.search(name)):
-            return value
-        raise NameError(f"Searching scopes for `{name}` did not yield results.")
+    def resolve(self, name):
+        return self.symbols.get(name)
+
+    def add(self, thing: 'Object', name: str = None) -> 'Object':
+        is_current = self.symbols.is_current
+        super().add(thing, name)
+        self.version += 1
+        if is_current:
+            self.symbols.bind(name or thing.name, thing)
+        return thing
 
 
 class ClassScope(Scope):
-    pass
+    __slots__ = ()
 
 
 class LocalScope(Scope):
+    __slots__ = ()
+
+    def resolve_local(self, name: str) -> 'Object | None':
+        """ Like lookup() but returns None instead of raising NameError. """
+        if (value := self.names.get(name)) is not None:
+            return value
+        if isinstance(self.parent, LocalScope):
+            return self.parent.resolve_local(name)
+
     def lookup(self, name: str) -> 'Object':
-        if value := self.names.get(name):
+        if (value := self.resolve_local(name)) is not None:
             return value
-        if not isinstance(self.parent, LocalScope):
-            raise NameError(f"Searching local scopes for `{name}` did not yield results.")
-        return self.parent.lookup(name)
+        raise NameError(f"Searching local scopes for `{name}` did not yield results.")
 
 
 class FunctionScope(LocalScope):
-    pass
+    __slots__ = ()
 
 
 class Object:
 
+    # visited is a bitmask of the entry points (Function.entry_bit) that reach this object
+    __slots__ = ("name", "scope", "container", "visited")
+
     def __init__(self, name: str, scope: Scope, container: 'Object' = None):
         self.name = name
         self.scope = scope
         self.container = container
-        self.visited = set()
+        self.visited = 0
 
     @property
     def py_obj(self):
@@ -128,6 +273,13 @@ class Object:
         """ Vertical. Find attributes of this object, following any inheritance rules. """
         raise NotImplementedError
 
+    def try_find(self, name):
+        """ Like find() but returns None instead of raising NameError. """
+        try:
+            return self.find(name)
+        except NameError:
+            return None
+
     def search(self, name):
         """ Horizontal. Search in scopes, finally checking builtins after all scopes exhausted. """
         return self.scope.search(name)
@@ -145,7 +297,11 @@ class Object:
             if js_attr is False or (js_attr is None and not propagate_js):
                 continue
 
-            if isinstance(container, Module) and getattr(py_obj, "__module__", None) not in (container.name, None):
+            # js_str constants report the module of their class, they are declared where they are found
+            if (
+                isinstance(container, Module) and not isinstance(py_obj, js_str) and
+                getattr(py_obj, "__module__", None) not in (container.name, None)
+            ):
                 traverse_imported(name, py_obj, container)
             elif inspect.isclass(py_obj):
                 assert isinstance(container, Module), "Classes are only allowed in modules."
@@ -162,6 +318,8 @@ class Object:
 
 class Module(Object):
 
+    __slots__ = ("py_module", "imported")
+
     scope: ModuleScope
 
     def __init__(self, module, package, is_builtins: bool=False):
@@ -191,12 +349,19 @@ class Module(Object):
     def children(self):
         return list(self.scope.names.values())
 
+    @property
+    def symbols(self) -> SymbolTable:
+        return self.scope.symbols
+
     def build(self, *args, **kwargs):
         super().build(self.py_module, self)
         return self
 
 
 class UnionType:
+
+    __slots__ = ("name", "_types")
+
     def __init__(self, name: str = None, types: Iterable['Class'] = None):
         self.name = name
         self._types: dict[str,Class] = {cls.name:cls for cls in types} if types else {}
@@ -242,6 +407,11 @@ class UnionType:
 
 class Class(Object):
 
+    __slots__ = (
+        "generic_types", "generic_name", "internal_scope", "instantiated", "py_cls", "_self", "super",
+        "version", "_mro", "_mro_key", "_inherited_attrs", "_inherited_attrs_key",
+    )
+
     scope: ClassScope
 
     def __init__(self, cls: type, container: Module, assigned_types: dict[str,'Class'] = None, name: str = None):
@@ -252,6 +422,12 @@ class Class(Object):
             for type_name, type_cls in assigned_types.items():
                 self.scope.add(type_cls, type_name)
         self.internal_scope = ClassScope(self.scope)
+        # bumped when a method or a `self` attribute is added, the flattened tables
+        # below are keyed by the versions and tables they were built from
+        self.version = 0
+        self._mro = self._inherited_attrs = EMPTY
+        self._mro_key = self._inherited_attrs_key = (-1, None)
+        self.instantiated = 0
         self.py_cls = cls
         self._self = Instance("self", self, self.scope, self)
         if self.name == "object" and getattr(cls, "__builtin__", False):
@@ -307,6 +483,15 @@ class Class(Object):
     def is_generic(py_cls):
         return bool(py_cls.__type_params__)
 
+    @property
+    def js_repr(self):
+        """ JavaScript representation of a concrete dict class, "Object" or "Map". """
+        if self.generic_name == "dict" and self.generic_types:
+            key_type = self.generic_types.get("K")
+            if isinstance(key_type, Class) and key_type.name == "str":
+                return "Object"
+            return "Map"
+
     @property
     def inline_decorator(self):
         return self.find("__init__").inline_decorator
@@ -326,24 +511,54 @@ class Class(Object):
 
     def add(self, other: Object):
         self.internal_scope.add(other)
+        self.version += 1
+
+    @property
+    def mro(self) -> dict[str, Object]:
+        """ Attributes of this class and all of its bases, with overrides applied. """
+        base = self.super.mro if self.super is not None else EMPTY
+        version, cached_base = self._mro_key
+        if version != self.version or cached_base is not base:
+            mro = dict(base)
+            mro.update(self.internal_scope.names)
+            self._mro, self._mro_key = mro, (self.version, base)
+        return self._mro
+
+    @property
+    def inherited_attrs(self) -> dict[str, Object]:
+        """ Attributes assigned to `self` by the base classes, with overrides applied. """
+        if self.super is None:
+            return EMPTY
+        base = self.super.inherited_attrs
+        version, cached_base = self._inherited_attrs_key
+        if version != self.super.version or cached_base is not base:
+            attrs = dict(base)
+            attrs.update(self.super._self.attrs)
+            self._inherited_attrs, self._inherited_attrs_key = attrs, (self.super.version, base)
+        return self._inherited_attrs
 
     def find(self, name):
-        if value := self.find_attrs(name):
+        if (value := self.mro.get(name)) is not None:
             return value
         raise NameError(f"Can't find {name} on {self.name} class.")
 
+    def try_find(self, name):
+        return self.mro.get(name)
+
     def find_attrs(self, name, search_bases=True):
-        if value := self.internal_scope.names.get(name):
-            return value
         if search_bases:
-            return self.find_bases(name)
+            return self.mro.get(name)
+        return self.internal_scope.names.get(name)
 
     def find_bases(self, name):
         if self.super is not None:
-            return self.super.find_attrs(name)
+            return self.super.mro.get(name)
 
 
 class GenericClass(Object):
+
+    __slots__ = ("py_cls", "init_params", "generic_params", "concrete_classes")
+
     def __init__(self, cls: type, container: Module):
         super().__init__(cls.__name__, ClassScope(container.scope), container)
         self.py_cls = cls
@@ -351,7 +566,8 @@ class GenericClass(Object):
         if cls_init := getattr(cls, '__init__', None):
             self.init_params = inspect.signature(cls_init).parameters
         self.generic_params = [type_param.__name__ for type_param in cls.__type_params__]
-        self.concrete_classes = {}
+        # interned by the identity of the type arguments, unions by their members
+        self.concrete_classes: dict[tuple, Class] = {}
 
     @property
     def node(self):
@@ -371,11 +587,14 @@ class GenericClass(Object):
         if self.name == "tuple":
             params = [f"T{i+1}" for i in range(len(args))]
         assert len(args) == len(params)
-        concrete_name = f"{self.name}__{'_'.join([arg.to_annotation_str('U') for arg in args])}"
-
-        if concrete_class := self.concrete_classes.get(concrete_name, None):
+        # a union of one is the class itself
+        args = [arg.type if isinstance(arg, UnionType) else arg for arg in args]
+        key = tuple(arg if isinstance(arg, Class) else frozenset(arg.types) for arg in args)
+        if (concrete_class := self.concrete_classes.get(key)) is not None:
             return concrete_class
 
+        concrete_name = f"{self.name}__{'_'.join([arg.to_annotation_str('U') for arg in args])}"
+
         generics = {}
         for name, arg in zip(params, args):
             if isinstance(arg, UnionType):
@@ -385,11 +604,12 @@ class GenericClass(Object):
                 generics[name] = arg
 
         concrete_class = Class(self.py_cls, self.container, assigned_types=generics, name=concrete_name)
-        self.concrete_classes[concrete_name] = concrete_class
+        self.concrete_classes[key] = concrete_class
+        count("generics created")
         concrete_class.build()
-        raise DependencyError(concrete_class)
+        return concrete_class
 
-    def from_call(self, arg_types):
+    def type_args(self, arg_types):
         # TODO: handle different arg schemes other than positional
         assert self.init_params
         param_args = {}
@@ -398,11 +618,17 @@ class GenericClass(Object):
         generic_args = [param_args.get(p, None) for p in self.generic_params]
         if not all(generic_args):
             raise TypeError("Concrete type could not be determined from type annotation or value.")
-        return self(*generic_args)
+        return generic_args
 
 
 class Function(Object):
 
+    __slots__ = (
+        "py_func", "cls", "return_type", "is_analyzed", "params", "defaults", "vararg", "kwarg", "body",
+        "lineno", "original_node", "symbols", "entry_bit", "tailwind_classes", "tailwind_forwarded",
+        "tailwind_resolved", "tailwind_unresolved", "reasons", "lazy",
+    )
+
     scope: FunctionScope
 
     def __init__(self, func: callable, container: Object):
@@ -421,10 +647,23 @@ class Function(Object):
         self.body = []
         self.lineno: int = None
         self.original_node: ast.FunctionDef = None
+        # names the function reads but never binds, see analyzer.bind_symbols()
+        self.symbols: dict[str, Object] = None
+        # set on entry points only
+        self.entry_bit = 0
+        self.tailwind_classes: set[str] = None
+        # {function: [(function, expr, bindings)]} class strings waiting on the function's parameters
+        self.tailwind_forwarded: dict[Function, list] = None
+        # functions whose forwarded class strings a call site bound arguments to
+        self.tailwind_resolved: set[Function] = None
+        self.tailwind_unresolved: set[str] = None
+        self.reasons: dict[Object, tuple[str, Object]] = None
+        # {lazy class: its entry bit} when code splitting, None otherwise
+        self.lazy: dict[Class, int] = None
 
     def reset(self):
         self.is_analyzed = False
-        self.scope.names = {}
+        self.scope.names = EMPTY
         if self.cls is not None:
             self.scope.add(self.cls.super, "super")
         self.params = []
@@ -445,22 +684,26 @@ class Function(Object):
     @classmethod
     def from_py_func(cls, py_func: callable, container: Module | Class):
         py_func = getattr(py_func, "__js_replace__", py_func)
-        lines, lineno = inspect.getsourcelines(py_func)
-        is_method = isinstance(container, Class)
+        func_def = find_function_def(py_func)
+        if func_def is not None:
+            lineno = min([d.lineno for d in func_def.decorator_list] + [func_def.lineno])
+        else:
+            lines, lineno = inspect.getsourcelines(py_func)
+            is_method = isinstance(container, Class)
 
-        if is_method:
-            # to preserve indentation for sourcemap and still make the function parseable
-            lines.insert(0, f"class {container.name}:\n")
-            lineno -= 1  # we need to subtract the dummy line from total line offset
+            if is_method:
+                # to preserve indentation for sourcemap and still make the function parseable
+                lines.insert(0, f"class {container.name}:\n")
+                lineno -= 1  # we need to subtract the dummy line from total line offset
 
-        module = ast.parse(''.join(lines))
-        assert isinstance(module, ast.Module)
+            module = ast.parse(''.join(lines))
+            assert isinstance(module, ast.Module)
 
-        if is_method:
-            module = module.body[0]
-            assert isinstance(module, ast.ClassDef)
+            if is_method:
+                module = module.body[0]
+                assert isinstance(module, ast.ClassDef)
 
-        func_def = module.body[0]
+            func_def = module.body[0]
         assert isinstance(func_def, ast.FunctionDef)
 
         func = cls(py_func, container)
@@ -544,6 +787,7 @@ class Function(Object):
                 args[param.arg] = arg_str
         if self.is_method:
             args["self"] = self_
+            args["_self_cls"] = self.cls
         return rewrite(**args)
 
     def add_cls(self):
@@ -563,14 +807,16 @@ class DependencyError(Exception):
 
 class Instance(Object):
 
+    __slots__ = ("cls", "attrs", "static_value", "py_value", "is_const")
+
     def __init__(
         self, name: str, cls: Class, scope: Scope,
         container: Object, static_value: ast.expr = None,
-        py_obj = None, is_const = False
+        py_obj = None, is_const = False, attrs = EMPTY
     ):
         super().__init__(name, scope, container)
         self.cls = cls
-        self.attrs = {}
+        self.attrs = attrs
         assert static_value is None or isinstance(static_value, ast.expr)
         self.static_value: ast.expr = static_value
         self.py_value = py_obj
@@ -581,22 +827,32 @@ class Instance(Object):
             return value
         return self.cls.find(name)
 
+    def try_find(self, name):
+        return self.find_attrs(name) or self.cls.try_find(name)
+
     def find_attrs(self, name):
         if value := self.attrs.get(name):
             return value
         return self.find_super_instances(name)
 
     def find_super_instances(self, name):
-        if self.cls.super is not None:
-            return self.cls.super._self.find_attrs(name)
+        return self.cls.inherited_attrs.get(name)
 
     def reassign(self, name: str, scope: Scope, container: Object, ast_value=None, value=None, is_const=None):
-        new = Instance(name, self.cls, scope, container, static_value=ast_value, py_obj=value, is_const=is_const)
-        new.attrs = self.attrs
-        return new
+        if self.attrs is EMPTY:
+            # reassigned instances share attributes with the original
+            self.attrs = {}
+        return Instance(
+            name, self.cls, scope, container, static_value=ast_value, py_obj=value, is_const=is_const, attrs=self.attrs
+        )
 
     def add(self, obj: Object, name: str = None):
+        if self.attrs is EMPTY:
+            self.attrs = {}
         self.attrs[name or obj.name] = obj
+        if self.attrs is self.cls._self.attrs:
+            # subclasses inherit the attributes assigned to `self`
+            self.cls.version += 1
 
     @property
     def py_obj(self):
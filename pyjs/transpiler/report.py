@@ -0,0 +1,64 @@
+from .transpiler import Transpiler, transpile_module
+from .objects import *
+
+
+def describe(obj: Object) -> str:
+    if isinstance(obj, Function) and obj.cls is not None:
+        return f"{obj.cls.name}.{obj.name}"
+    return obj.name
+
+
+def reason_for(entry_point: Function, obj: Object) -> str:
+    reason, source = entry_point.reasons.get(obj, ("@js(include=True)", None))
+    if source is None:
+        return reason
+    return f"{reason} {describe(source)}"
+
+
+def js_size(entry_point: Function, obj: Object) -> int:
+    return len(Transpiler(entry_point).visit(obj.node).encode())
+
+
+def bundle_report(entry_point: Function, package: dict[str, str] = None) -> str:
+    """
+    Lists the bytes each module, class and function contributes to the
+    bundle and why the tree shaker kept it, largest first.
+    """
+    rows = []
+    for module_name, module in entry_point.container.container.items():
+        if package is not None:
+            module_size = len((package.get(module_name) or "").encode())
+        else:
+            module_size = len(transpile_module(module).encode())
+        if not module_size:
+            continue
+        children = []
+        for obj in module.children:
+            if obj.container is not module or not isinstance(obj, (Class, Function, Instance)):
+                continue
+            if not should_include(obj):
+                continue
+            methods = []
+            if isinstance(obj, Class):
+                for method in obj.children:
+                    if isinstance(method, Function) and should_include(method):
+                        methods.append((
+                            js_size(entry_point, method), describe(method), reason_for(entry_point, method)
+                        ))
+                methods.sort(reverse=True)
+            kind = "class" if isinstance(obj, Class) else "function" if isinstance(obj, Function) else "const"
+            children.append((
+                js_size(entry_point, obj), f"{kind} {describe(obj)}", reason_for(entry_point, obj), methods
+            ))
+        children.sort(key=lambda c: c[0], reverse=True)
+        rows.append((module_size, module_name, children))
+    rows.sort(key=lambda r: r[0], reverse=True)
+
+    lines = [f"{'bundle':<60} {sum(r[0] for r in rows):>8} B"]
+    for module_size, module_name, children in rows:
+        lines.append(f"{module_name:<60} {module_size:>8} B")
+        for size, name, reason, methods in children:
+            lines.append(f"  {name:<58} {size:>8} B  {reason}")
+            for method_size, method_name, method_reason in methods:
+                lines.append(f"    {method_name:<56} {method_size:>8} B  {method_reason}")
+    return "\n".join(lines)
@@ -0,0 +1,74 @@
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+ACTIVE: ContextVar['Stats | None'] = ContextVar("pyjs_stats", default=None)
+
+
+class Stats:
+    """
+    Wall time per phase and counters collected while a bundle is built,
+    pass one to prepare_bundle() or bundle() to fill it in.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.module_bytes: dict[str, int] = {}
+
+    @contextmanager
+    def collect(self):
+        token = ACTIVE.set(self)
+        try:
+            yield self
+        finally:
+            ACTIVE.reset(token)
+
+    def as_dict(self) -> dict:
+        return {
+            "phases": self.phases,
+            "counters": self.counters,
+            "module_bytes": self.module_bytes,
+            "total_seconds": sum(self.phases.values()),
+            "total_bytes": sum(self.module_bytes.values()),
+        }
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def report(self) -> str:
+        lines = [f"{'phase':<40} {'ms':>10}"]
+        for name, seconds in self.phases.items():
+            lines.append(f"{name:<40} {seconds*1000:>10.1f}")
+        lines.append(f"{'total':<40} {sum(self.phases.values())*1000:>10.1f}")
+        lines.append("")
+        lines.append(f"{'counter':<40} {'count':>10}")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<40} {value:>10}")
+        lines.append("")
+        lines.append(f"{'module':<40} {'bytes':>10}")
+        for name, size in sorted(self.module_bytes.items(), key=lambda m: m[1], reverse=True):
+            lines.append(f"{name:<40} {size:>10}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def phase(name: str):
+    """ Add the wall time of the block to the active Stats, if any. """
+    stats = ACTIVE.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.phases[name] = stats.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def count(name: str, n: int = 1):
+    if (stats := ACTIVE.get()) is not None:
+        stats.counters[name] = stats.counters.get(name, 0) + n
@@ -1,41 +1,273 @@
+import re
+import hashlib
 import textwrap
 from itertools import chain
 from contextlib import contextmanager
+from graphlib import TopologicalSorter, CycleError
 
 from pyjs.domx import CustomElement, HTMLElement, ProxyElement, ContextProxy
 from .analyzer import *
 from .utils import TailwindCSS
+from .stats import ACTIVE, Stats, phase, count
 
 
-def transpile_module(module, importer=None, exporter=None):
-    return Transpiler(module, importer, exporter).visit(module.node)
+def transpile_module(
+    module, importer=None, exporter=None, renames=None, constant_prefix="", chunks=None, chunk=None
+):
+    return Transpiler(
+        module, importer, exporter, renames=renames, constant_prefix=constant_prefix, chunks=chunks, chunk=chunk
+    ).visit(module.node)
 
 
-def generate_css(tailwind_classes: set):
-    return TailwindCSS().get_css(tailwind_classes)
+TAILWIND = TailwindCSS()
 
 
-def prepare_bundle(entry_point_py_func, importer=None, exporter=None, include_main=False):
-    entry_point, tailwind_classes = from_entry_point(entry_point_py_func)
-    if include_main:
+def generate_css(tailwind_classes: set, tailwind: TailwindCSS = None):
+    return (tailwind or TAILWIND).get_css(tailwind_classes)
+
+
+def prepare_bundle(
+    entry_point_py_func, importer=None, exporter=None, include_main=False, stats: Stats = None,
+    tailwind: TailwindCSS = None, scope_hoisted=False, lazy=False, islands=False
+):
+    """
+    Transpiles every module reachable from the entry point, with lazy
+    @js(lazy=True) classes and what only they use go to separate chunks,
+    added to the package as "module~chunk" (see esm_build()). With islands
+    only the interactive custom elements the entry point renders are
+    shipped, the entry point itself runs on the server only.
+    """
+    if stats is not None:
+        with stats.collect():
+            return prepare_bundle(
+                entry_point_py_func, importer, exporter, include_main, tailwind=tailwind,
+                scope_hoisted=scope_hoisted, lazy=lazy, islands=islands
+            )
+    assert not (lazy and scope_hoisted), "lazy chunks need separate modules"
+    entry_point, tailwind_classes = from_entry_point(entry_point_py_func, lazy, islands)
+    if include_main and not islands:
         entry_point.py_func.__js_include__ = True
     module = entry_point.container
     package = {}
     css = ""
     if tailwind_classes:
-        css = generate_css(tailwind_classes)
-    for module_name, module_obj in module.container.items():
-        package[module_name] = transpile_module(module_obj, importer, exporter)
+        with phase("tailwind"):
+            css = generate_css(tailwind_classes, tailwind)
+    with phase("transpile"):
+        if scope_hoisted:
+            modules = module.container
+            order = module_order(modules)
+            renames = scope_hoisting_renames(modules, [module.name] + [m for m in order if m != module.name])
+            for i, module_name in enumerate(order):
+                package[module_name] = transpile_module(
+                    modules[module_name], scope_hoisted_importer, scope_hoisted_exporter, renames, f"{i}_"
+                )
+        else:
+            chunks = lazy_chunks(entry_point)
+            for module_name, module_obj in module.container.items():
+                package[module_name] = transpile_module(module_obj, importer, exporter, chunks=chunks)
+            for module_name, chunk in sorted({(obj.container.name, chunk) for obj, chunk in chunks.items()}):
+                package[part_name(module_name, chunk)] = transpile_module(
+                    module.container[module_name], importer, exporter, chunks=chunks, chunk=chunk
+                )
+    if (stats := ACTIVE.get()) is not None:
+        stats.module_bytes.update({name: len(js.encode()) for name, js in package.items() if js})
     return package, entry_point, css
 
 
-def bundle(entry_point_py_func, include_main=False):
+def bundle_importer(module, names):
+    return f"const {{{', '.join(names)}}} = __import_js__({repr(module)});"
+
+
+def bundle_exporter(name):
+    return f"__export_js__.{name} = {name};"
+
+
+def bundle(entry_point_py_func, include_main=False, stats: Stats = None, scope_hoisted=False, islands=False):
     package, entry_point, css = prepare_bundle(
-        entry_point_py_func,
-        lambda module, names: f"const {{{', '.join(names)}}} = __import_js__({repr(module)});",
-        lambda name: f"__export_js__.{name} = {name};",
-        include_main=include_main
+        entry_point_py_func, bundle_importer, bundle_exporter, include_main=include_main, stats=stats,
+        scope_hoisted=scope_hoisted, islands=islands
     )
+    if scope_hoisted:
+        return bundle_package_scope_hoisted(package, entry_point), css
+    return bundle_package(package, entry_point), css
+
+
+def part_name(module_name: str, chunk: str = None) -> str:
+    return module_name if chunk is None else f"{module_name}~{chunk}"
+
+
+def chunk_name(cls: Class) -> str:
+    return f"{cls.container.name}.{cls.name}"
+
+
+def module_references(obj: Object) -> Iterator[Object]:
+    """ Module level objects the code of obj refers to, methods and attributes count as their class. """
+    for node in ast.walk(obj.node):
+        ref = getattr(node, "obj", None)
+        while isinstance(ref, Object) and ref.container is not None and not isinstance(ref.container, Module):
+            ref = ref.container
+        if isinstance(ref, (Class, Function, Instance)) and ref is not obj and should_include(ref):
+            yield ref
+
+
+def lazy_chunks(entry_point: Function) -> dict[Object, str]:
+    """
+    The chunk of each module level object only reachable through a lazy
+    class. Anything code in the main modules refers to stays there, lazy
+    classes included: shipped code constructing one needs it defined.
+    """
+    if not entry_point.lazy:
+        return {}
+    roots = {bit: cls for cls, bit in entry_point.lazy.items()}
+    objs = {
+        obj for module in entry_point.container.container.values() for obj in module.children
+        if obj.container is module and isinstance(obj, (Class, Function, Instance)) and should_include(obj)
+    }
+    main = [obj for obj in objs if obj.visited not in roots]
+    kept = set(main)
+    while main:
+        for ref in module_references(main.pop()):
+            if ref in objs and ref not in kept:
+                kept.add(ref)
+                main.append(ref)
+    return {obj: chunk_name(roots[obj.visited]) for obj in objs - kept}
+
+
+LAZY_LOADER = """\
+{{
+    const lazyElements = new Map([
+{loaders}
+    ]);
+    const loadLazyElements = () => {{
+        for (const [name, load] of lazyElements) {{
+            if (document.querySelector(name) !== null) {{
+                lazyElements.delete(name);
+                load();
+            }}
+        }}
+        if (lazyElements.size === 0) {{
+            lazyObserver.disconnect();
+        }}
+    }};
+    const lazyObserver = new MutationObserver(loadLazyElements);
+    lazyObserver.observe(document.documentElement, {{childList: true, subtree: true}});
+    loadLazyElements();
+}}
+"""
+
+
+def lazy_loader(entry_point: Function, package: dict[str, str]) -> str:
+    """ Imports the chunk of each lazy custom element once its tag is in the document. """
+    loaders = []
+    for cls in entry_point.lazy or ():
+        if (name := part_name(cls.container.name, chunk_name(cls))) in package:
+            loaders.append(f"        [{repr(cls.py_cls.localName)}, () => import({repr(name)})],")
+    return LAZY_LOADER.format(loaders="\n".join(loaders)) if loaders else ""
+
+
+# never shadowed by a renamed module level name in scope hoisted bundles
+JS_GLOBALS = {
+    "Array", "Boolean", "Error", "Infinity", "JSON", "Map", "Math", "NaN", "Number", "Object", "Promise", "Set",
+    "String", "console", "customElements", "document", "globalThis", "undefined", "window",
+}
+
+
+def scope_hoisted_importer(module, names):
+    return ""
+
+
+def scope_hoisted_exporter(name):
+    return ""
+
+
+def module_order(modules: dict[str, Module]) -> list[str]:
+    """ Module names ordered so every module comes after the modules it imports. """
+    graph = {name: [m for m in module.imported if m in modules] for name, module in modules.items()}
+    try:
+        return list(TopologicalSorter(graph).static_order())
+    except CycleError:
+        return list(modules)
+
+
+def scope_hoisting_renames(modules: dict[str, Module], priority: list[str]) -> dict[Object, str]:
+    """
+    Module level names which collide once all modules share one scope get
+    the module name appended, modules earlier in priority keep their names.
+    """
+    taken = set(JS_GLOBALS)
+    for module in modules.values():
+        for obj in module.children:
+            if getattr(obj.py_obj, "__builtin__", False):
+                taken.add(obj.name)
+    renames = {}
+    for module_name in priority:
+        module = modules[module_name]
+        for obj in module.children:
+            if obj.container is not module or not isinstance(obj, (Class, Function, Instance)):
+                continue
+            if getattr(obj.py_obj, "__builtin__", False) or not should_include(obj):
+                continue
+            name = obj.name
+            if name in taken:
+                name = f"{obj.name}${module_name.replace('.', '_')}"
+                while name in taken:
+                    name += "$"
+                renames[obj] = name
+            taken.add(name)
+    return renames
+
+
+def bundle_package_scope_hoisted(package, entry_point):
+    """
+    Concatenates the modules, already in dependency order, into a single
+    closure, cross-module references are plain variable accesses.
+    """
+    source = ["(() => {\n"]
+    w = source.append
+    for module_name, module_js in package.items():
+        if module_js:
+            w(f"// {module_name}\n")
+            w(module_js.strip("\n"))
+            w("\n\n")
+    if entry_point.has_include_decorator:
+        w(f"{entry_point.name}();\n")
+    w("})();\n")
+    return "".join(source)
+
+
+def esm_importer(module, names):
+    # bare specifiers, resolved by the import map so importers don't change when a module's hash does
+    return f"import {{ {', '.join(names)} }} from '{module}';"
+
+
+def esm_build(package, entry_point, base_url="./") -> tuple[dict[str, str], dict[str, str], list[str]]:
+    """
+    Native ES modules, one file per module named by a hash of its content,
+    returns the files, the import map from module names to their urls and
+    the urls to preload, everything in dependency order except the lazy
+    chunks. Build the package with esm_importer.
+    """
+    files, import_map, preload = {}, {}, []
+    order = module_order(entry_point.container.container)
+    for module_name in order + [name for name in package if name not in entry_point.container.container]:
+        module_js = package.get(module_name)
+        if not module_js and module_name != entry_point.container.name:
+            continue
+        if module_name == entry_point.container.name:
+            if entry_point.has_include_decorator:
+                module_js = f"{module_js}\n{entry_point.name}();\n"
+            if loader := lazy_loader(entry_point, package):
+                module_js = f"{module_js}\n{loader}"
+        file_name = f"{module_name}.{hashlib.sha256(module_js.encode()).hexdigest()[:10]}.js"
+        files[file_name] = module_js
+        import_map[module_name] = base_url + file_name
+        if module_name in entry_point.container.container:
+            preload.append(base_url + file_name)
+    return files, import_map, preload
+
+
+def bundle_package(package, entry_point):
     source = []
     w = source.append
     w(textwrap.dedent("""\
@@ -63,23 +295,51 @@ def bundle(entry_point_py_func, include_main=False):
             w(f"define({repr(module_name)}, function (__export_js__, __import_js__) {{\n")
             w(module_js)
             w("\n});\n")
-    w(f"importModule({repr(entry_point.container.name)})")
-    if entry_point.has_include_decorator:
-        w(f".{entry_point.name}()")
-    w(";\n")
-    return "".join(source), css
+    if package.get(entry_point.container.name):
+        w(f"importModule({repr(entry_point.container.name)})")
+        if entry_point.has_include_decorator:
+            w(f".{entry_point.name}()")
+        w(";\n")
+    return "".join(source)
 
 
 class Transpiler(ast._Unparser):
 
-    def __init__(self, entry_point: Function, importer=None, exporter=None):
+    def __init__(
+        self, entry_point: Function, importer=None, exporter=None, hoisted=None, renames=None, constant_prefix="",
+        chunks=None, chunk=None
+    ):
         super().__init__()
         self.entry_point = entry_point
         self.importer = importer
         self.exporter = exporter
+        self.hoisted = {} if hoisted is None else hoisted
+        # set when scope hoisting, module level objects are referenced by their declared or renamed name
+        self.renames: dict[Object, str] = renames
+        self.constant_prefix = constant_prefix
+        # set when code splitting, module level objects emitted into lazy chunks and the chunk being emitted
+        self.chunks: dict[Object, str] = chunks or {}
+        self.chunk: str = chunk
 
     def isolated_visit(self, node):
-        return Transpiler(self.entry_point).visit(node)
+        return Transpiler(self.entry_point, hoisted=self.hoisted, renames=self.renames).visit(node)
+
+    def js_name(self, obj: Object, name: str) -> str:
+        if self.renames is None or not isinstance(obj, (Class, Function, Instance)):
+            return name
+        if obj in self.renames:
+            return self.renames[obj]
+        if isinstance(obj.container, Module):
+            return obj.name
+        return name
+
+    def traverse(self, node):
+        if not isinstance(node, list) and id(node) in self.hoisted:
+            self.write(self.hoisted[id(node)][0])
+        else:
+            if not isinstance(node, list):
+                count("nodes emitted")
+            super().traverse(node)
 
     @contextmanager
     def block(self, *, extra = None):
@@ -89,23 +349,52 @@ class Transpiler(ast._Unparser):
         self._indent -= 1
         self.fill(f"}}")
 
+    def module_imports(self, module: Module, body: list) -> dict[str, list[Object]]:
+        if self.chunk is None:
+            return {name: [o for o in objs if o not in self.chunks] for name, objs in module.imported.items()}
+        # a chunk imports what it refers to from the main modules and other chunks, its own module included
+        imported = {}
+        for n in body:
+            for ref in module_references(n.obj):
+                name = part_name(ref.container.name, self.chunks.get(ref))
+                if name != part_name(module.name, self.chunk) and ref not in imported.setdefault(name, []):
+                    imported[name].append(ref)
+        return imported
+
     def visit_ModuleDef(self, node: ModuleDef):
         module = node.obj
-        for imported_module, imported_objs in module.imported.items():
+        body = [
+            n for n in node.body
+            if should_include(n.obj) and n.obj.container.name == module.name and self.chunks.get(n.obj) == self.chunk
+        ]
+        for imported_module, imported_objs in self.module_imports(module, body).items():
             imported_names = [o.name for o in imported_objs if should_include(o)]
             if imported_names:
                 if self.importer is not None:
-                    self.fill(self.importer(imported_module, imported_names))
+                    if import_stmt := self.importer(imported_module, imported_names):
+                        self.fill(import_stmt)
                 else:
                     self.fill(f"import {{ {", ".join(imported_names)} }} from './{imported_module}.js';")
-        for n in node.body:
-            if should_include(n.obj) and n.obj.container.name == module.name:
-                self.traverse(n)
+        hoister = ConstantHoister(self.constant_prefix)
+        for n in body:
+            hoister.visit(n)
+        for name, value in hoister.constants.values():
+            self.fill(f"const {name} = ")
+            if isinstance(value, (ast.List, ast.Dict, ast.Tuple)):
+                with self.delimit("Object.freeze(", ")"):
+                    super().traverse(tuples_as_lists(value))
+            else:
+                super().traverse(value)
+            self.write(";")
+        self.hoisted = hoister.hoisted
+        for n in body:
+            self.traverse(n)
 
     def visit_ClassDef(self, node):
         self.maybe_newline()
         export = "export " if self.exporter is None else ""
-        self.fill(f"{export}class {node.name}")
+        name = self.js_name(node.obj, node.name)
+        self.fill(f"{export}class {name}")
         if node.bases:
             assert len(node.bases) == 1
             self.write(" extends ")
@@ -113,9 +402,9 @@ class Transpiler(ast._Unparser):
         with self.block():
             self.traverse(node.body)
         if js_append := getattr(node.obj.py_cls, '__js_append__', None):
-            self.fill(js_append())
-        if self.exporter is not None:
-            self.fill(self.exporter(node.name))
+            self.fill(js_append(name))
+        if self.exporter is not None and (export_stmt := self.exporter(name)):
+            self.fill(export_stmt)
 
     def visit_FunctionDef(self, node):
         self._function_helper(node, "function")
@@ -144,7 +433,7 @@ class Transpiler(ast._Unparser):
         else:
             if self.exporter is None and isinstance(func.container, Module):
                 fill_suffix = "export " + fill_suffix
-            def_str = fill_suffix + " " + node.name
+            def_str = fill_suffix + " " + self.js_name(func, node.name)
         self.fill(def_str)
         with self.delimit("(", ")"):
             self.traverse(node.args)
@@ -162,13 +451,22 @@ class Transpiler(ast._Unparser):
         if is_custom_element_init and issubclass(func.cls.py_obj, CustomElement):
             self.generate_bind_method(func)
         if self.exporter is not None and isinstance(func.container, Module):
-            self.fill(self.exporter(node.name))
+            if export_stmt := self.exporter(self.js_name(func, node.name)):
+                self.fill(export_stmt)
 
     def generate_bind_method(self, func):
         self.maybe_newline()
         self.fill("_hydrate()")
         with self.block():
             generator = HydrateGenerator(func, self)
+            if names := state_attributes(func.cls):
+                # resume from the plain data the server serialized into the page, see pyjs.server.page_state()
+                generator.add_self_id(None)
+                self.fill(f"const state = {RESUME_STATE}[self_id];")
+                self.fill("if (state !== undefined)")
+                with self.block():
+                    for name in names:
+                        self.fill(f"this.{name} = state.{name};")
             for line in func.body:
                 generator.visit(line)
 
@@ -303,10 +601,32 @@ class Transpiler(ast._Unparser):
             self.write(" => ")
             self.traverse(node.elt)
 
+    def is_map(self, node):
+        obj = getattr(node, "obj", None)
+        cls = obj.cls if isinstance(obj, Instance) else obj
+        return isinstance(cls, Class) and cls.js_repr == "Map"
+
+    def visit_Subscript(self, node):
+        if self.is_map(node.value):
+            self.set_precedence(ast._Precedence.ATOM, node.value)
+            self.traverse(node.value)
+            with self.delimit(".get(", ")"):
+                self.traverse(node.slice)
+        else:
+            super().visit_Subscript(node)
+
     def visit_Assign(self, node):
         self.fill()
         assert len(node.targets) == 1
         target = node.targets[0]
+        if isinstance(target, ast.Subscript) and self.is_map(target.value):
+            self.set_precedence(ast._Precedence.ATOM, target.value)
+            self.traverse(target.value)
+            with self.delimit(".set(", ");"):
+                self.traverse(target.slice)
+                self.write(", ")
+                self.traverse(node.value)
+            return
         self.set_precedence(ast._Precedence.TUPLE, target)
         self.traverse(target)
         self.write(" = ")
@@ -318,7 +638,7 @@ class Transpiler(ast._Unparser):
         if isinstance(node.annotation, ast.Name) and node.annotation.id == "__static__":
             self.write("static ")
         elif isinstance(node.annotation, ast.Name) and node.annotation.id == "__const__":
-            self.write("export const ")
+            self.write("export const " if self.exporter is None else "const ")
         else:
             self.write("var ")
         with self.delimit_if("(", ")", not node.simple and isinstance(node.target, ast.Name)):
@@ -326,12 +646,17 @@ class Transpiler(ast._Unparser):
         self.write(" = ")
         self.traverse(node.value)
         self.write(";")
+        if (
+            isinstance(node.annotation, ast.Name) and node.annotation.id == "__const__" and
+            self.exporter is not None and (export_stmt := self.exporter(self.js_name(node.target.obj, node.target.id)))
+        ):
+            self.fill(export_stmt)
 
     def visit_Name(self, node):
         if node.id == "self" and isinstance(node.obj, Instance):
             self.write("this")
         else:
-            self.write(node.id)
+            self.write(self.js_name(getattr(node, "obj", None), node.id))
 
     def visit_Constant(self, node):
         value = node.value
@@ -350,23 +675,34 @@ class Transpiler(ast._Unparser):
             self._write_constant(node.value)
 
     def visit_Dict(self, node: ast.Dict):
+        is_object = isinstance(node.obj, Class) and node.obj.js_repr == "Object"
+
         def write_key_value_pair(k, v):
-            with self.delimit("[", "]"):
-                self.traverse(k)
-                self.write(", ")
+            if is_object:
+                if isinstance(k, ast.Constant):
+                    self.traverse(k)
+                else:
+                    with self.delimit("[", "]"):
+                        self.traverse(k)
+                self.write(": ")
                 self.traverse(v)
+            else:
+                with self.delimit("[", "]"):
+                    self.traverse(k)
+                    self.write(", ")
+                    self.traverse(v)
 
         def write_item(item):
             k, v = item
             if k is None:
                 # for dictionary unpacking operator in dicts {**{'y': 2}}
                 # see PEP 448 for details
-                self.write("**")
+                self.write("...")
                 self.traverse(v)
             else:
                 write_key_value_pair(k, v)
 
-        with self.delimit("new Map([", "])"):
+        with self.delimit(*(("{", "}") if is_object else ("new Map([", "])"))):
             self.interleave(
                 lambda: self.write(", "), write_item, zip(node.keys, node.values)
             )
@@ -449,13 +785,129 @@ class Transpiler(ast._Unparser):
         self.traverse(node.value)
 
     def visit_JoinedStr(self, node):
-        for i, value in enumerate(node.values):
-            self.traverse(value)
-            if len(node.values) > 1 and i < (len(node.values)-1):
-                self.write("+")
+        with self.delimit("`", "`"):
+            for value in node.values:
+                if isinstance(value, ast.Constant):
+                    self.write(template_literal_text(value.value))
+                else:
+                    self.traverse(value)
 
     def visit_FormattedValue(self, node: ast.FormattedValue):
-        self.traverse(node.value)
+        src = self.isolated_visit(node.value)
+        if node.conversion in (ord("r"), ord("a")):
+            src = f"JSON.stringify({src})"
+        elif node.conversion == ord("s"):
+            src = f"String({src})"
+        spec = static_format_spec(node)
+        if spec is None:
+            raise NotImplementedError("f-string format specs must be literals")
+        if spec:
+            obj = node.value.obj
+            cls = obj.cls if isinstance(obj, Instance) else obj
+            is_number = node.conversion == -1 and getattr(cls, "name", None) in ("int", "float")
+            src = format_spec_js(src, spec, is_number)
+        with self.delimit("${", "}"):
+            self.write(src)
+
+
+def template_literal_text(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\").replace("`", "\\`").replace("${", "\\${")
+        .replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    )
+
+
+FORMAT_SPEC = re.compile(
+    r"(?:(?P<fill>.)?(?P<align>[<>^]))?(?P<sign>[+\- ])?(?P<zero>0)?(?P<width>\d+)?"
+    r"(?P<grouping>,)?(?:\.(?P<precision>\d+))?(?P<type>[bdfFosxX%])?"
+)
+
+
+def format_spec_js(src: str, spec: str, is_number: bool) -> str:
+    """ Lower a literal format spec to the equivalent JS string expression. """
+    match = FORMAT_SPEC.fullmatch(spec)
+    if match is None:
+        raise NotImplementedError(f"Unsupported format spec {spec!r}")
+    fill, align, sign, zero, width, grouping, precision, type_ = match.groups()
+    if not is_number:
+        if type_ not in (None, "s") or sign or zero or grouping or precision:
+            raise NotImplementedError(f"Unsupported format spec {spec!r} for non-numbers")
+        src = f"String({src})"
+        align = align or "<"
+    else:
+        fixed = 6 if precision is None else int(precision)
+        if type_ in ("f", "F"):
+            if grouping:
+                src = f"({src}).toLocaleString('en-US', {{minimumFractionDigits: {fixed}, maximumFractionDigits: {fixed}}})"
+            else:
+                src = f"({src}).toFixed({fixed})"
+        elif type_ == "%":
+            src = f"(({src}) * 100).toFixed({fixed}) + '%'"
+        elif type_ in ("b", "o", "x", "X"):
+            src = f"({src}).toString({ {'b': 2, 'o': 8, 'x': 16, 'X': 16}[type_] })"
+            if type_ == "X":
+                src = f"{src}.toUpperCase()"
+        elif grouping:
+            # like repr(), keep every fraction digit instead of rounding to three
+            src = f"({src}).toLocaleString('en-US', {{maximumFractionDigits: 20}})"
+        elif precision is not None:
+            raise NotImplementedError(f"Unsupported format spec {spec!r}")
+        else:
+            src = f"String({src})"
+        if sign == "+":
+            src = f"({src}).replace(/^(?!-)/, '+')"
+        elif sign == " ":
+            src = f"({src}).replace(/^(?!-)/, ' ')"
+        align = align or ">"
+        if zero and not fill and width:
+            # zero padding goes between the sign and the digits
+            return f"({src}).padStart({width}, '0').replace(/^(0*)([-+ ])/, '$2$1')"
+    if width:
+        if align == "^":
+            raise NotImplementedError(f"Unsupported format spec {spec!r}")
+        pad = "padStart" if align == ">" else "padEnd"
+        src = f"({src}).{pad}({width}, {repr(fill or ' ')})"
+    return src
+
+
+RESUME_STATE = "(globalThis.$pyjsState ??= JSON.parse(document.getElementById('pyjs-state')?.textContent ?? '{}'))"
+
+PLAIN_DATA = {"int", "float", "str", "bool"}
+
+
+def is_plain_data(cls) -> bool:
+    """ Types that survive a JSON round trip: numbers, strings, booleans and lists or str keyed dicts of them. """
+    if not isinstance(cls, Class) or not getattr(cls.py_cls, "__builtin__", False):
+        return False
+    if cls.generic_name == "list" and cls.generic_types:
+        return all(is_plain_data(t) for t in cls.generic_types.values())
+    if cls.generic_name == "dict" and cls.generic_types:
+        return cls.js_repr == "Object" and is_plain_data(cls.generic_types.get("V"))
+    return not cls.generic_types and cls.name in PLAIN_DATA
+
+
+def state_attributes(cls: Class) -> tuple[str, ...]:
+    """ Instance attributes of a custom element, and the ones it inherits, holding plain data. """
+    classes = []
+    while cls is not None and issubclass(cls.py_cls, CustomElement) and cls.py_cls is not CustomElement:
+        classes.insert(0, cls)
+        cls = cls.super
+    names = {}
+    for cls in classes:
+        for name, attr in cls._self.attrs.items():
+            if isinstance(attr, Instance) and is_plain_data(attr.cls):
+                names[name] = None
+    return tuple(names)
+
+
+def state_classes(entry_point: Function) -> dict[type, tuple[str, ...]]:
+    """ The state_attributes() each custom element class of the build resumes from, for pyjs.server.page(). """
+    return {
+        obj.py_cls: names
+        for module in entry_point.container.container.values() for obj in module.children
+        if isinstance(obj, Class) and obj.init is not None and issubclass(obj.py_cls, CustomElement)
+        and obj.py_cls is not CustomElement and (names := state_attributes(obj))
+    }
 
 
 class HydrateGenerator(ast.NodeVisitor):
@@ -475,11 +927,14 @@ class HydrateGenerator(ast.NodeVisitor):
 
     def visit_Assign(self, node: ast.Assign):
         targets = []
+        # assigning a parameter or local gives an Instance, a call its class
+        value_cls = node.value.obj.cls if isinstance(node.value.obj, Instance) else node.value.obj
         for target in node.targets:
             if (isinstance(target, ast.Attribute) and
                 isinstance(target.value, Name) and
                 target.value.id == "self" and
-                issubclass(node.value.obj.py_cls, (HTMLElement, ProxyElement))
+                isinstance(value_cls, Class) and
+                issubclass(value_cls.py_cls, (HTMLElement, ProxyElement))
             ):
                 assert len(node.targets) == 1
                 self.elements.add(target.obj)
@@ -489,11 +944,11 @@ class HydrateGenerator(ast.NodeVisitor):
             self.add_self_id(target.value)
             self.fill()
             self.transpiler.traverse(target)
-            if issubclass(node.value.obj.py_cls, HTMLElement):
+            if issubclass(value_cls.py_cls, HTMLElement):
                 self.write(f" = document.getElementById(self_id+'-{target.attr}');")
-            elif issubclass(node.value.obj.py_cls, ProxyElement):
-                self.write(f" = new {node.value.obj.name}()._hydrate(document.getElementById(self_id+'-{target.attr}'));")
-            elif issubclass(node.value.obj.py_cls, ContextProxy):
+            elif issubclass(value_cls.py_cls, ProxyElement):
+                self.write(f" = new {self.transpiler.js_name(value_cls, value_cls.name)}()._hydrate(document.getElementById(self_id+'-{target.attr}'));")
+            elif issubclass(value_cls.py_cls, ContextProxy):
                 self.write(f" = document.getElementById(self_id+'-{target.attr}');")
 
     def visit_Expr(self, node: ast.Expr):
@@ -502,4 +957,135 @@ class HydrateGenerator(ast.NodeVisitor):
             # TODO: this should probably just only allow addEventListener,
             #       a general customizable solution would be even better
             if isinstance(func, Attribute) and (func.value.obj in self.elements or func.attr == "addEventListener"):
-                self.transpiler.traverse(node)
\ No newline at end of file
+                self.transpiler.traverse(node)
+
+def tuples_as_lists(node):
+    """ Tuples are arrays in JS, unparsed as they are they'd be the comma operator. """
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return ast.List([tuples_as_lists(e) for e in node.elts])
+    if isinstance(node, ast.Dict):
+        return ast.Dict(node.keys, [tuples_as_lists(v) for v in node.values])
+    return node
+
+
+IMMUTABLE_RESULTS = {str, int, float, bool, tuple, "str", "int", "float", "bool"}
+# (module, name) of functions which only read their arguments
+READ_ONLY_CALLEES = {("pyjs.domx", "tag")}
+
+
+class ConstantHoister(ast.NodeVisitor):
+    """
+    Finds constant expressions inside of functions which can be evaluated
+    once at module level, where sharing the value can't be observed:
+    tuples of constants, calls to @js(pure=True) functions with constant
+    arguments returning str, int, float, bool or tuple, other pure calls
+    only as arguments of READ_ONLY_CALLEES (eg. tw() passed to tag()) and
+    lists and dicts of constants only where they are read: iterated by a
+    for loop, searched by in or subscripted.
+    """
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.hoisted: dict[int, tuple[str, ast.expr]] = {}
+        self.constants: dict[str, tuple[str, ast.expr]] = {}
+        self.in_function = False
+
+    def is_read_only(self, node):
+        if isinstance(node, ast.Constant):
+            return True
+        elif isinstance(node, ast.Tuple):
+            return all(self.is_read_only(e) for e in node.elts)
+        return False
+
+    def is_constant(self, node):
+        if self.is_read_only(node):
+            return True
+        elif isinstance(node, ast.List):
+            return all(self.is_constant(e) for e in node.elts)
+        elif isinstance(node, ast.Dict):
+            return all(k is not None and self.is_constant(k) for k in node.keys) and \
+                   all(self.is_constant(v) for v in node.values)
+        elif isinstance(node, Call):
+            func = node.func.obj
+            return (
+                isinstance(node.func, Name) and
+                isinstance(func, Function) and
+                isinstance(func.container, Module) and
+                has_pure_decorator(func.py_func) and
+                not node.keywords and
+                all(self.is_constant(a) for a in node.args)
+            )
+        return False
+
+    def has_immutable_result(self, node):
+        annotation = node.func.obj.py_func.__annotations__.get("return")
+        return (getattr(annotation, "__origin__", annotation)) in IMMUTABLE_RESULTS
+
+    def reads_only(self, node):
+        func = getattr(node.func, "obj", None)
+        return (
+            isinstance(func, Function) and
+            isinstance(func.container, Module) and
+            (func.container.name, func.name) in READ_ONLY_CALLEES
+        )
+
+    def hoist(self, node):
+        if self.in_function and self.is_constant(node):
+            key = ast.dump(node)
+            if key not in self.constants:
+                self.constants[key] = (f"$c{self.prefix}{len(self.constants)}", node)
+            self.hoisted[id(node)] = self.constants[key]
+        else:
+            self.generic_visit(node)
+
+    def hoist_read(self, node):
+        """ Lists and dicts which are only read, with read only elements since Object.freeze() is shallow. """
+        if isinstance(node, ast.List) and node.elts and all(self.is_read_only(e) for e in node.elts):
+            self.hoist(node)
+        elif isinstance(node, ast.Dict) and node.keys and all(
+            k is not None and self.is_read_only(k) and self.is_read_only(v) for k, v in zip(node.keys, node.values)
+        ):
+            self.hoist(node)
+        else:
+            self.visit(node)
+
+    def visit_FunctionDef(self, node):
+        in_function, self.in_function = self.in_function, True
+        self.generic_visit(node)
+        self.in_function = in_function
+
+    def visit_Tuple(self, node):
+        if self.is_read_only(node):
+            self.hoist(node)
+        else:
+            self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if self.is_constant(node) and self.has_immutable_result(node):
+            self.hoist(node)
+            return
+        self.visit(node.func)
+        reads_only = self.reads_only(node)
+        for arg in node.args + [keyword.value for keyword in node.keywords]:
+            if reads_only and isinstance(arg, Call) and self.is_constant(arg):
+                self.hoist(arg)
+            else:
+                self.visit(arg)
+
+    def visit_For(self, node):
+        self.visit(node.target)
+        self.hoist_read(node.iter)
+        for n in node.body + node.orelse:
+            self.visit(n)
+
+    def visit_Compare(self, node):
+        self.visit(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                self.hoist_read(comparator)
+            else:
+                self.visit(comparator)
+
+    def visit_Subscript(self, node):
+        self.hoist_read(node.value)
+        self.visit(node.slice)
@@ -1,8 +1,16 @@
+import re
 import ast
+import shutil
+import hashlib
+import tempfile
+import threading
 import subprocess
 from io import StringIO
+from pathlib import Path
+from typing import Iterator
 
 from .objects import Function
+from .stats import count
 
 
 class SourceWriter(StringIO):
@@ -46,16 +54,830 @@ def write_types(ast_obj):
     return TypeWriter().visit(ast_obj)
 
 
+TAILWIND_COLORS = {
+    "slate": "f8fafc f1f5f9 e2e8f0 cbd5e1 94a3b8 64748b 475569 334155 1e293b 0f172a 020617",
+    "gray": "f9fafb f3f4f6 e5e7eb d1d5db 9ca3af 6b7280 4b5563 374151 1f2937 111827 030712",
+    "zinc": "fafafa f4f4f5 e4e4e7 d4d4d8 a1a1aa 71717a 52525b 3f3f46 27272a 18181b 09090b",
+    "neutral": "fafafa f5f5f5 e5e5e5 d4d4d4 a3a3a3 737373 525252 404040 262626 171717 0a0a0a",
+    "stone": "fafaf9 f5f5f4 e7e5e4 d6d3d1 a8a29e 78716c 57534e 44403c 292524 1c1917 0c0a09",
+    "red": "fef2f2 fee2e2 fecaca fca5a5 f87171 ef4444 dc2626 b91c1c 991b1b 7f1d1d 450a0a",
+    "orange": "fff7ed ffedd5 fed7aa fdba74 fb923c f97316 ea580c c2410c 9a3412 7c2d12 431407",
+    "amber": "fffbeb fef3c7 fde68a fcd34d fbbf24 f59e0b d97706 b45309 92400e 78350f 451a03",
+    "yellow": "fefce8 fef9c3 fef08a fde047 facc15 eab308 ca8a04 a16207 854d0e 713f12 422006",
+    "lime": "f7fee7 ecfccb d9f99d bef264 a3e635 84cc16 65a30d 4d7c0f 3f6212 365314 1a2e05",
+    "green": "f0fdf4 dcfce7 bbf7d0 86efac 4ade80 22c55e 16a34a 15803d 166534 14532d 052e16",
+    "emerald": "ecfdf5 d1fae5 a7f3d0 6ee7b7 34d399 10b981 059669 047857 065f46 064e3b 022c22",
+    "teal": "f0fdfa ccfbf1 99f6e4 5eead4 2dd4bf 14b8a6 0d9488 0f766e 115e59 134e4a 042f2e",
+    "cyan": "ecfeff cffafe a5f3fc 67e8f9 22d3ee 06b6d4 0891b2 0e7490 155e75 164e63 083344",
+    "sky": "f0f9ff e0f2fe bae6fd 7dd3fc 38bdf8 0ea5e9 0284c7 0369a1 075985 0c4a6e 082f49",
+    "blue": "eff6ff dbeafe bfdbfe 93c5fd 60a5fa 3b82f6 2563eb 1d4ed8 1e40af 1e3a8a 172554",
+    "indigo": "eef2ff e0e7ff c7d2fe a5b4fc 818cf8 6366f1 4f46e5 4338ca 3730a3 312e81 1e1b4b",
+    "violet": "f5f3ff ede9fe ddd6fe c4b5fd a78bfa 8b5cf6 7c3aed 6d28d9 5b21b6 4c1d95 2e1065",
+    "purple": "faf5ff f3e8ff e9d5ff d8b4fe c084fc a855f7 9333ea 7e22ce 6b21a8 581c87 3b0764",
+    "fuchsia": "fdf4ff fae8ff f5d0fe f0abfc e879f9 d946ef c026d3 a21caf 86198f 701a75 4a044e",
+    "pink": "fdf2f8 fce7f3 fbcfe8 f9a8d4 f472b6 ec4899 db2777 be185d 9d174d 831843 500724",
+    "rose": "fff1f2 ffe4e6 fecdd3 fda4af fb7185 f43f5e e11d48 be123c 9f1239 881337 4c0519",
+}
+TAILWIND_SHADES = ["50", "100", "200", "300", "400", "500", "600", "700", "800", "900", "950"]
+TAILWIND_SPECIAL_COLORS = {
+    "white": "#fff", "black": "#000", "transparent": "transparent", "current": "currentColor", "inherit": "inherit"
+}
+TAILWIND_SCREENS = {"sm": "640px", "md": "768px", "lg": "1024px", "xl": "1280px", "2xl": "1536px"}
+TAILWIND_PSEUDO_VARIANTS = {
+    "first": ":first-child", "last": ":last-child", "odd": ":nth-child(odd)", "even": ":nth-child(even)",
+    "visited": ":visited", "focus-within": ":focus-within", "hover": ":hover", "focus": ":focus",
+    "focus-visible": ":focus-visible", "active": ":active", "disabled": ":disabled",
+    "placeholder": "::placeholder",
+}
+TAILWIND_SPACING = {"0": "0px", "px": "1px"} | {
+    n: f"{float(n) / 4:g}rem" for n in (
+        "0.5 1 1.5 2 2.5 3 3.5 4 5 6 7 8 9 10 11 12 14 16 20 24 28 32 36 40 44 48 52 56 60 64 72 80 96".split()
+    )
+}
+TAILWIND_FONT_SIZES = {
+    "xs": ("0.75rem", "1rem"), "sm": ("0.875rem", "1.25rem"), "base": ("1rem", "1.5rem"),
+    "lg": ("1.125rem", "1.75rem"), "xl": ("1.25rem", "1.75rem"), "2xl": ("1.5rem", "2rem"),
+    "3xl": ("1.875rem", "2.25rem"), "4xl": ("2.25rem", "2.5rem"), "5xl": ("3rem", "1"),
+    "6xl": ("3.75rem", "1"), "7xl": ("4.5rem", "1"), "8xl": ("6rem", "1"), "9xl": ("8rem", "1"),
+}
+TAILWIND_FONT_WEIGHTS = {
+    "thin": "100", "extralight": "200", "light": "300", "normal": "400", "medium": "500",
+    "semibold": "600", "bold": "700", "extrabold": "800", "black": "900",
+}
+TAILWIND_FONT_FAMILIES = {
+    "sans": 'ui-sans-serif, system-ui, sans-serif, "Apple Color Emoji", "Segoe UI Emoji", "Segoe UI Symbol", "Noto Color Emoji"',
+    "serif": 'ui-serif, Georgia, Cambria, "Times New Roman", Times, serif',
+    "mono": 'ui-monospace, SFMono-Regular, Menlo, Monaco, Consolas, "Liberation Mono", "Courier New", monospace',
+}
+TAILWIND_LEADING = {
+    "none": "1", "tight": "1.25", "snug": "1.375", "normal": "1.5", "relaxed": "1.625", "loose": "2",
+} | {str(n): f"{n / 4:g}rem" for n in range(3, 11)}
+TAILWIND_TRACKING = {
+    "tighter": "-0.05em", "tight": "-0.025em", "normal": "0em", "wide": "0.025em", "wider": "0.05em", "widest": "0.1em",
+}
+TAILWIND_RADIUS = {
+    "": "0.25rem", "none": "0px", "sm": "0.125rem", "md": "0.375rem", "lg": "0.5rem", "xl": "0.75rem",
+    "2xl": "1rem", "3xl": "1.5rem", "full": "9999px",
+}
+TAILWIND_RADIUS_SIDES = {
+    "": ["border-radius"],
+    "t": ["border-top-left-radius", "border-top-right-radius"],
+    "r": ["border-top-right-radius", "border-bottom-right-radius"],
+    "b": ["border-bottom-right-radius", "border-bottom-left-radius"],
+    "l": ["border-top-left-radius", "border-bottom-left-radius"],
+    "tl": ["border-top-left-radius"], "tr": ["border-top-right-radius"],
+    "br": ["border-bottom-right-radius"], "bl": ["border-bottom-left-radius"],
+}
+TAILWIND_SHADOWS = {
+    "": "0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)",
+    "sm": "0 1px 2px 0 rgb(0 0 0 / 0.05)",
+    "md": "0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)",
+    "lg": "0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)",
+    "xl": "0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1)",
+    "2xl": "0 25px 50px -12px rgb(0 0 0 / 0.25)",
+    "inner": "inset 0 2px 4px 0 rgb(0 0 0 / 0.05)",
+    "none": "0 0 #0000",
+}
+TAILWIND_MAX_WIDTHS = {
+    "0": "0rem", "none": "none", "xs": "20rem", "sm": "24rem", "md": "28rem", "lg": "32rem", "xl": "36rem",
+    "2xl": "42rem", "3xl": "48rem", "4xl": "56rem", "5xl": "64rem", "6xl": "72rem", "7xl": "80rem",
+    "full": "100%", "min": "min-content", "max": "max-content", "fit": "fit-content", "prose": "65ch",
+} | {f"screen-{name}": width for name, width in TAILWIND_SCREENS.items()}
+TAILWIND_TRANSITIONS = {
+    "": "color, background-color, border-color, text-decoration-color, fill, stroke, opacity, box-shadow, transform, filter, backdrop-filter",
+    "all": "all",
+    "colors": "color, background-color, border-color, text-decoration-color, fill, stroke",
+    "opacity": "opacity",
+    "shadow": "box-shadow",
+    "transform": "transform",
+}
+TAILWIND_SIDES = {
+    "": [""], "x": ["-left", "-right"], "y": ["-top", "-bottom"],
+    "t": ["-top"], "r": ["-right"], "b": ["-bottom"], "l": ["-left"],
+}
+TAILWIND_PREFLIGHT = f"""\
+*, ::before, ::after {{ box-sizing: border-box; border-width: 0; border-style: solid; border-color: #e5e7eb; }}
+html, :host {{ line-height: 1.5; -webkit-text-size-adjust: 100%; tab-size: 4; font-family: {TAILWIND_FONT_FAMILIES["sans"]}; }}
+body {{ margin: 0; line-height: inherit; }}
+hr {{ height: 0; color: inherit; border-top-width: 1px; }}
+h1, h2, h3, h4, h5, h6 {{ font-size: inherit; font-weight: inherit; }}
+a {{ color: inherit; text-decoration: inherit; }}
+b, strong {{ font-weight: bolder; }}
+code, kbd, samp, pre {{ font-family: {TAILWIND_FONT_FAMILIES["mono"]}; font-size: 1em; }}
+button, input, optgroup, select, textarea {{ font-family: inherit; font-size: 100%; font-weight: inherit; line-height: inherit; color: inherit; margin: 0; padding: 0; }}
+button, select {{ text-transform: none; }}
+button, [type='button'], [type='reset'], [type='submit'] {{ -webkit-appearance: button; background-color: transparent; background-image: none; }}
+blockquote, dl, dd, h1, h2, h3, h4, h5, h6, hr, figure, p, pre {{ margin: 0; }}
+ol, ul, menu {{ list-style: none; margin: 0; padding: 0; }}
+textarea {{ resize: vertical; }}
+input::placeholder, textarea::placeholder {{ opacity: 1; color: #9ca3af; }}
+button, [role="button"] {{ cursor: pointer; }}
+img, svg, video, canvas, audio, iframe, embed, object {{ display: block; vertical-align: middle; }}
+img, video {{ max-width: 100%; height: auto; }}
+[hidden] {{ display: none; }}
+"""
+
+
+def tailwind_arbitrary(value: str) -> str | None:
+    if value.startswith("[") and value.endswith("]") and len(value) > 2:
+        return value[1:-1].replace("_", " ")
+
+
+def tailwind_fraction(value: str) -> str | None:
+    numerator, _, denominator = value.partition("/")
+    if numerator.isdigit() and denominator in ("2", "3", "4", "5", "6", "12"):
+        return f"{int(numerator) * 100 / int(denominator):.6f}".rstrip("0").rstrip(".") + "%"
+
+
+def tailwind_spacing(value: str, extra: dict = None) -> str | None:
+    if extra and value in extra:
+        return extra[value]
+    return TAILWIND_SPACING.get(value) or tailwind_arbitrary(value)
+
+
+def tailwind_size(value: str, viewport: str) -> str | None:
+    special = {"auto": "auto", "full": "100%", "screen": f"100{viewport}", "min": "min-content",
+               "max": "max-content", "fit": "fit-content"}
+    return tailwind_spacing(value, special) or tailwind_fraction(value)
+
+
+def tailwind_color(value: str) -> str | None:
+    value, _, alpha = value.partition("/")
+    if (color := tailwind_arbitrary(value)) is None and (color := TAILWIND_SPECIAL_COLORS.get(value)) is None:
+        name, _, shade = value.rpartition("-")
+        if name not in TAILWIND_COLORS or shade not in TAILWIND_SHADES:
+            return None
+        color = "#" + TAILWIND_COLORS[name].split()[TAILWIND_SHADES.index(shade)]
+    if not alpha:
+        return color
+    if not alpha.isdigit() or not color.startswith("#") or len(color) not in (4, 7):
+        return None
+    digits = color[1:] if len(color) == 7 else "".join(c * 2 for c in color[1:])
+    r, g, b = (int(digits[i:i + 2], 16) for i in (0, 2, 4))
+    return f"rgb({r} {g} {b} / {int(alpha) / 100:g})"
+
+
+def tailwind_sided(prefix: str, prop: str, scale):
+    """ Utilities like p-4, px-4 and pt-4 setting prop on one or more sides. """
+    def utility(side, value):
+        if (css := scale(value)) is not None:
+            return [(f"{prop}{suffix}", css) for suffix in TAILWIND_SIDES[side]]
+    return [(f"{prefix}{side}", lambda value, side=side: utility(side, value)) for side in TAILWIND_SIDES]
+
+
+def tailwind_property(*props: str, scale):
+    def utility(value):
+        if (css := scale(value)) is not None:
+            return [(prop, css) for prop in props]
+    return utility
+
+
+def tailwind_keyword(prop: str, keywords: dict):
+    return tailwind_property(prop, scale=keywords.get)
+
+
+def tailwind_int(start: int, stop: int, extra: dict = None):
+    def scale(value):
+        if extra and value in extra:
+            return extra[value]
+        if value.isdigit() and start <= int(value) <= stop:
+            return value
+        return tailwind_arbitrary(value)
+    return scale
+
+
+def tailwind_font_size(value):
+    if value in TAILWIND_FONT_SIZES:
+        size, line_height = TAILWIND_FONT_SIZES[value]
+        return [("font-size", size), ("line-height", line_height)]
+    if (value := tailwind_arbitrary(value)) is not None and value[:1].isdigit():
+        return [("font-size", value)]
+
+
+def tailwind_border_width(value):
+    widths = {"": "1px", "0": "0px", "2": "2px", "4": "4px", "8": "8px"}
+    return widths.get(value) or tailwind_arbitrary(value)
+
+
+def tailwind_rounded(side, value):
+    if (radius := TAILWIND_RADIUS.get(value) or tailwind_arbitrary(value)) is not None:
+        return [(prop, radius) for prop in TAILWIND_RADIUS_SIDES[side]]
+
+
+def tailwind_transition(value):
+    if value == "none":
+        return [("transition-property", "none")]
+    if value in TAILWIND_TRANSITIONS:
+        return [
+            ("transition-property", TAILWIND_TRANSITIONS[value]),
+            ("transition-timing-function", "cubic-bezier(0.4, 0, 0.2, 1)"),
+            ("transition-duration", "150ms"),
+        ]
+
+
+TAILWIND_STATIC = {
+    "sr-only": [
+        ("position", "absolute"), ("width", "1px"), ("height", "1px"), ("padding", "0"), ("margin", "-1px"),
+        ("overflow", "hidden"), ("clip", "rect(0, 0, 0, 0)"), ("white-space", "nowrap"), ("border-width", "0"),
+    ],
+    "pointer-events-none": [("pointer-events", "none")], "pointer-events-auto": [("pointer-events", "auto")],
+    "visible": [("visibility", "visible")], "invisible": [("visibility", "hidden")],
+    **{p: [("position", p)] for p in ("static", "fixed", "absolute", "relative", "sticky")},
+    **{d: [("display", d)] for d in (
+        "block", "inline-block", "inline", "flex", "inline-flex", "table", "grid", "inline-grid", "contents",
+        "list-item",
+    )},
+    "hidden": [("display", "none")],
+    "aspect-auto": [("aspect-ratio", "auto")], "aspect-square": [("aspect-ratio", "1 / 1")],
+    "aspect-video": [("aspect-ratio", "16 / 9")],
+    "flex-1": [("flex", "1 1 0%")], "flex-auto": [("flex", "1 1 auto")],
+    "flex-initial": [("flex", "0 1 auto")], "flex-none": [("flex", "none")],
+    "shrink": [("flex-shrink", "1")], "shrink-0": [("flex-shrink", "0")],
+    "grow": [("flex-grow", "1")], "grow-0": [("flex-grow", "0")],
+    **{f"cursor-{c}": [("cursor", c)] for c in (
+        "auto", "default", "pointer", "wait", "text", "move", "not-allowed", "grab", "grabbing",
+    )},
+    "select-none": [("user-select", "none")], "select-text": [("user-select", "text")],
+    "select-all": [("user-select", "all")], "select-auto": [("user-select", "auto")],
+    "flex-row": [("flex-direction", "row")], "flex-row-reverse": [("flex-direction", "row-reverse")],
+    "flex-col": [("flex-direction", "column")], "flex-col-reverse": [("flex-direction", "column-reverse")],
+    "flex-wrap": [("flex-wrap", "wrap")], "flex-wrap-reverse": [("flex-wrap", "wrap-reverse")],
+    "flex-nowrap": [("flex-wrap", "nowrap")],
+    "grid-flow-row": [("grid-auto-flow", "row")], "grid-flow-col": [("grid-auto-flow", "column")],
+    "grid-flow-dense": [("grid-auto-flow", "dense")],
+    **{f"items-{k}": [("align-items", v)] for k, v in {
+        "start": "flex-start", "end": "flex-end", "center": "center", "baseline": "baseline", "stretch": "stretch",
+    }.items()},
+    **{f"content-{k}": [("align-content", v)] for k, v in {
+        "start": "flex-start", "end": "flex-end", "center": "center", "between": "space-between",
+        "around": "space-around", "evenly": "space-evenly", "stretch": "stretch",
+    }.items()},
+    **{f"justify-{k}": [("justify-content", v)] for k, v in {
+        "normal": "normal", "start": "flex-start", "end": "flex-end", "center": "center",
+        "between": "space-between", "around": "space-around", "evenly": "space-evenly", "stretch": "stretch",
+    }.items()},
+    **{f"justify-items-{k}": [("justify-items", k)] for k in ("start", "end", "center", "stretch")},
+    **{f"justify-self-{k}": [("justify-self", k)] for k in ("auto", "start", "end", "center", "stretch")},
+    **{f"self-{k}": [("align-self", v)] for k, v in {
+        "auto": "auto", "start": "flex-start", "end": "flex-end", "center": "center", "stretch": "stretch",
+        "baseline": "baseline",
+    }.items()},
+    **{f"place-items-{k}": [("place-items", k)] for k in ("start", "end", "center", "stretch")},
+    **{f"place-content-{k}": [("place-content", v)] for k, v in {
+        "start": "start", "end": "end", "center": "center", "between": "space-between", "stretch": "stretch",
+    }.items()},
+    **{f"overflow-{k}": [("overflow", k)] for k in ("auto", "hidden", "clip", "visible", "scroll")},
+    **{f"overflow-{axis}-{k}": [(f"overflow-{axis}", k)] for axis in "xy"
+       for k in ("auto", "hidden", "clip", "visible", "scroll")},
+    "truncate": [("overflow", "hidden"), ("text-overflow", "ellipsis"), ("white-space", "nowrap")],
+    **{f"whitespace-{k}": [("white-space", k)] for k in ("normal", "nowrap", "pre", "pre-line", "pre-wrap")},
+    "break-words": [("overflow-wrap", "break-word")], "break-all": [("word-break", "break-all")],
+    **{f"border-{k}": [("border-style", k)] for k in ("solid", "dashed", "dotted", "double", "hidden", "none")},
+    **{f"object-{k}": [("object-fit", k)] for k in ("contain", "cover", "fill", "none", "scale-down")},
+    **{f"text-{k}": [("text-align", k)] for k in ("left", "center", "right", "justify", "start", "end")},
+    **{f"font-{k}": [("font-family", v)] for k, v in TAILWIND_FONT_FAMILIES.items()},
+    **{f"font-{k}": [("font-weight", v)] for k, v in TAILWIND_FONT_WEIGHTS.items()},
+    "uppercase": [("text-transform", "uppercase")], "lowercase": [("text-transform", "lowercase")],
+    "capitalize": [("text-transform", "capitalize")], "normal-case": [("text-transform", "none")],
+    "italic": [("font-style", "italic")], "not-italic": [("font-style", "normal")],
+    "underline": [("text-decoration-line", "underline")], "overline": [("text-decoration-line", "overline")],
+    "line-through": [("text-decoration-line", "line-through")], "no-underline": [("text-decoration-line", "none")],
+    "outline-none": [("outline", "2px solid transparent"), ("outline-offset", "2px")],
+    **{f"ease-{k}": [("transition-timing-function", v)] for k, v in {
+        "linear": "linear", "in": "cubic-bezier(0.4, 0, 1, 1)", "out": "cubic-bezier(0, 0, 0.2, 1)",
+        "in-out": "cubic-bezier(0.4, 0, 0.2, 1)",
+    }.items()},
+}
+
+# (prefix, utility) in Tailwind's plugin order, utilities return None for values they don't accept
+TAILWIND_FUNCTIONAL = [
+    ("inset", tailwind_property("inset", scale=lambda v: tailwind_size(v, "vw"))),
+    ("inset-x", tailwind_property("left", "right", scale=lambda v: tailwind_size(v, "vw"))),
+    ("inset-y", tailwind_property("top", "bottom", scale=lambda v: tailwind_size(v, "vh"))),
+    *[(side, tailwind_property(side, scale=lambda v: tailwind_size(v, "vw")))
+      for side in ("top", "right", "bottom", "left")],
+    ("z", tailwind_property("z-index", scale=tailwind_int(0, 50, {"auto": "auto"}))),
+    ("order", tailwind_property("order", scale=tailwind_int(1, 12, {
+        "first": "-9999", "last": "9999", "none": "0"
+    }))),
+    ("col-span", tailwind_property("grid-column", scale=lambda v: (
+        "1 / -1" if v == "full" else f"span {v} / span {v}" if v.isdigit() else None
+    ))),
+    ("col-start", tailwind_property("grid-column-start", scale=tailwind_int(1, 13, {"auto": "auto"}))),
+    ("col-end", tailwind_property("grid-column-end", scale=tailwind_int(1, 13, {"auto": "auto"}))),
+    ("row-span", tailwind_property("grid-row", scale=lambda v: (
+        "1 / -1" if v == "full" else f"span {v} / span {v}" if v.isdigit() else None
+    ))),
+    ("row-start", tailwind_property("grid-row-start", scale=tailwind_int(1, 13, {"auto": "auto"}))),
+    ("row-end", tailwind_property("grid-row-end", scale=tailwind_int(1, 13, {"auto": "auto"}))),
+    *tailwind_sided("m", "margin", lambda v: tailwind_spacing(v, {"auto": "auto"})),
+    ("h", tailwind_property("height", scale=lambda v: tailwind_size(v, "vh"))),
+    ("max-h", tailwind_property("max-height", scale=lambda v: tailwind_size(v, "vh"))),
+    ("min-h", tailwind_property("min-height", scale=lambda v: tailwind_size(v, "vh"))),
+    ("w", tailwind_property("width", scale=lambda v: tailwind_size(v, "vw"))),
+    ("min-w", tailwind_property("min-width", scale=lambda v: tailwind_size(v, "vw"))),
+    ("max-w", tailwind_property("max-width", scale=lambda v: TAILWIND_MAX_WIDTHS.get(v) or tailwind_arbitrary(v))),
+    ("basis", tailwind_property("flex-basis", scale=lambda v: tailwind_size(v, "vw"))),
+    ("grid-cols", tailwind_property("grid-template-columns", scale=lambda v: (
+        "none" if v == "none" else f"repeat({v}, minmax(0, 1fr))" if v.isdigit() else tailwind_arbitrary(v)
+    ))),
+    ("grid-rows", tailwind_property("grid-template-rows", scale=lambda v: (
+        "none" if v == "none" else f"repeat({v}, minmax(0, 1fr))" if v.isdigit() else tailwind_arbitrary(v)
+    ))),
+    ("auto-cols", tailwind_keyword("grid-auto-columns", {
+        "auto": "auto", "min": "min-content", "max": "max-content", "fr": "minmax(0, 1fr)"
+    })),
+    ("auto-rows", tailwind_keyword("grid-auto-rows", {
+        "auto": "auto", "min": "min-content", "max": "max-content", "fr": "minmax(0, 1fr)"
+    })),
+    ("gap", tailwind_property("gap", scale=tailwind_spacing)),
+    ("gap-x", tailwind_property("column-gap", scale=tailwind_spacing)),
+    ("gap-y", tailwind_property("row-gap", scale=tailwind_spacing)),
+    ("space-x", tailwind_property("margin-left", scale=tailwind_spacing)),
+    ("space-y", tailwind_property("margin-top", scale=tailwind_spacing)),
+    *[(f"rounded{'-' if side else ''}{side}", lambda v, side=side: tailwind_rounded(side, v))
+      for side in TAILWIND_RADIUS_SIDES],
+    ("border", tailwind_property("border-width", scale=tailwind_border_width)),
+    *[(f"border-{side}", tailwind_property(f"border{TAILWIND_SIDES[side][0]}-width", scale=tailwind_border_width))
+      for side in "trbl"],
+    ("border-x", tailwind_property("border-left-width", "border-right-width", scale=tailwind_border_width)),
+    ("border-y", tailwind_property("border-top-width", "border-bottom-width", scale=tailwind_border_width)),
+    ("border", tailwind_property("border-color", scale=tailwind_color)),
+    ("bg", tailwind_property("background-color", scale=tailwind_color)),
+    *tailwind_sided("p", "padding", tailwind_spacing),
+    ("text", tailwind_font_size),
+    ("leading", tailwind_property("line-height", scale=lambda v: TAILWIND_LEADING.get(v) or tailwind_arbitrary(v))),
+    ("tracking", tailwind_property("letter-spacing", scale=lambda v: TAILWIND_TRACKING.get(v) or tailwind_arbitrary(v))),
+    ("text", tailwind_property("color", scale=tailwind_color)),
+    ("opacity", tailwind_property("opacity", scale=lambda v: (
+        f"{int(v) / 100:g}" if v.isdigit() and int(v) <= 100 else tailwind_arbitrary(v)
+    ))),
+    ("shadow", tailwind_property("box-shadow", scale=TAILWIND_SHADOWS.get)),
+    ("transition", tailwind_transition),
+    ("duration", tailwind_property("transition-duration", scale=lambda v: f"{v}ms" if v.isdigit() else None)),
+    ("delay", tailwind_property("transition-delay", scale=lambda v: f"{v}ms" if v.isdigit() else None)),
+]
+# order of static utilities, relative to functional ones, follows the property they set
+TAILWIND_PROPERTY_ORDER = [
+    "clip", "pointer-events", "visibility", "position", "inset", "top", "right", "bottom", "left", "z-index", "order", "grid-column", "grid-row",
+    "margin", "display", "aspect-ratio", "height", "max-height", "min-height", "width", "min-width",
+    "max-width", "flex", "flex-shrink", "flex-grow", "flex-basis", "cursor", "user-select",
+    "grid-auto-columns", "grid-auto-flow", "grid-auto-rows", "grid-template-columns", "grid-template-rows",
+    "flex-direction", "flex-wrap",
+    "place-content", "place-items", "align-content", "align-items", "justify-content", "justify-items",
+    "gap", "align-self", "justify-self", "overflow", "text-overflow", "white-space", "overflow-wrap",
+    "word-break", "border-radius", "border-width", "border-style", "border-color", "background-color",
+    "object-fit", "padding", "text-align", "font-family", "font-size", "font-weight", "text-transform",
+    "font-style", "line-height", "letter-spacing", "color", "text-decoration-line", "opacity", "box-shadow",
+    "outline", "transition-property", "transition-delay", "transition-duration", "transition-timing-function",
+]
+
+TAILWIND_SIDE_PROPERTY = re.compile(r"-(top|right|bottom|left)(-(left|right))?(?=-|$)")
+
+
+CSS_NESTED_AT_RULES = ("@media", "@supports", "@container", "@layer")
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CSS_IDENT = re.compile(r"(?:[a-zA-Z0-9_-]|\\[0-9a-fA-F]{1,6} ?|\\.)+")
+
+
+def css_unescape(name: str) -> str:
+    return re.sub(
+        r"\\([0-9a-fA-F]{1,6}) ?|\\(.)",
+        lambda m: chr(int(m.group(1), 16)) if m.group(1) else m.group(2),
+        name
+    )
+
+
+def selector_names(selector: str) -> Iterator[tuple[str, str]]:
+    """ Yields ("." | "#" | "", name) for the classes, ids and tag names in a selector. """
+    i = 0
+    while i < len(selector):
+        c = selector[i]
+        if c == "[":
+            # attribute values can't tell us anything, skip up to the closing bracket
+            while i < len(selector) and selector[i] != "]":
+                i += 2 if selector[i] == "\\" else 1
+            i += 1
+        elif c == ":":
+            match = CSS_IDENT.match(selector, i + 1 + selector.startswith("::", i))
+            i = match.end() if match else i + 1
+            if i < len(selector) and selector[i] == "(":
+                depth = 0
+                while i < len(selector):
+                    depth += {"(": 1, ")": -1}.get(selector[i], 0)
+                    i += 1
+                    if not depth:
+                        break
+        elif (match := CSS_IDENT.match(selector, i + (c in ".#"))) and (c in ".#" or c.isalpha()):
+            yield (c if c in ".#" else ""), css_unescape(match.group())
+            i = match.end()
+        else:
+            i += 1
+
+
+def css_blocks(css: str) -> list[tuple[str, str | list | None]]:
+    """
+    Splits a stylesheet into (prelude, body) pairs, bodies of @media and
+    similar rules are split again, statements like @import have no body.
+    """
+    css = CSS_COMMENT.sub("", css)
+    blocks = []
+    i, start, length = 0, 0, len(css)
+    while i < length:
+        c = css[i]
+        if c in "\"'":
+            end = css.find(c, i + 1)
+            i = length if end == -1 else end + 1
+            continue
+        if c == ";":
+            if statement := css[start:i].strip():
+                blocks.append((statement, None))
+            i = start = i + 1
+            continue
+        if c == "{":
+            prelude = css[start:i].strip()
+            depth, j = 1, i + 1
+            while j < length and depth:
+                if css[j] in "\"'":
+                    end = css.find(css[j], j + 1)
+                    j = length if end == -1 else end
+                elif css[j] == "{":
+                    depth += 1
+                elif css[j] == "}":
+                    depth -= 1
+                j += 1
+            body = css[i + 1:j - 1]
+            if prelude.startswith(CSS_NESTED_AT_RULES):
+                body = css_blocks(body)
+            blocks.append((prelude, body))
+            i = start = j
+            continue
+        i += 1
+    return blocks
+
+
+def css_serialize(blocks: list[tuple[str, str | list | None]]) -> str:
+    out = []
+    for prelude, body in blocks:
+        if body is None:
+            out.append(f"{prelude};")
+        elif isinstance(body, list):
+            out.append(f"{prelude}{{{css_serialize(body)}}}")
+        else:
+            out.append(f"{prelude}{{{' '.join(body.split())}}}")
+    return "\n".join(out)
+
+
+def css_selector_list(prelude: str) -> list[str]:
+    """ Splits a selector list on its top level commas, not those inside :is(), [attr] or strings. """
+    selectors, start, depth, quote, i = [], 0, 0, None, 0
+    while i < len(prelude):
+        c = prelude[i]
+        if c == "\\":
+            i += 1
+        elif quote:
+            quote = None if c == quote else quote
+        elif c in "\"'":
+            quote = c
+        elif c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == "," and not depth:
+            selectors.append(prelude[start:i])
+            start = i + 1
+        i += 1
+    selectors.append(prelude[start:])
+    return selectors
+
+
+def selector_can_match(selector: str, classes: set[str], ids: set[str], tags: set[str]) -> bool:
+    """
+    Whether a selector can match in a page with these classes, ids and tag
+    names, ignoring pseudo-classes and attributes so it errs on keeping.
+    """
+    for kind, name in selector_names(selector):
+        if kind == "." and name not in classes or kind == "#" and name not in ids:
+            return False
+        if not kind and name.lower() not in tags:
+            return False
+    return True
+
+
+def css_subset(css: str, classes: set[str], ids: set[str], tags: set[str]) -> str:
+    """ The rules of a stylesheet that can apply to a page with these classes, ids and tags. """
+    def keep(blocks):
+        kept = []
+        for prelude, body in blocks:
+            if isinstance(body, list):
+                if body := keep(body):
+                    kept.append((prelude, body))
+            elif prelude.startswith("@") or any(
+                selector_can_match(selector, classes, ids, tags) for selector in css_selector_list(prelude)
+            ):
+                kept.append((prelude, body))
+        return kept
+    return css_serialize(keep(css_blocks(css)))
+
+
+def css_escape(name: str) -> str:
+    """ Escapes a class name for use in a selector, like CSS.escape() in the browser. """
+    out = []
+    for i, c in enumerate(name):
+        if c.isalnum() and c.isascii() or c in "-_" or ord(c) >= 0x80:
+            if i == 0 and c.isdigit() or i == 1 and c.isdigit() and name[0] == "-":
+                out.append(f"\\{ord(c):x} ")
+            else:
+                out.append(c)
+        else:
+            out.append("\\" + c)
+    return "".join(out)
+
+
+def tailwind_utility(name: str):
+    """ Returns (order, declarations) for a utility class without variants, None if it isn't known. """
+    important = name.startswith("!")
+    name = name.removeprefix("!")
+    negative = name.startswith("-")
+    name = name.removeprefix("-")
+    declarations, index = None, -1
+    if not negative and name in TAILWIND_STATIC:
+        declarations = TAILWIND_STATIC[name]
+    else:
+        for index, (prefix, utility) in enumerate(TAILWIND_FUNCTIONAL):
+            if name == prefix:
+                value = ""
+            elif name.startswith(prefix + "-"):
+                value = name[len(prefix) + 1:]
+            else:
+                continue
+            if (declarations := utility(value)) is not None:
+                break
+    if not declarations:
+        return None
+    if negative:
+        if not all(v[:1].isdigit() for _, v in declarations):
+            return None
+        declarations = [(p, "0px" if v == "0px" else f"-{v}") for p, v in declarations]
+    if important:
+        declarations = [(p, f"{v} !important") for p, v in declarations]
+    prop = TAILWIND_SIDE_PROPERTY.sub("", declarations[0][0])
+    order = next(
+        (i for i, p in enumerate(TAILWIND_PROPERTY_ORDER) if prop == p or prop.startswith(p + "-")),
+        len(TAILWIND_PROPERTY_ORDER)
+    )
+    # utilities setting the same property keep the plugin order, eg. p before px before pt
+    return (order, index), declarations
+
+
+def tailwind_rule(cls: str):
+    """ Returns (sort key, media query, selector, declarations) for a class, None if it isn't known. """
+    *variants, name = cls.split(":")
+    if (utility := tailwind_utility(name)) is None:
+        return None
+    order, declarations = utility
+    selector = "." + css_escape(cls)
+    screen, dark, pseudo_order = -1, False, []
+    group = ""
+    for variant in variants:
+        if variant in TAILWIND_SCREENS and screen == -1:
+            screen = list(TAILWIND_SCREENS).index(variant)
+        elif variant == "dark" and not dark:
+            dark = True
+        elif variant in TAILWIND_PSEUDO_VARIANTS:
+            pseudo_order.append(list(TAILWIND_PSEUDO_VARIANTS).index(variant))
+            selector += TAILWIND_PSEUDO_VARIANTS[variant]
+        elif variant.startswith("group-") and variant[6:] in TAILWIND_PSEUDO_VARIANTS:
+            pseudo_order.append(list(TAILWIND_PSEUDO_VARIANTS).index(variant[6:]))
+            group += TAILWIND_PSEUDO_VARIANTS[variant[6:]]
+        else:
+            return None
+    if group:
+        selector = f".group{group} {selector}"
+    if name.removeprefix("!").removeprefix("-").startswith(("space-x-", "space-y-")):
+        selector += " > :not([hidden]) ~ :not([hidden])"
+    media = []
+    if dark:
+        media.append("(prefers-color-scheme: dark)")
+    if screen != -1:
+        media.append(f"(min-width: {list(TAILWIND_SCREENS.values())[screen]})")
+    key = (screen, dark, sorted(pseudo_order), order, cls)
+    return key, " and ".join(media), selector, declarations
+
+
+def tailwind_css(classes: set, preflight=True) -> tuple[str, set[str]]:
+    """
+    Generates CSS for the common subset of Tailwind utilities in-process,
+    returns the CSS and the classes it doesn't know.
+    """
+    rules, unknown = [], set()
+    container = "container" in classes
+    for cls in classes:
+        if cls != "container":
+            if (rule := tailwind_rule(cls)) is None:
+                unknown.add(cls)
+            else:
+                rules.append(rule)
+    src = SourceWriter()
+    if preflight:
+        src.write(TAILWIND_PREFLIGHT)
+    if container:
+        src.write_line(".container {")
+        src.write_line("  width: 100%;")
+        src.write_line("}")
+        for width in TAILWIND_SCREENS.values():
+            src.write_line(f"@media (min-width: {width}) {{")
+            src.write_line(f"  .container {{ max-width: {width}; }}")
+            src.write_line("}")
+    for _, media, selector, declarations in sorted(rules, key=lambda r: r[0]):
+        if media:
+            src.write_line(f"@media {media} {{")
+            src.indent()
+        src.write_line(f"{selector} {{")
+        src.indent()
+        for prop, value in declarations:
+            src.write_line(f"{prop}: {value};")
+        src.dedent()
+        src.write_line("}")
+        if media:
+            src.dedent()
+            src.write_line("}")
+    return src.getvalue(), unknown
+
+
+class TailwindWatcher:
+    """
+    A long running `tailwindcss --watch` process, classes are written to its
+    content file and the CSS is read back from its output file once rebuilt.
+    Tailwind only adds rules while watching, so the output grows with the
+    class set instead of being regenerated from scratch. A rebuild is done
+    when the CLI logs "Done in ...", after it has written the output.
+    """
+
+    def __init__(self, tailwindcss: str, config: str = None, timeout: float = 5.0, rebuild_timeout: float = 1.0):
+        self.dir = tempfile.TemporaryDirectory(prefix="pyjs-tailwind-")
+        self.content = Path(self.dir.name) / "content.html"
+        self.output = Path(self.dir.name) / "output.css"
+        self.content.write_text("<div></div>")
+        self.timeout = timeout
+        self.rebuild_timeout = rebuild_timeout
+        self.classes: set[str] = set()
+        self.builds = 0
+        self.built = threading.Condition()
+        # build count the output is waiting on after a rebuild timed out, None once it is up to date
+        self.pending: int = None
+        command = [tailwindcss, "--content", str(self.content), "--output", str(self.output), "--watch"]
+        if config:
+            command += ["--config", config]
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        threading.Thread(target=self.read_log, daemon=True).start()
+        if not self.wait_for_build(1, self.timeout):
+            self.pending = 1
+
+    def alive(self):
+        return self.process.poll() is None
+
+    @property
+    def settled(self):
+        return self.pending is None
+
+    def read_log(self):
+        for line in self.process.stderr:
+            if line.lstrip().startswith(b"Done in"):
+                with self.built:
+                    self.builds += 1
+                    self.built.notify_all()
+        with self.built:
+            self.built.notify_all()
+
+    def wait_for_build(self, builds: int, timeout: float):
+        with self.built:
+            self.built.wait_for(lambda: self.builds >= builds or not self.alive(), timeout)
+            return self.builds >= builds
+
+    def get_css(self, classes: set):
+        if not classes <= self.classes:
+            self.classes |= classes
+            # a rebuild still running from before doesn't have the new classes, wait for the next one too
+            builds = self.builds + (1 if self.pending is None else 2)
+            self.content.write_text(f'<div class="{" ".join(sorted(self.classes))}"></div>')
+            count("tailwind watch rebuilds")
+            # a slow rebuild can land later, until then the output is served but not cached
+            self.pending = None if self.wait_for_build(builds, self.rebuild_timeout) else builds
+        elif self.pending is not None and self.builds >= self.pending:
+            self.pending = None
+        if not self.alive() or not self.output.exists():
+            return None
+        return self.output.read_text()
+
+    def close(self):
+        if self.alive():
+            self.process.stdin.close()
+            self.process.terminate()
+            self.process.wait()
+        self.dir.cleanup()
+
+
 class TailwindCSS:
+    """
+    Generates the CSS for a set of Tailwind classes, results are cached by the
+    class set and Tailwind config in memory and optionally in cache_dir.
+    With persistent=True one watching tailwindcss process is reused for every
+    rebuild instead of starting Node each time. Unless a Tailwind config is
+    used, builtin=True generates the CSS in-process with tailwind_css(),
+    when it doesn't know a class and the binary is installed the binary
+    generates the CSS for the whole class set instead.
+    """
 
-    def __init__(self, tailwindcss="tailwindcss"):
+    def __init__(
+        self, tailwindcss="tailwindcss", config: str = None, cache_dir: str = None, persistent=False, builtin=True
+    ):
         self.tailwindcss = tailwindcss
+        self.config = config
+        self.builtin = builtin
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.persistent = persistent
+        self.watcher: TailwindWatcher = None
+        self.cache: dict[str, str] = {}
+        # unknown classes already reported, each is listed once per process
+        self.reported: set[str] = set()
+
+    def config_source(self) -> bytes:
+        config = Path(self.config or "tailwind.config.js")
+        try:
+            return config.read_bytes()
+        except FileNotFoundError:
+            return b""
+
+    def cache_key(self, classes: set) -> str:
+        key = hashlib.sha256()
+        key.update(self.tailwindcss.encode())
+        key.update(b"\0")
+        key.update(self.config_source())
+        key.update(b"\0")
+        key.update("\n".join(sorted(classes)).encode())
+        return key.hexdigest()
 
     def get_css(self, classes: set):
-        html = f'<div class="{" ".join(classes)}"></div>'
+        key = self.cache_key(classes)
+        if (css := self.cache.get(key)) is not None:
+            count("tailwind cache hits")
+            return css
+        cache_file = self.cache_dir / f"{key}.css" if self.cache_dir else None
+        if cache_file is not None and cache_file.exists():
+            count("tailwind cache hits")
+            css = self.cache[key] = cache_file.read_text()
+            return css
+        count("tailwind cache misses")
+        css = self.generate(classes)
+        if css is not None and (self.watcher is None or self.watcher.settled):
+            self.cache[key] = css
+            # watch output may hold rules for classes since removed, keep it out of the shared cache
+            if cache_file is not None and not self.persistent:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                cache_file.write_text(css)
+        return css
+
+    def generate(self, classes: set):
+        if self.builtin and not self.config_source():
+            css, unknown = tailwind_css(classes)
+            if not unknown or not shutil.which(self.tailwindcss):
+                # without the binary unknown classes are taken to be the app's own
+                count("tailwind classes not generated", len(unknown))
+                if unreported := unknown - self.reported:
+                    self.reported |= unreported
+                    print(f"no CSS for classes the builtin generator doesn't know and {self.tailwindcss} isn't installed:")
+                    for name in sorted(unreported):
+                        print(f"  {name}")
+                return css
+        css = self.watch(classes) if self.persistent else self.run(classes)
+        if css is None and self.builtin:
+            css, _ = tailwind_css(classes)
+        return css
+
+    def watch(self, classes: set):
+        if self.watcher is None or not self.watcher.alive():
+            try:
+                self.watcher = TailwindWatcher(self.tailwindcss, self.config)
+            except OSError as e:
+                print("Tailwind CLI failed:", e)
+                return None
+        # watch output only grows, a shrinking class set keeps the extra rules until close()
+        css = self.watcher.get_css(classes)
+        if css is None:
+            return self.run(classes)
+        return css
+
+    def run(self, classes: set):
+        html = f'<div class="{" ".join(sorted(classes))}"></div>'
+        command = [self.tailwindcss, "--content", "-"]
+        if self.config:
+            command += ["--config", self.config]
         try:
             process = subprocess.run(
-                [self.tailwindcss, "--content", "-"],
+                command,
                 input=html.encode(),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
@@ -64,3 +886,8 @@ class TailwindCSS:
             return process.stdout.decode()
         except subprocess.CalledProcessError as e:
             print("Tailwind CLI failed:", e.stderr.decode())
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
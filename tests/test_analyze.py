@@ -472,3 +472,261 @@ class TestAnalyzeConditionals(BaseTestCase):
             """
         )
 
+
+class TestSourceIndex(BaseTestCase):
+
+    def test_file_parsed_once(self):
+        import ast
+        from unittest import mock
+        from pyjs.testing import create_module
+        from pyjs.transpiler.objects import find_function_def
+        module = create_module(
+            "from pyjs import js\n"
+            "class A:\n"
+            "    @js\n"
+            "    def f(self): pass\n"
+            "    def g(self):\n"
+            "        def h(): pass\n"
+            "        return h\n",
+            "_index_.py"
+        )
+        with mock.patch.object(ast, "parse", wraps=ast.parse) as parse:
+            f = find_function_def(module.A.f)
+            g = find_function_def(module.A.g)
+            h = find_function_def(module.A().g())
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual((f.name, f.lineno), ("f", 4))
+        self.assertEqual((g.name, h.name), ("g", "h"))
+
+    def test_edited_file_is_analyzed_again(self):
+        import os
+        import importlib
+        from pyjs.transpiler.analyzer import analyze_module
+        from pyjs.transpiler.transpiler import Transpiler
+        file_name = self.module_dir("_edited") / "_edited.py"
+        file_name.write_text("def main():\n    return 'before'\nmain.__js_include__ = True\n")
+        module = importlib.import_module("_edited")
+        entry_point, _ = analyze_module(module)
+        self.assertIn("'before'", Transpiler(entry_point).visit(entry_point.container.node))
+        # same size, so only the mtime tells the two versions apart
+        file_name.write_text("def main():\n    return 'after!'\nmain.__js_include__ = True\n")
+        os.utime(file_name, (1_000_000, 1_000_000))
+        module = importlib.reload(module)
+        entry_point, _ = analyze_module(module)
+        self.assertIn("'after!'", Transpiler(entry_point).visit(entry_point.container.node))
+
+
+class TestConcurrentAnalyses(BaseTestCase):
+
+    def test_analyses_run_one_at_a_time(self):
+        import time
+        import threading
+        from unittest import mock
+        from pyjs.transpiler import analyzer
+        module = self.load_module(
+            """
+            from pyjs import js
+
+            @js
+            def main():
+                print("hi")
+            """
+        )
+        events = []
+
+        def visit_entry_point(*args):
+            events.append("start")
+            # long enough for the other thread to get there too if nothing stopped it
+            time.sleep(0.05)
+            result = real(*args)
+            events.append("end")
+            return result
+
+        real = analyzer.visit_entry_point
+        with mock.patch.object(analyzer, "visit_entry_point", visit_entry_point):
+            threads = [threading.Thread(target=analyzer.from_entry_point, args=(module.main,)) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(events, ["start", "end", "start", "end"])
+
+
+class TestSymbolTable(BaseTestCase):
+
+    def test_module_symbols(self):
+        from pyjs.testing import module_from_src
+        from pyjs.transpiler.analyzer import analyze_module
+        entry_point, _ = analyze_module(module_from_src(
+            """
+            @js
+            class Foo:
+                pass
+
+            @js
+            def main(count: int):
+                foo = Foo()
+                print(foo, count)
+            """, complete_src=True
+        ))
+        module = entry_point.container
+        self.assertIs(module.symbols["Foo"], module.search("Foo"))
+        self.assertIs(module.symbols["print"], module.search("print"))
+        self.assertNotIn("missing", module.symbols)
+        self.assertEqual(set(entry_point.symbols), {"Foo", "print", "int"})
+        version = module.scope.version
+        module.scope.add(module.search("Foo"), "Bar")
+        self.assertEqual(module.scope.version, version + 1)
+        self.assertIs(module.symbols["Bar"], module.search("Foo"))
+
+    def test_local_import_is_a_local_binding(self):
+        from pyjs.testing import module_from_src
+        from pyjs.transpiler.analyzer import analyze_module, bind_symbols
+        entry_point, _ = analyze_module(module_from_src(
+            """
+            @js
+            class Foo:
+                pass
+
+            @js
+            def helper():
+                from _elsewhere_ import Foo
+                return Foo()
+
+            @js
+            def main():
+                print(Foo())
+            """, complete_src=True
+        ))
+        module = entry_point.container
+        self.assertEqual(bind_symbols(module.search("helper")), {})
+        self.assertEqual(set(entry_point.symbols), {"Foo", "print"})
+
+
+class TestMethodResolution(BaseTestCase):
+
+    def test_flattened_mro_is_invalidated(self):
+        from pyjs.testing import module_from_src
+        from pyjs.transpiler.analyzer import analyze_module, Function
+        entry_point, _ = analyze_module(module_from_src(
+            """
+            @js
+            class Base:
+                def __init__(self):
+                    self.size = 1
+                def name(self) -> str:
+                    return "base"
+
+            @js
+            class Child(Base):
+                def name(self) -> str:
+                    return "child"
+
+            @js
+            def main():
+                print(Child().name())
+            """, complete_src=True
+        ))
+        base, child = entry_point.container.search("Base"), entry_point.container.search("Child")
+        self.assertIs(child.find("name").cls, child)
+        self.assertIs(child.find("__init__").cls, base)
+        self.assertIs(child._self.find("size").container, base._self)
+        def added(self): pass
+        base.add(Function(added, base))
+        self.assertIs(child.find("added").cls, base)
+
+    def test_versions_are_per_class(self):
+        from pyjs.testing import module_from_src
+        from pyjs.transpiler.analyzer import analyze_module, Function
+        entry_point, _ = analyze_module(module_from_src(
+            """
+            @js
+            class Base:
+                def __init__(self):
+                    self.size = 1
+
+            @js
+            class Child(Base):
+                pass
+
+            @js
+            class Other:
+                pass
+
+            @js
+            def main():
+                print(Child(), Other())
+            """, complete_src=True
+        ))
+        module = entry_point.container
+        base, child, other = module.search("Base"), module.search("Child"), module.search("Other")
+        mro, attrs = child.mro, child.inherited_attrs
+        def added(self): pass
+        other.add(Function(added, other))
+        other._self.add(other, "peer")
+        self.assertIs(child.mro, mro)
+        self.assertIs(child.inherited_attrs, attrs)
+        base._self.add(other, "peer")
+        self.assertIs(child._self.find("peer"), other)
+
+
+class TestGenericInterning(BaseTestCase):
+
+    def test_concrete_classes_are_interned(self):
+        from pyjs.transpiler.analyzer import BUILTINS, UnionType, concrete_class
+        generic_list = BUILTINS.search("list")
+        int_cls, str_cls = BUILTINS.search("int"), BUILTINS.search("str")
+        self.assertTrue(concrete_class(generic_list, int_cls).find("append").is_analyzed)
+        self.assertIs(generic_list(int_cls), generic_list(int_cls))
+        self.assertIs(
+            generic_list(UnionType(types=[int_cls, str_cls])),
+            generic_list(UnionType(types=[str_cls, int_cls]))
+        )
+        self.assertIs(generic_list(UnionType(types=[int_cls])), generic_list(int_cls))
+
+    def test_functions_in_progress_are_not_reset(self):
+        from unittest import mock
+        from pyjs.testing import module_from_src
+        from pyjs.transpiler.analyzer import analyze_module, Function, InferenceVisitor
+        in_progress, reset_in_progress = set(), []
+        visit_function_def, reset = InferenceVisitor.visit_FunctionDef, Function.reset
+
+        def visit_tracked(visitor, node):
+            in_progress.add(visitor.func)
+            try:
+                return visit_function_def(visitor, node)
+            finally:
+                in_progress.discard(visitor.func)
+
+        def reset_tracked(func):
+            if func in in_progress:
+                reset_in_progress.append(func.name)
+            reset(func)
+
+        module = module_from_src(
+            """
+            @js
+            class Box[T]:
+                def __init__(self, value: T):
+                    self.value = value
+
+                def text(self) -> str:
+                    return render(1)
+
+            @js
+            def render(n: int) -> str:
+                box = Box[int](n)
+                return "x"
+
+            @js
+            def main():
+                print(render(2))
+            """, complete_src=True
+        )
+        with (
+            mock.patch.object(InferenceVisitor, "visit_FunctionDef", visit_tracked),
+            mock.patch.object(Function, "reset", reset_tracked)
+        ):
+            entry_point, _ = analyze_module(module)
+        self.assertEqual(reset_in_progress, [])
+        self.assertTrue(entry_point.container.search("render").is_analyzed)
@@ -0,0 +1,231 @@
+import textwrap
+from pyjs.testing import BaseTestCase
+
+
+class TestTailwindCache(BaseTestCase):
+
+    def test_css_cached_by_class_set(self):
+        import tempfile
+        from unittest import mock
+        from pyjs.transpiler.utils import TailwindCSS
+        run = mock.Mock(return_value=mock.Mock(stdout=b".p-2{}"))
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch("subprocess.run", run):
+            tailwind = TailwindCSS(cache_dir=cache_dir, builtin=False)
+            self.assertEqual(tailwind.get_css({"p-2", "flex"}), ".p-2{}")
+            self.assertEqual(tailwind.get_css({"flex", "p-2"}), ".p-2{}")
+            self.assertEqual(run.call_count, 1)
+            tailwind.get_css({"flex"})
+            self.assertEqual(run.call_count, 2)
+            # a new process reads the generated CSS back from the cache directory
+            self.assertEqual(TailwindCSS(cache_dir=cache_dir, builtin=False).get_css({"p-2", "flex"}), ".p-2{}")
+            self.assertEqual(run.call_count, 2)
+
+    def test_config_changes_cache_key(self):
+        import tempfile
+        from pathlib import Path
+        from pyjs.transpiler.utils import TailwindCSS
+        with tempfile.TemporaryDirectory() as path:
+            config = Path(path) / "tailwind.config.js"
+            config.write_text("module.exports = {}")
+            tailwind = TailwindCSS(config=str(config))
+            key = tailwind.cache_key({"flex"})
+            config.write_text("module.exports = {theme: {}}")
+            self.assertNotEqual(tailwind.cache_key({"flex"}), key)
+
+    def test_slow_watch_rebuild_is_not_cached(self):
+        import os
+        import sys
+        import time
+        import tempfile
+        from pathlib import Path
+        from pyjs.transpiler.utils import TailwindCSS
+        with tempfile.TemporaryDirectory() as path:
+            # writes the output in two parts, rebuilds take 0.3s and log "Done in" when finished
+            script = Path(path) / "tailwindcss"
+            script.write_text(textwrap.dedent(f"""\
+                #!{sys.executable}
+                import sys, time
+                from pathlib import Path
+                content, output = Path(sys.argv[2]), Path(sys.argv[4])
+                seen = None
+                while True:
+                    if (html := content.read_text()) != seen:
+                        if seen is not None:
+                            time.sleep(0.3)
+                        with output.open("w") as f:
+                            f.write("/* " + html)
+                            f.flush()
+                            time.sleep(0.05)
+                            f.write(" */")
+                        print("Done in 300ms.", file=sys.stderr, flush=True)
+                        seen = html
+                    time.sleep(0.01)
+            """))
+            os.chmod(script, 0o755)
+            tailwind = TailwindCSS(str(script), persistent=True, builtin=False)
+            try:
+                tailwind.watch(set())
+                tailwind.watcher.rebuild_timeout = 0.05
+                self.assertEqual(tailwind.get_css({"flex"}), '/* <div></div> */')
+                self.assertFalse(tailwind.cache)
+                time.sleep(0.5)
+                self.assertEqual(tailwind.get_css({"flex"}), '/* <div class="flex"></div> */')
+                self.assertTrue(tailwind.cache)
+            finally:
+                tailwind.close()
+
+
+class TestTailwindGenerator(BaseTestCase):
+
+    def test_utilities_and_variants(self):
+        from pyjs.transpiler.utils import tailwind_css
+        css, unknown = tailwind_css(
+            {"px-4", "p-2", "text-lg", "text-red-500", "hover:bg-green-600", "md:w-1/2", "-mt-2", "todo-app"},
+            preflight=False
+        )
+        self.assertEqual(unknown, {"todo-app"})
+        self.assertIn(".px-4 {\n  padding-left: 1rem;\n  padding-right: 1rem;\n}", css)
+        self.assertIn(".text-lg {\n  font-size: 1.125rem;\n  line-height: 1.75rem;\n}", css)
+        self.assertIn(".text-red-500 {\n  color: #ef4444;\n}", css)
+        self.assertIn(".hover\\:bg-green-600:hover {\n  background-color: #16a34a;\n}", css)
+        self.assertIn("@media (min-width: 768px) {\n  .md\\:w-1\\/2 {\n    width: 50%;\n  }\n}", css)
+        self.assertIn(".-mt-2 {\n  margin-top: -0.5rem;\n}", css)
+        # plugin order: p before px, variants after plain utilities
+        self.assertLess(css.index(".p-2"), css.index(".px-4"))
+        self.assertLess(css.index(".text-red-500"), css.index(".hover\\:bg-green-600"))
+
+    def test_binary_not_run_for_known_classes(self):
+        from unittest import mock
+        from pyjs.transpiler.utils import TailwindCSS
+        with mock.patch("subprocess.run") as run:
+            css = TailwindCSS().get_css({"flex", "items-center", "bg-white"})
+        run.assert_not_called()
+        self.assertIn(".bg-white {\n  background-color: #fff;\n}", css)
+
+    def test_unknown_classes_reported_without_binary(self):
+        import io
+        from contextlib import redirect_stdout
+        from pyjs.transpiler.utils import TailwindCSS
+        tailwind = TailwindCSS("missing-tailwindcss")
+        with redirect_stdout(io.StringIO()) as out:
+            tailwind.get_css({"flex", "todo-app", "fancy-card"})
+            tailwind.get_css({"flex", "todo-app", "p-2"})
+        self.assertEqual(out.getvalue().splitlines()[1:], ["  fancy-card", "  todo-app"])
+
+
+class TestCriticalCSS(BaseTestCase):
+
+    def test_css_subset(self):
+        from pyjs.transpiler.utils import css_subset
+        css = """
+        /* comment */
+        *, ::before { box-sizing: border-box; }
+        .p-4 { padding: 1rem; }
+        .m-2 { margin: 0.5rem; }
+        .hover\\:bg-red-500:hover { background-color: #ef4444; }
+        table td { padding: 0; }
+        @media (min-width: 768px) { .md\\:w-1\\/2 { width: 50%; } .md\\:w-full { width: 100%; } }
+        @media (min-width: 1024px) { .lg\\:p-2 { padding: 0.5rem; } }
+        """
+        self.assertEqual(
+            css_subset(css, {"p-4", "hover:bg-red-500", "md:w-1/2"}, set(), {"html", "body", "div"}),
+            "*, ::before{box-sizing: border-box;}\n"
+            ".p-4{padding: 1rem;}\n"
+            ".hover\\:bg-red-500:hover{background-color: #ef4444;}\n"
+            "@media (min-width: 768px){.md\\:w-1\\/2{width: 50%;}}"
+        )
+
+    def test_page_inlines_critical_css(self):
+        from pyjs.domx import tag
+        from pyjs.server import page
+        html = page(
+            tag("div", {"class": "p-4"}, "hi"), "app.js", "app.css",
+            inline_css=".p-4 { padding: 1rem; } .m-2 { margin: 0.5rem; }"
+        )
+        self.assertIn("<style>\n      .p-4{padding: 1rem;}\n    </style>", html)
+        self.assertIn('<link rel="preload" href="app.css" as="style"', html)
+        self.assertIn('<noscript>\n      <link rel="stylesheet" href="app.css"/>', html)
+        self.assertNotIn(".m-2", html)
+
+    def test_selector_lists_split_on_top_level_commas(self):
+        from pyjs.transpiler.utils import css_subset
+        css = """
+        :is(.card, .panel) > p { margin: 0; }
+        .a, :where(.b, .c) .d { color: red; }
+        span[data-x="1,2"], .e { color: blue; }
+        """
+        self.assertEqual(
+            css_subset(css, {"card", "d"}, set(), {"p"}),
+            ":is(.card, .panel) > p{margin: 0;}\n"
+            ".a, :where(.b, .c) .d{color: red;}"
+        )
+
+    def test_critical_css_computed_once_per_class_set(self):
+        from unittest import mock
+        from pyjs.domx import tag
+        from pyjs import server
+        css = ".p-4 { padding: 1rem; } .m-2 { margin: 0.5rem; }"
+        with mock.patch.object(server, "css_subset", wraps=server.css_subset) as css_subset:
+            server.cached_css_subset.cache_clear()
+            for _ in range(3):
+                server.page(tag("div", {"class": "p-4"}, "hi"), "app.js", "app.css", inline_css=css)
+            server.page(tag("div", {"class": "m-2"}, "hi"), "app.js", "app.css", inline_css=css)
+        self.assertEqual(css_subset.call_count, 2)
+
+
+class TestTailwindExtraction(BaseTestCase):
+
+    def test_classes_resolved_statically(self):
+        from pyjs.testing import module_from_src
+        from pyjs.transpiler.analyzer import analyze_module
+        module = module_from_src(
+            """
+            from pyjs import js_str
+            from pyjs.domx import tag, tw
+
+            PADDING = js_str("p-4")
+
+            @js
+            def button_classes(primary: bool) -> str:
+                color = "blue" if primary else "gray"
+                return f"bg-{color}-500"
+
+            @js
+            def button(label: str, classes: str):
+                return tag("button", tw(classes + " " + PADDING), label)
+
+            @js
+            def main():
+                active = True
+                tag("div", {"class": "flex gap-2"},
+                    button("ok", button_classes(True)),
+                    button("cancel", "rounded" if active else "rounded-none"),
+                    tag("span", tw(str(len("abc")))),
+                )
+            """, complete_src=True
+        )
+        entry_point, classes = analyze_module(module)
+        self.assertEqual(classes, {
+            "flex", "gap-2", "p-4", "bg-blue-500", "bg-gray-500", "rounded", "rounded-none"
+        })
+        self.assertEqual(entry_point.tailwind_unresolved, {"_test_.main: str(len('abc'))"})
+
+    def test_classes_from_uncalled_parameters_are_unresolved(self):
+        from pyjs.testing import module_from_src
+        from pyjs.transpiler.analyzer import analyze_module
+        module = module_from_src(
+            """
+            from pyjs.domx import tag, tw
+
+            @js
+            def badge(tone: str):
+                return tag("span", tw(f"text-{tone}-700"))
+
+            @js
+            def main(color: str):
+                tag("div", tw(f"bg-{color}-500"), badge("green"), on_click=badge)
+            """, complete_src=True
+        )
+        entry_point, classes = analyze_module(module)
+        self.assertEqual(classes, {"text-green-700"})
+        self.assertEqual(entry_point.tailwind_unresolved, {"_test_.main: f'bg-{color}-500'"})
@@ -0,0 +1,306 @@
+import textwrap
+from pyjs.testing import BaseTestCase
+
+
+class TestResumableState(BaseTestCase):
+
+    def test_plain_data_attributes_are_serialized_and_restored(self):
+        from pyjs.server import page
+        from pyjs.transpiler import bundle, prepare_bundle
+        from pyjs.transpiler.transpiler import state_classes
+        module = self.load_module(
+            """
+            from pyjs import js
+            from pyjs.dom import Event
+            from pyjs.domx import CustomElement, tag
+
+            @js
+            class Cart(CustomElement):
+
+                def __init__(self, items: list[str]):
+                    super().__init__()
+                    self.items = items
+                    self.total: int = len(items)
+                    self.prices: dict[int, str] = {}
+                    self.button = tag("button", "buy")
+                    self.button.addEventListener("click", self.buy)
+                    tag(self, self.button)
+
+                def buy(self, e: Event):
+                    self.total = self.total + 1
+
+            @js
+            def main():
+                return Cart(["a", "b"])
+            """
+        )
+        js, _ = bundle(module.main)
+        self.assertIn("this.items = state.items;", js)
+        self.assertIn("this.total = state.total;", js)
+        # Maps and elements don't survive JSON
+        self.assertNotIn("state.prices", js)
+        self.assertNotIn("state.button", js)
+        _, entry_point, _ = prepare_bundle(module.main)
+        states = state_classes(entry_point)
+        self.assertEqual(states, {module.Cart: ("items", "total")})
+        self.assertFalse(hasattr(module.Cart, "__js_state__"))
+        html = page(module.main(), "app.js", "app.css", states=states)
+        self.assertIn('{"ce1":{"items":["a","b"],"total":2}}', html)
+        cart = module.main()
+        cart.total = float("nan")
+        with self.assertRaisesRegex(ValueError, "Cart.total"):
+            page(cart, "app.js", "app.css", states=states)
+
+    def test_elements_without_state_serialize_nothing(self):
+        from pyjs.domx import tag
+        from pyjs.server import page
+        self.assertNotIn("pyjs-state", page(tag("p", "</script>"), "app.js", "app.css"))
+
+
+class TestPrerenderRoutes(BaseTestCase):
+
+    def test_route_files(self):
+        from pathlib import Path
+        from pyjs.cli import route_file, rebase
+        self.assertEqual(route_file("/"), Path("index.html"))
+        self.assertEqual(route_file("/about.html"), Path("about.html"))
+        self.assertEqual(route_file("/products/1/"), Path("products/1/index.html"))
+        self.assertEqual(rebase("./app.js", "../../"), "../../app.js")
+        self.assertEqual(rebase("./app.js", ""), "./app.js")
+
+    def test_unchanged_routes_are_skipped(self):
+        import os
+        from pathlib import Path
+        from unittest import mock
+        from pyjs.cli import build_routes
+        src = "from pyjs.domx import tag\n\ndef main(n=0):\n    return tag('p', f'product {n}')\n"
+        kwargs = {"js": "./app.js", "css": "./app.css", "import_map": None, "preload": None}
+        path = self.module_dir("_routes_app")
+        Path(path, "_routes_app.py").write_text(src)
+        cwd = os.getcwd()
+        os.chdir(path)
+        try:
+            build_routes("_routes_app", "main", {"/": [], "/products/2": [2]}, kwargs, "key", {}, 1)
+            html = Path("products/2/index.html").read_text()
+            self.assertIn("product 2", html)
+            self.assertIn('src="../../app.js"', html)
+            self.assertIn('href="./app.css"', Path("index.html").read_text())
+            with mock.patch("builtins.print") as out:
+                build_routes("_routes_app", "main", {"/": [], "/products/2": [2]}, kwargs, "key", {}, 1)
+            out.assert_any_call("rendering 0 of 2 routes, the others are unchanged")
+            with mock.patch("builtins.print") as out:
+                build_routes("_routes_app", "main", {"/": [], "/products/2": [2]}, kwargs, "changed", {}, 1)
+            out.assert_any_call("rendering 2 of 2 routes, the others are unchanged")
+        finally:
+            os.chdir(cwd)
+
+
+class TestServerApps(BaseTestCase):
+
+    SRC = textwrap.dedent(
+        """
+        from pyjs import js
+        from pyjs.domx import CustomElement, tag
+
+        @js
+        class Stock(CustomElement):
+
+            def __init__(self, count: int):
+                super().__init__()
+                self.count = count
+                tag(self, f"{count} left")
+
+        def main(n=0):
+            return tag("main", Stock(n))
+        """
+    )
+
+    def serve(self, path):
+        import json
+        from pathlib import Path
+        Path(path, "_server_app.py").write_text(self.SRC)
+        Path(path, "_server_app.abc123.js").write_text("export function main() {}")
+        Path(path, "app.css").write_text("main { color: red; }")
+        Path(path, "app.manifest.json").write_text(json.dumps({
+            "module": "_server_app", "entry": "main",
+            "page": {
+                "js": "./_server_app.abc123.js", "css": "app.css", "script_type": "module", "inline_css": True,
+                "import_map": {"_server_app": "./_server_app.abc123.js"}, "preload": ["./_server_app.abc123.js"],
+            },
+            "assets": {"_server_app.abc123.js": True, "app.css": False},
+            "state": {"_server_app:Stock": ["count"]},
+        }))
+        return str(Path(path, "app.manifest.json"))
+
+    def test_wsgi(self):
+        import threading
+        import urllib.request
+        from urllib.error import HTTPError
+        from wsgiref.simple_server import make_server, WSGIRequestHandler
+        from pyjs.server import wsgi_app
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        app = wsgi_app(self.serve(self.module_dir("_server_app")), {"/": [], "/items/7": [7]})
+        httpd = make_server("127.0.0.1", 0, app, handler_class=QuietHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{httpd.server_port}"
+        with urllib.request.urlopen(f"{url}/items/7") as response:
+            html = response.read().decode()
+        self.assertIn("7 left", html)
+        self.assertIn('<link rel="modulepreload" href="/_server_app.abc123.js"/>', html)
+        self.assertIn("main{color: red;}", html)
+        self.assertIn('"count":7', html)
+        with urllib.request.urlopen(f"{url}/_server_app.abc123.js") as response:
+            self.assertEqual(response.read(), b"export function main() {}")
+            self.assertIn("immutable", response.headers["Cache-Control"])
+        with self.assertRaises(HTTPError) as error:
+            urllib.request.urlopen(f"{url}/items/8")
+        self.assertEqual(error.exception.code, 404)
+        httpd.shutdown()
+        httpd.server_close()
+
+    def test_head_closes_the_pool_stream(self):
+        import inspect
+        from unittest import mock
+        from pyjs.server import wsgi_app, asgi_app
+        from pyjs.testing import asgi_request
+
+        def stream():
+            yield b"<html>"
+
+        manifest = self.serve(self.module_dir("_server_app"))
+        app, body = wsgi_app(manifest), stream()
+        with mock.patch.object(app.app, "respond", return_value=(200, [], body)):
+            self.assertEqual(app({"REQUEST_METHOD": "HEAD"}, lambda status, headers: None), [b""])
+        self.assertEqual(inspect.getgeneratorstate(body), inspect.GEN_CLOSED)
+        app, body = asgi_app(manifest), stream()
+        with mock.patch.object(app.app, "respond", return_value=(200, [], body)):
+            self.assertEqual(asgi_request(app, "/", "HEAD")[2], b"")
+        self.assertEqual(inspect.getgeneratorstate(body), inspect.GEN_CLOSED)
+
+    def test_asgi(self):
+        from pyjs.server import asgi_app
+        from pyjs.testing import asgi_request
+        app = asgi_app(
+            self.serve(self.module_dir("_server_app")),
+            lambda route: [int(route.split("/")[-1])] if route != "/" else []
+        )
+        status, headers, body = asgi_request(app, "/items/3")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-type"], "text/html; charset=utf-8")
+        self.assertIn("3 left", body.decode())
+        status, headers, body = asgi_request(app, "/app.css")
+        self.assertEqual((status, headers["cache-control"], body), (200, "no-cache", b"main { color: red; }"))
+        self.assertEqual(asgi_request(app, "/", "POST")[0], 405)
+        self.assertEqual(asgi_request(app, "/", "HEAD")[2], b"")
+
+    def test_worker_pool(self):
+        import os
+        import json
+        import signal
+        from pyjs.server import asgi_app, HEALTH_PATH
+        from pyjs.testing import asgi_request
+        app = asgi_app(
+            self.serve(self.module_dir("_server_app")), {"/": [], "/items/5": [5]}, workers=2, max_in_flight=1
+        )
+        pool = app.app.pool
+        self.addCleanup(pool.close)
+        # the workers don't inherit the server's threads
+        self.assertEqual(pool.context.get_start_method(), "spawn")
+        status, _, body = asgi_request(app, "/items/5")
+        self.assertEqual(status, 200)
+        self.assertIn("5 left", body.decode())
+        status, _, body = asgi_request(app, HEALTH_PATH)
+        health = json.loads(body)
+        self.assertEqual((status, health["alive"], health["restarts"]), (200, 2, 0))
+        # a crashed worker is replaced on the next request
+        crashed = health["workers"][0]["pid"]
+        os.kill(crashed, signal.SIGKILL)
+        pool.workers[0].process.join()
+        self.assertEqual(asgi_request(app, "/")[0], 200)
+        self.assertEqual(pool.health()["restarts"], 1)
+        self.assertNotIn(crashed, [worker["pid"] for worker in pool.health()["workers"]])
+        pool.reload()
+        self.assertIn("5 left", asgi_request(app, "/items/5")[2].decode())
+
+    def test_worker_exit_mid_response_fails_the_stream(self):
+        import queue
+        from pyjs.server import SSRPool
+        job = queue.SimpleQueue()
+        job.put(b"<html>")
+        job.put(EOFError())
+        stream = SSRPool.stream(job)
+        self.assertEqual(next(stream), b"<html>")
+        # not a short body the client takes for the whole page
+        with self.assertRaises(RuntimeError):
+            next(stream)
+
+
+class TestLiveReload(BaseTestCase):
+
+    def test_page_script(self):
+        from pyjs.domx import tag
+        from pyjs.server import page
+        html = page(tag("p", "hi"), "app.js", "app.css", live_reload="/_pyjs/events")
+        self.assertIn('new EventSource("/_pyjs/events")', html)
+        self.assertNotIn("EventSource", page(tag("p", "hi"), "app.js", "app.css"))
+
+    def test_rebuild_notifies_pages(self):
+        import os
+        from pathlib import Path
+        from unittest import mock
+        from pyjs.server import PyjsServer
+
+        class Tailwind:
+            # the CSS is whatever the config holds
+            def __init__(self, **kwargs):
+                self.config = str(Path(path, "tailwind.config.js"))
+
+            def get_css(self, classes):
+                return Path(self.config).read_text()
+
+            def close(self):
+                pass
+
+        def save(file_name, src):
+            Path(path, file_name).write_text(src)
+            # mtimes can be too coarse to tell quick saves apart
+            save.time += 10
+            os.utime(Path(path, file_name), (save.time, save.time))
+        save.time = 1_000_000
+
+        src = "from pyjs import js\nfrom pyjs.domx import tag, tw\n\n@js\ndef main():\n    return tag('p', tw('text-lg'), 'hello')\n"
+        path = self.module_dir("_live_app")
+        with mock.patch("pyjs.server.TailwindCSS", Tailwind), \
+                mock.patch.object(PyjsServer, "server_bind"), mock.patch.object(PyjsServer, "server_activate"):
+            save("_live_app.py", src)
+            save("tailwind.config.js", "p { color: red; }")
+            server = PyjsServer("_live_app", "", None, watch_interval=3600)
+            try:
+                save("tailwind.config.js", "p { color: blue; }")
+                server.refresh()
+                self.assertEqual(server.events, [("css", "/index.css")])
+                self.assertEqual(server.get_css(), "p { color: blue; }")
+                save("_live_app.py", src.replace("hello", "goodbye"))
+                server.refresh()
+                self.assertEqual(server.events[-1], ("reload", "/"))
+                self.assertIn("goodbye", server.render()[2].decode())
+                # the CSS stays the same
+                save("tailwind.config.js", "p { color: blue; }")
+                server.refresh()
+                self.assertEqual(len(server.events), 2)
+                # a half saved module keeps the last build
+                build = server.build
+                save("_live_app.py", src[:40])
+                with mock.patch("traceback.print_exc") as print_exc:
+                    server.refresh()
+                print_exc.assert_called_once()
+                self.assertIs(server.build, build)
+                self.assertEqual(len(server.events), 2)
+                self.assertIn("goodbye", server.render()[2].decode())
+            finally:
+                server.stopped.set()
+                server.server_close()
@@ -1,4 +1,7 @@
-from pyjs.testing import BaseTestCase
+import textwrap
+from pyjs.testing import BaseTestCase, module_from_src
+from pyjs.transpiler.analyzer import analyze_module
+from pyjs.transpiler.report import bundle_report
 
 
 class TestTranspileConditionals(BaseTestCase):
@@ -51,3 +54,697 @@ class TestTranspileLoops(BaseTestCase):
             }
             """
         )
+
+
+class TestTranspileDicts(BaseTestCase):
+
+    def test_str_keys_use_object(self):
+        self.t(
+            """
+            @js
+            def main():
+                d = {"a": 1, "b": 2}
+                d["c"] = 3
+                for k, v in d.items():
+                    print(d["a"])
+            """,
+            """
+            export function main() {
+                var d = {'a': 1, 'b': 2};
+                d['c'] = 3;
+                for (var [k, v] of Object.entries(d)) {
+                    console.log(d['a']);
+                }
+            }
+            """,
+            complete_src=True
+        )
+
+    def test_other_keys_use_map(self):
+        self.t(
+            """
+            @js
+            def main():
+                d = {1: "a", 2: "b"}
+                d[3] = "c"
+                print(d[1])
+                print(len(d))
+                print(3 in d)
+            """,
+            """
+            export function main() {
+                var d = new Map([[1, 'a'], [2, 'b']]);
+                d.set(3, 'c');
+                console.log(d.get(1));
+                console.log(d.size);
+                console.log(d.has(3));
+            }
+            """,
+            complete_src=True
+        )
+
+
+class TestTranspileHoisting(BaseTestCase):
+
+    def test_hoist_constant_literals_and_pure_calls(self):
+        self.t(
+            """
+            from pyjs.domx import tag
+
+            @js(pure=True, inline_auto=False)
+            def classes(names: str) -> dict[str, str]:
+                return {"class": names}
+
+            @js
+            def main():
+                for i in [1, 2, 3]:
+                    tag("p", classes("p-4"))
+                    tag("p", {"id": "main"})
+                    tag("p", classes("p-4"))
+                names = ["a"]
+            """,
+            """
+            import { tag } from './pyjs.domx.js';
+            const $c0 = Object.freeze([1, 2, 3]);
+            const $c1 = classes('p-4');
+
+            export function classes(names) {
+                return {'class': names};
+            }
+
+            export function main() {
+                for (var i of $c0) {
+                    tag('p', $c1);
+                    tag('p', {'id': 'main'});
+                    tag('p', $c1);
+                }
+                var names = ['a'];
+            }
+            """,
+            complete_src=True
+        )
+
+    def test_pure_results_passed_to_mutating_callees_are_not_shared(self):
+        self.t(
+            """
+            @js(pure=True, inline_auto=False)
+            def mk(name: str) -> dict[str, str]:
+                return {"name": name}
+
+            @js(inline_auto=False)
+            def mutate(d: dict[str, str]):
+                d["seen"] = "yes"
+
+            @js
+            def main():
+                for i in [1, 2]:
+                    mutate(mk("a"))
+            """,
+            """
+            const $c0 = Object.freeze([1, 2]);
+
+            export function mk(name) {
+                return {'name': name};
+            }
+
+            export function mutate(d) {
+                d['seen'] = 'yes';
+            }
+
+            export function main() {
+                for (var i of $c0) {
+                    mutate(mk('a'));
+                }
+            }
+            """,
+            complete_src=True
+        )
+
+
+    def test_literal_arguments_are_not_shared(self):
+        self.t(
+            """
+            @js(inline_auto=False)
+            def extend(items: list[int]):
+                items.append(4)
+
+            @js
+            def main():
+                extend([1, 2, 3])
+                first = [1, 2, 3][0]
+            """,
+            """
+            const $c0 = Object.freeze([1, 2, 3]);
+
+            export function extend(items) {
+                items.push(4);
+            }
+
+            export function main() {
+                extend([1, 2, 3]);
+                var first = $c0[0];
+            }
+            """,
+            complete_src=True
+        )
+
+    def test_assigned_pure_results_are_not_shared(self):
+        self.t(
+            """
+            @js(pure=True, inline_auto=False)
+            def mk(name: str) -> dict[str, str]:
+                return {"name": name}
+
+            @js(pure=True, inline_auto=False)
+            def label(name: str) -> str:
+                return name + "!"
+
+            @js
+            def main():
+                d = mk('a')
+                d['id'] = 'z'
+                text = label('a')
+            """,
+            """
+            const $c0 = label('a');
+
+            export function mk(name) {
+                return {'name': name};
+            }
+
+            export function label(name) {
+                return name + '!';
+            }
+
+            export function main() {
+                var d = mk('a');
+                d['id'] = 'z';
+                var text = $c0;
+            }
+            """,
+            complete_src=True
+        )
+
+    def test_imported_classes_are_not_walked(self):
+        from pyjs.transpiler import bundle
+        self.load_module(
+            "from pyjs import js\n\n@js\nclass Helper:\n    def names(self):\n        return ('a', 'b')\n",
+            "_hoist_helper"
+        )
+        module = self.load_module(
+            """
+            from pyjs import js
+            from _hoist_helper import Helper
+
+            @js
+            def main():
+                return Helper().names()
+            """
+        )
+        js, _ = bundle(module.main, include_main=True)
+        # the tuple is hoisted once, by the module defining Helper
+        self.assertEqual(js.count("Object.freeze(['a', 'b'])"), 1)
+        self.assertEqual(js.count("const $c0"), 1)
+
+
+class TestTranspileTreeShaking(BaseTestCase):
+
+    SRC = """
+        @js
+        class Widget:
+            @js(include=True)
+            def mounted(self):
+                print("mounted")
+
+        @js
+        class Other:
+            pass
+
+        @js
+        def main():
+            other = Other()
+            is_widget = isinstance(other, Widget)
+        """
+
+    def test_include_methods_require_instantiation(self):
+        self.t(
+            self.SRC,
+            """
+            export class Widget {
+            }
+
+            export class Other {
+            }
+
+            export function main() {
+                var other = new Other();
+                var is_widget = (other instanceof Widget);
+            }
+            """,
+            complete_src=True
+        )
+
+    def test_report(self):
+        entry_point, _ = analyze_module(module_from_src(self.SRC, complete_src=True))
+        report = bundle_report(entry_point).splitlines()
+        self.assertRegex(report[1], r"^_test_ +\d+ B$")
+        self.assertRegex(report[2], r"^  function main +\d+ B  entry point$")
+        self.assertIn("instantiated by main", "\n".join(report))
+        self.assertIn("referenced by main", "\n".join(report))
+
+
+class TestTranspileInlining(BaseTestCase):
+
+    def test_inline_small_functions(self):
+        self.t(
+            """
+            @js
+            def double(x: int) -> int:
+                return x * 2
+
+            @js(inline_auto=False)
+            def triple(x: int) -> int:
+                return x * 3
+
+            @js
+            def main():
+                a = double(1)
+                b = triple(a)
+            """,
+            """
+            export function triple(x) {
+                return x * 3;
+            }
+
+            export function main() {
+                var a = 2;
+                var b = triple(a);
+            }
+            """,
+            complete_src=True
+        )
+
+
+    def test_caller_locals_do_not_capture_callee_names(self):
+        self.t(
+            """
+            @js(inline_auto=False)
+            def base() -> int:
+                return 1
+
+            @js
+            def f(a: int) -> int:
+                return base() + a
+
+            @js
+            def main():
+                base = 2
+                x = f(base)
+                y = f(3)
+            """,
+            """
+            export function base() {
+                return 1;
+            }
+
+            export function f(a) {
+                return base() + a;
+            }
+
+            export function main() {
+                var base = 2;
+                var x = f(base);
+                var y = f(3);
+            }
+            """,
+            complete_src=True
+        )
+
+    def test_arguments_with_side_effects_keep_their_order(self):
+        self.t(
+            """
+            @js(inline_auto=False)
+            def side(n: int) -> int:
+                print(n)
+                return n
+
+            @js
+            def g(a: int) -> int:
+                return side(1) + a
+
+            @js
+            def main():
+                x = g(side(2))
+                y = g(2)
+            """,
+            """
+            export function side(n) {
+                console.log(n);
+                return n;
+            }
+
+            export function g(a) {
+                return side(1) + a;
+            }
+
+            export function main() {
+                var x = g(side(2));
+                var y = side(1) + 2;
+            }
+            """,
+            complete_src=True
+        )
+
+
+class TestTranspileConstantFolding(BaseTestCase):
+
+    def test_fold_constants_and_fstrings(self):
+        self.t(
+            """
+            @js
+            def main():
+                padding = "px-" + "4"
+                size = 2 * 8
+                label = f"size {size:>4}!"
+                total = f"{size:.2f} / {size:03d} / {size:,} `${{x}}`"
+                static = f"{size}px and {16:x}"
+            """,
+            """
+            export function main() {
+                var padding = 'px-4';
+                var size = 16;
+                var label = `size ${(String(size)).padStart(4, ' ')}!`;
+                var total = `${(size).toFixed(2)} / ${(String(size)).padStart(3, '0').replace(/^(0*)([-+ ])/, '$2$1')} / ${(size).toLocaleString('en-US', {maximumFractionDigits: 20})} \\`\\${x}\\``;
+                var static = `${size}px and 10`;
+            }
+            """,
+            complete_src=True
+        )
+
+    def test_signed_zero_padding_and_float_grouping(self):
+        self.t(
+            """
+            @js
+            def main(x: int):
+                y = x / 3
+                signed = f"{x:+05} {x: 05}"
+                grouped = f"{y:,}"
+            """,
+            """
+            export function main(x) {
+                var y = x / 3;
+                var signed = `${((String(x)).replace(/^(?!-)/, '+')).padStart(5, '0').replace(/^(0*)([-+ ])/, '$2$1')} ${((String(x)).replace(/^(?!-)/, ' ')).padStart(5, '0').replace(/^(0*)([-+ ])/, '$2$1')}`;
+                var grouped = `${(y).toLocaleString('en-US', {maximumFractionDigits: 20})}`;
+            }
+            """,
+            complete_src=True
+        )
+
+
+class TestTranspileStats(BaseTestCase):
+
+    def test_bundle_stats(self):
+        from pyjs.transpiler import bundle
+        from pyjs.transpiler.stats import Stats
+        module = self.load_module(
+            """
+            from pyjs import js
+
+            @js
+            def main():
+                items: list[str] = []
+                print(items)
+            """
+        )
+        stats = Stats()
+        bundle(module.main, include_main=True, stats=stats)
+        self.assertTrue({"build", "annotate types", "call graph", "transpile"} <= set(stats.phases))
+        self.assertGreater(stats.counters["functions analyzed"], 0)
+        self.assertGreater(stats.counters["nodes emitted"], 0)
+        self.assertGreater(stats.module_bytes["_test_"], 0)
+        self.assertEqual(stats.as_dict()["total_bytes"], sum(stats.module_bytes.values()))
+
+
+class TestScopeHoisting(BaseTestCase):
+
+    def test_modules_share_one_closure(self):
+        from pyjs.transpiler import bundle
+        self.load_module(
+            """
+            from pyjs import js
+
+            @js(inline_auto=False)
+            def label(n: int) -> str:
+                return f"item {n}"
+
+            @js(inline_auto=False)
+            def describe(n: int) -> str:
+                return label(n) + "!"
+            """, "_helpers_"
+        )
+        module = self.load_module(
+            """
+            from pyjs import js
+            from _helpers_ import describe
+
+            @js(inline_auto=False)
+            def label(n: int) -> str:
+                return describe(n) + str(n)
+
+            @js
+            def main():
+                print(label(2))
+            """
+        )
+        js, _ = bundle(module.main, include_main=True, scope_hoisted=True)
+        self.assertEqual(js, textwrap.dedent(
+            """\
+            (() => {
+            // _helpers_
+            function label$_helpers_(n) {
+                return `item ${n}`;
+            }
+
+            function describe(n) {
+                return label$_helpers_(n) + '!';
+            }
+
+            // _test_
+            function label(n) {
+                return describe(n) + String(n);
+            }
+
+            function main() {
+                console.log(label(2));
+            }
+
+            main();
+            })();
+            """
+        ))
+
+
+class TestESMBuild(BaseTestCase):
+
+    def build(self, greeting):
+        from pyjs.transpiler import prepare_bundle
+        from pyjs.transpiler.transpiler import esm_build, esm_importer
+        self.load_module(
+            """
+            from pyjs import js
+
+            @js(inline_auto=False)
+            def label(n: int) -> str:
+                return f"item {n}"
+            """, "_helpers_"
+        )
+        module = self.load_module(
+            f"""
+            from pyjs import js
+            from _helpers_ import label
+
+            @js
+            def main():
+                print("{greeting}", label(2))
+            """
+        )
+        package, entry_point, _ = prepare_bundle(module.main, esm_importer, include_main=True)
+        return esm_build(package, entry_point)[:2]
+
+    def test_modules_are_hashed_and_mapped(self):
+        files, import_map = self.build("hello")
+        self.assertEqual(list(import_map), ["_helpers_", "_test_"])
+        self.assertRegex(import_map["_helpers_"], r"^\./_helpers_\.[0-9a-f]{10}\.js$")
+        entry_js = files[import_map["_test_"][2:]]
+        self.assertIn("import { label } from '_helpers_';", entry_js)
+        self.assertTrue(entry_js.endswith("main();\n"))
+
+    def test_edit_only_changes_edited_module(self):
+        _, before = self.build("hello")
+        _, after = self.build("goodbye")
+        self.assertEqual(before["_helpers_"], after["_helpers_"])
+        self.assertNotEqual(before["_test_"], after["_test_"])
+
+    def test_page_preloads_modules(self):
+        from pyjs.domx import tag
+        from pyjs.server import page
+        _, import_map = self.build("hello")
+        html = page(tag("p", "hi"), import_map["_test_"], "app.css", import_map=import_map)
+        self.assertIn('<script type="importmap">', html)
+        self.assertLess(html.index("importmap"), html.index('<script type="module"'))
+        for url in import_map.values():
+            self.assertIn(f'<link rel="modulepreload" href="{url}"/>', html)
+
+
+class TestLazyComponents(BaseTestCase):
+
+    def build(self, lazy, include_main=False):
+        from pyjs.transpiler import prepare_bundle
+        from pyjs.transpiler.transpiler import esm_build, esm_importer
+        self.load_module(
+            """
+            from pyjs import js
+            from pyjs.domx import CustomElement, tag
+
+            @js(inline_auto=False)
+            def shared_label(n: int) -> str:
+                return f"count {n}"
+
+            @js(inline_auto=False)
+            def dialog_title(name: str) -> str:
+                return f"Settings for {name}"
+
+            @js(lazy=True)
+            class SettingsDialog(CustomElement):
+
+                def __init__(self, name: str):
+                    super().__init__()
+                    tag(self, tag("h2", dialog_title(name)), shared_label(0))
+            """, "_widgets_"
+        )
+        # main only runs on the server unless include_main ships it
+        module = self.load_module(
+            """
+            from pyjs import js
+            from pyjs.domx import CustomElement, tag
+            from _widgets_ import SettingsDialog, shared_label
+
+            @js
+            class Counter(CustomElement):
+
+                def __init__(self):
+                    super().__init__()
+                    tag(self, shared_label(0))
+
+            @js
+            def main():
+                return tag("main", Counter(), SettingsDialog("me"))
+            """
+        )
+        package, self.entry_point, _ = prepare_bundle(module.main, esm_importer, include_main=include_main, lazy=lazy)
+        return package, esm_build(package, self.entry_point)
+
+    def test_lazy_class_and_exclusive_dependencies_are_split(self):
+        chunk = "_widgets_~_widgets_.SettingsDialog"
+        package, (files, import_map, preload) = self.build(lazy=True)
+        self.assertIn("class SettingsDialog", package[chunk])
+        self.assertIn("function dialog_title", package[chunk])
+        self.assertIn("import { shared_label } from '_widgets_';", package[chunk])
+        self.assertIn("function shared_label", package["_widgets_"])
+        self.assertNotIn("SettingsDialog", package["_widgets_"])
+        self.assertNotIn("dialog_title", package["_widgets_"])
+        self.assertIn("class Counter", package["_test_"])
+        self.assertNotIn(import_map[chunk], preload)
+        entry_js = files[import_map["_test_"][2:]]
+        self.assertIn(f"['settings-dialog', () => import('{chunk}')]", entry_js)
+
+    def test_lazy_class_constructed_by_shipped_code_stays_in_its_module(self):
+        package, (files, import_map, preload) = self.build(lazy=True, include_main=True)
+        self.assertFalse([name for name in package if "~" in name])
+        self.assertIn("class SettingsDialog", package["_widgets_"])
+        self.assertIn("function dialog_title", package["_widgets_"])
+        self.assertIn("new SettingsDialog()", package["_test_"])
+        self.assertIn("import { SettingsDialog, shared_label } from '_widgets_';", package["_test_"])
+        self.assertNotIn("settings-dialog", files[import_map["_test_"][2:]])
+
+    def test_entry_point_bits_are_allocated_per_analysis(self):
+        for _ in range(2):
+            package, _ = self.build(lazy=True)
+            self.assertEqual(self.entry_point.entry_bit, 1)
+            self.assertEqual(list(self.entry_point.lazy.values()), [2])
+
+    def test_without_code_splitting_lazy_classes_are_bundled(self):
+        package, (files, import_map, preload) = self.build(lazy=False)
+        self.assertFalse([name for name in package if "~" in name])
+        self.assertIn("class SettingsDialog", package["_widgets_"])
+        self.assertEqual(preload, list(import_map.values()))
+
+
+class TestIslands(BaseTestCase):
+
+    def build(self, islands):
+        from pyjs.transpiler import bundle
+        self.load_module(
+            """
+            from pyjs import js
+            from pyjs.dom import Event
+            from pyjs.domx import CustomElement, tag
+
+            @js
+            class Header(CustomElement):
+
+                def __init__(self, title: str):
+                    super().__init__()
+                    tag(self, tag("h1", title))
+
+            @js
+            class Counter(CustomElement):
+
+                def __init__(self):
+                    super().__init__()
+                    self.button = tag("button", "0")
+                    self.button.addEventListener("click", self.increment)
+                    tag(self, self.button)
+
+                def increment(self, e: Event):
+                    self.button.textContent = "1"
+
+            @js
+            class Clock(CustomElement):
+
+                def initialize(self):
+                    self.textContent = "now"
+
+            @js(inline_auto=False)
+            def render_body() -> CustomElement:
+                return tag("section", Header("hello"), Counter(), Clock())
+            """, "_parts_"
+        )
+        module = self.load_module(
+            """
+            from pyjs import js
+            from pyjs.domx import tag
+            from _parts_ import render_body
+
+            @js
+            def main():
+                return tag("main", render_body())
+            """
+        )
+        js, _ = bundle(module.main, islands=islands)
+        return js
+
+    def test_only_interactive_elements_are_shipped(self):
+        js = self.build(islands=True)
+        self.assertIn("class Counter", js)
+        self.assertIn("class Clock", js)
+        self.assertNotIn("class Header", js)
+        self.assertNotIn("render_body", js)
+        # the entry module loads the islands
+        self.assertIn("const {Counter, Clock} = __import_js__('_parts_');", js)
+        self.assertIn("importModule('_test_');", js)
+
+    def test_without_islands_everything_rendered_is_shipped(self):
+        js = self.build(islands=False)
+        self.assertIn("class Header", js)
+        self.assertIn("function render_body", js)